@@ -5,4 +5,7 @@ A minimal script to launch leo.
 """
 
 import leo.core.runLeo
-leo.core.runLeo.run()
+
+if __name__ == '__main__':
+    # Worker processes import this module.
+    leo.core.runLeo.run()
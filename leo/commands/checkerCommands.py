@@ -16,9 +16,16 @@ try:
     import pyflakes
 except ImportError:
     pyflakes = None
-import shlex
+import concurrent.futures
+import hashlib
+import io
+import os
+import re
+import subprocess
 import sys
+import threading
 import time
+import unittest
 #@-<< imports >>
 #@+others
 #@+node:ekr.20161021091557.1: **  Commands
@@ -161,6 +168,8 @@ def flake8_command(event):
 def kill_pylint(event):
     """Kill any running pylint processes and clear the queue."""
     g.app.backgroundProcessManager.kill('pylint')
+    if g.app.checkerService:
+        g.app.checkerService.cancel('pylint')
 #@+node:ekr.20160516072613.1: *3* pyflakes command
 @g.command('pyflakes')
 def pyflakes_command(event):
@@ -196,27 +205,18 @@ class Flake8Command:
         """ctor for Flake8Command class."""
         self.c = c
         self.quiet = quiet
+        self.roots = {}  # Keys are checked paths, values are @<file> positions.
         self.seen = []  # List of checked paths.
     #@+others
     #@+node:ekr.20160517133049.2: *3* flake8.check_all
     def check_all(self, paths):
-        """Run flake8 on all paths."""
-        try:
-            # pylint: disable=import-error
-                # We can't assume the user has this.
-            from flake8 import engine, main
-        except Exception:
+        """Run flake8 on all paths in worker processes."""
+        if not flake8:
             return
         config_file = self.get_flake8_config()
         if config_file:
-            style = engine.get_style_guide(parse_argv=False, config_file=config_file)
-            report = style.check_files(paths=paths)
-            # Set statistics here, instead of from the command line.
-            options = style.options
-            options.statistics = True
-            options.total_errors = True
-            # options.benchmark = True
-            main.print_report(report, style)
+            files = [(fn, self.roots[fn]) for fn in paths]
+            get_checker_service().check(self.c, 'flake8', files, config=config_file)
     #@+node:ekr.20160517133049.3: *3* flake8.find
     def find(self, p):
         """Return True and add p's path to self.seen if p is a Python @<file> node."""
@@ -230,6 +230,7 @@ class Flake8Command:
                 fn = g.os_path_finalize_join(path, fn)
                 if fn not in self.seen:
                     self.seen.append(fn)
+                    self.roots[fn] = p.copy()
                     found = True
         return found
     #@+node:ekr.20160517133049.4: *3* flake8.get_flake8_config
@@ -260,7 +261,6 @@ class Flake8Command:
         if leo_path not in sys.path:
             sys.path.append(leo_path)
         # Run flake8 on all Python @<file> nodes in root's tree.
-        t1 = time.time()
         found = False
         for p in root.self_and_subtree():
             found |= self.find(p)
@@ -282,7 +282,9 @@ class Flake8Command:
         paths = list(set(self.seen))
         if paths:
             self.check_all(paths)
-        g.es_print(f"flake8: {len(paths)} file{g.plural(paths)} in {g.timeSince(t1)}")
+                # The checker service reports the results.
+        else:
+            g.es_print('flake8: no files found')
     #@-others
 #@+node:ekr.20160516072613.2: ** class PyflakesCommand
 class PyflakesCommand:
@@ -321,31 +323,22 @@ class PyflakesCommand:
                 g.es(s)
     #@+node:ekr.20160516072613.6: *3* pyflakes.check_all
     def check_all(self, log_flag, pyflakes_errors_only, roots):
-        """Run pyflakes on all files in paths."""
-        try:
-            from pyflakes import api, reporter
-        except Exception:  # ModuleNotFoundError
+        """
+        Run pyflakes on all files in paths, in worker processes if there
+        are several files to check. Return the total number of errors.
+        """
+        if not pyflakes:
             return True  # Pretend all is fine.
-        total_errors = 0
-        for i, root in enumerate(roots):
+        files = []
+        for root in roots:
             fn = self.finalize(root)
-            sfn = g.shortFileName(fn)
             # #1306: nopyflakes
             if any([z.strip().startswith('@nopyflakes') for z in g.splitLines(root.b)]):
                 continue
-            # Report the file name.
-            s = g.readFileIntoEncodedString(fn)
-            if s and s.strip():
-                if not pyflakes_errors_only:
-                    g.es(f"Pyflakes: {sfn}")
-                # Send all output to the log pane.
-                r = reporter.Reporter(
-                    errorStream=self.LogStream(i, roots),
-                    warningStream=self.LogStream(i, roots),
-                )
-                errors = api.check(s, sfn, r)
-                total_errors += errors
-        return total_errors
+            if not pyflakes_errors_only:
+                g.es(f"Pyflakes: {g.shortFileName(fn)}")
+            files.append((fn, root))
+        return get_checker_service().check(self.c, 'pyflakes', files, wait=True)
     #@+node:ekr.20171228013625.1: *3* pyflakes.check_script
     def check_script(self, p, script):
         """Call pyflakes to check the given script."""
@@ -461,8 +454,7 @@ class PylintCommand:
         if not data:
             g.es('pylint: no files found', color='red')
             return
-        for fn, p in data:
-            self.run_pylint(fn, p)
+        get_checker_service().check(c, 'pylint', data, config=self.rc_fn)
     #@+node:ekr.20190605183824.1: *3* 2. pylint.import_lint
     def import_lint(self):
         """Make sure lint can be imported."""
@@ -508,35 +500,356 @@ class PylintCommand:
             g.trace(f"not a python file: {p.h!r}")
             return None
         return g.os_path_finalize_join(path, fn)
-    #@+node:ekr.20150514125218.12: *3* 5. pylint.run_pylint
-    def run_pylint(self, fn, p):
-        """Run pylint on fn with the given pylint configuration file."""
-        c, rc_fn = self.c, self.rc_fn
-        #
-        # Invoke pylint directly.
-        is_win = sys.platform.startswith('win')
-        args = ','.join([f"'--rcfile={rc_fn}'", f"'{fn}'"])
-        if is_win:
-            args = args.replace('\\', '\\\\')
-        command = (
-            f'{sys.executable} -c "from pylint import lint; args=[{args}]; lint.Run(args)"')
-        if not is_win:
-            command = shlex.split(command)
-        #
-        # Run the command using the BPM.
-        bpm = g.app.backgroundProcessManager
-        bpm.start_process(c, command,
-            fn=fn,
-            kind='pylint',
-            link_pattern=self.link_pattern,
-            link_root=p,
-        )
+    #@-others
+#@+node:ekr.20261018051900.1: ** class CheckerService
+class CheckerService:
+    """
+    The CheckerService class runs flake8, pyflakes or pylint on many files
+    in parallel, *without blocking Leo*. pyflakes runs in a pool of worker
+    processes. flake8 and pylint run in subprocesses, started by a pool of
+    threads, so that cancel can kill running checks.
+
+    g.app.checkerService is the singleton CheckerService, created by
+    get_checker_service.
+
+    check(c, checker, files, ...) starts checking files. An IdleTime handler
+    writes the diagnostics for each file to c's log, as clickable links, as
+    soon as the file has been checked.
+
+    The service caches the results for each file. The cache keys are hashes
+    of the file's contents, its path, the checker's version and the
+    checker's configuration file. Rechecking unchanged files just reports
+    the cached diagnostics. Results persist in g.app.db.
+    """
+
+    link_pattern = re.compile(r'^(.*?):\s*([0-9]+)[,:]')
+        # m.group(2) is the line number.
+
+    def __init__(self, max_workers=None):
+        """Ctor for the CheckerService class."""
+        self.batches = []
+            # g.Bunches describing each call to check, oldest first.
+        self.executor = None
+            # The process pool, created on first use.
+        self.lock = threading.Lock()
+            # Protects the procs of all batches.
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+            # Leave one core for Leo's gui.
+        self.results = {}
+            # Keys are cache keys, values are (n_errors, lines).
+        self.thread_executor = None
+            # The thread pool running subprocesses, created on first use.
+        self.timer = None
+            # The IdleTime instance delivering results.
+        self.versions = {}
+            # Keys are checker names, values are their versions.
+    #@+others
+    #@+node:ekr.20261018051900.2: *3* service.check
+    def check(self, c, checker, files, config=None, wait=False):
+        """
+        Run checker, 'flake8', 'pyflakes' or 'pylint', on files, a list of
+        tuples (path, root). root is the @<file> position for path. config
+        is the path to the checker's configuration file, if any.
+
+        If wait is True, return the total number of errors after checking
+        all files. Otherwise, report a summary after checking all files.
+        """
+        t1 = time.time()
+        config_hash = self.hash_file(config)
+        jobs = []
+        for fn, root in files:
+            try:
+                with open(fn, 'rb') as f:
+                    contents = f.read()
+            except OSError:
+                g.es_print(f"{checker}: can not read {fn}")
+                continue
+            key = self.get_key(checker, config_hash, fn, contents)
+            result = self.get_result(key)
+            future = None
+            if result:
+                future = concurrent.futures.Future()
+                future.set_result(tuple(result) + (False,))
+                    # Don't cache the result again.
+            jobs.append(g.Bunch(fn=fn, root=root.copy(), key=key,
+                future=future, contents=contents))
+        unchecked = [z for z in jobs if not z.future]
+        batch = g.Bunch(c=c, checker=checker, jobs=jobs, errors=0,
+            cancelled=False, procs=set(),
+            n_cached=len(jobs) - len(unchecked), n_files=len(jobs), t1=t1, wait=wait)
+        if checker == 'pyflakes':
+            executor = self.get_executor() if len(unchecked) > 1 else None
+        else:
+            executor = self.get_thread_executor() if unchecked else None
+        for job in unchecked:
+            if executor and checker == 'pyflakes':
+                job.future = executor.submit(run_checker, checker, job.fn, job.contents, config)
+            elif executor:
+                command = checker_command(checker, job.fn, config)
+                job.future = executor.submit(self.run_command, batch, checker, command)
+            else:
+                job.future = concurrent.futures.Future()
+                try:
+                    job.future.set_result(run_checker(checker, job.fn, job.contents, config))
+                except Exception as e:
+                    job.future.set_exception(e)
+        for job in jobs:
+            job.contents = None
+        if wait:
+            self.deliver(batch, block=True)
+            return batch.errors
+        self.batches.append(batch)
+        if not self.timer:
+            timer = g.IdleTime(self.on_idle, delay=100, tag='CheckerService.on_idle')
+            if timer and not isinstance(timer, g.NullObject):
+                self.timer = timer
+                timer.start()
+            else:
+                # There is no idle-time handling. Report all results now.
+                self.batches.remove(batch)
+                self.deliver(batch, block=True)
+        return None
+    #@+node:ekr.20261018051900.3: *3* service.cancel & shutdown
+    def cancel(self, checker=None):
+        """
+        Cancel checking with the given checker, or all checkers,
+        killing all running checker subprocesses.
+        """
+        for batch in self.batches[:]:
+            if checker in (None, batch.checker):
+                with self.lock:
+                    batch.cancelled = True
+                    for proc in batch.procs:
+                        try:
+                            proc.kill()
+                        except OSError:
+                            pass  # The process has already finished.
+                for job in batch.jobs:
+                    job.future.cancel()
+                self.batches.remove(batch)
+                g.es_print(f"{batch.checker}: cancelled")
 
-        # Old code: Invoke g.run_pylint.
-            # args = ["fn=r'%s'" % (fn), "rc=r'%s'" % (rc_fn),]
-            # # When shell is True, it's recommended to pass a string, not a sequence.
-            # command = '%s -c "import leo.core.leoGlobals as g; g.run_pylint(%s)"' % (
-                # sys.executable, ','.join(args))
+    def shutdown(self):
+        """Cancel all checks and stop all worker processes."""
+        self.cancel()
+        if self.timer:
+            self.timer.stop()
+            self.timer = None
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        if self.thread_executor:
+            self.thread_executor.shutdown(wait=False)
+            self.thread_executor = None
+    #@+node:ekr.20261018051900.4: *3* service.deliver & on_idle
+    def deliver(self, batch, block):
+        """
+        Report the results of all checked files of the batch.
+        Wait for all files if block is True.
+        Return True if all files have been reported.
+        """
+        c = batch.c
+        for job in batch.jobs[:]:
+            if not block and not job.future.done():
+                continue
+            batch.jobs.remove(job)
+            try:
+                n_errors, lines, cacheable = job.future.result()
+            except Exception as e:
+                g.es_print(f"{batch.checker}: {g.shortFileName(job.fn)}: {e}")
+                continue
+            if cacheable:
+                self.put_result(job.key, n_errors, lines)
+            batch.errors += n_errors
+            if c.exists:
+                self.put_lines(c, job.root, lines)
+        if batch.jobs:
+            return False
+        if not batch.wait and c.exists:
+            g.es_print(
+                f"{batch.checker}: {batch.n_files} file{g.plural(batch.n_files)}, "
+                f"{batch.n_cached} cached, "
+                f"{batch.errors} problem{g.plural(batch.errors)} "
+                f"in {g.timeSince(batch.t1)}")
+        return True
+
+    def on_idle(self, timer):
+        """IdleTime handler: report the results of all checked files."""
+        if g.app.killed:
+            timer.stop()
+            return
+        for batch in self.batches[:]:
+            if self.deliver(batch, block=False):
+                self.batches.remove(batch)
+        if not self.batches:
+            timer.stop()
+            self.timer = None
+    #@+node:ekr.20261018051900.5: *3* service.put_lines
+    def put_lines(self, c, root, lines):
+        """Write lines to c's log, linking diagnostics to lines in root's tree."""
+        log = c.frame.log
+        unl = root.get_UNL(with_proto=True, with_count=True) if c.positionExists(root) else None
+        for s in lines:
+            g.pr(s)
+            m = self.link_pattern.match(s)
+            if unl and m:
+                log.put(s + '\n', nodeLink=f"{unl},{-int(m.group(2))}")
+            else:
+                log.put(s + '\n')
+    #@+node:ekr.20261018060204.3: *3* service.run_command
+    def run_command(self, batch, checker, command):
+        """
+        Run the checker's command in a subprocess, in a thread of the
+        thread pool. Return (n_errors, lines, cacheable).
+
+        cancel kills the subprocess.
+        """
+        with self.lock:
+            if batch.cancelled:
+                return 0, [], False
+            proc = subprocess.Popen(command,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            batch.procs.add(proc)
+        try:
+            out, err = proc.communicate()
+        finally:
+            with self.lock:
+                batch.procs.discard(proc)
+        return checker_result(checker, proc.returncode, out, err)
+    #@+node:ekr.20261018051900.6: *3* service.get_executor, get_key & hash_file
+    def get_executor(self):
+        """Return the process pool, or None if it can not be created."""
+        if not self.executor:
+            self.executor = g.process_pool(self.max_workers)
+        return self.executor
+
+    def get_thread_executor(self):
+        """Return the thread pool running checker subprocesses."""
+        if not self.thread_executor:
+            self.thread_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers)
+        return self.thread_executor
+
+    def get_key(self, checker, config_hash, fn, contents):
+        """Return the cache key for checking contents of fn."""
+        version = self.versions.get(checker)
+        if version is None:
+            try:
+                import importlib.metadata as metadata
+                version = metadata.version(checker)
+            except Exception:  # ImportError or PackageNotFoundError.
+                version = getattr(sys.modules.get(checker), '__version__', '')
+            self.versions[checker] = version
+        header = '\0'.join([checker, version, config_hash, sys.version, fn, ''])
+        return hashlib.sha1(header.encode('utf-8') + contents).hexdigest()
+
+    def hash_file(self, path):
+        """Return the hash of the file at path, or ''."""
+        if not path:
+            return ''
+        try:
+            with open(path, 'rb') as f:
+                return hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            return ''
+    #@+node:ekr.20261018051900.7: *3* service.get_result & put_result
+    def get_result(self, key):
+        """Return the cached (n_errors, lines) for key, or None."""
+        result = self.results.get(key)
+        if result is None and g.app.db:
+            result = g.app.db.get(f"checker-result:{key}")
+            if not isinstance(result, (list, tuple)):
+                result = None  # g.app.db may be a g.NullObject.
+        return result
+
+    def put_result(self, key, n_errors, lines):
+        """Cache the result of a check."""
+        self.results[key] = (n_errors, lines)
+        if g.app.db:
+            g.app.db[f"checker-result:{key}"] = [n_errors, lines]
+    #@-others
+#@+node:ekr.20261018051900.8: ** functions: get_checker_service, run_checker...
+def get_checker_service():
+    """Return g.app.checkerService, creating it if necessary."""
+    if not g.app.checkerService:
+        g.app.checkerService = CheckerService()
+    return g.app.checkerService
+
+def run_checker(checker, fn, contents, config):
+    """
+    Run the checker on fn, whose contents are given, usually in a worker
+    process.
+
+    Return (n_errors, lines, cacheable). lines are the checker's
+    diagnostics. cacheable is False if the checker failed.
+    """
+    if checker == 'pyflakes':
+        from pyflakes import api, reporter
+        stream = io.StringIO()
+        n = api.check(contents, g.shortFileName(fn), reporter.Reporter(stream, stream))
+        return n, [z for z in stream.getvalue().splitlines() if z.strip()], True
+    proc = subprocess.run(checker_command(checker, fn, config),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    return checker_result(checker, proc.returncode, proc.stdout, proc.stderr)
+
+def checker_command(checker, fn, config):
+    """Return the command that runs checker, 'flake8' or 'pylint', on fn."""
+    if checker == 'flake8':
+        return [sys.executable, '-m', 'flake8', f"--config={config}", fn]
+    if checker == 'pylint':
+        return [sys.executable, '-m', 'pylint', f"--rcfile={config}", fn]
+    raise ValueError(f"unknown checker: {checker}")
+
+def checker_result(checker, returncode, out, err):
+    """
+    Return (n_errors, lines, cacheable) for a checker subprocess that
+    exited with the given returncode, stdout and stderr.
+    """
+    lines = [z for z in out.splitlines() if z.strip()]
+    n = len([z for z in lines if CheckerService.link_pattern.match(z)])
+    if checker == 'flake8':
+        cacheable = returncode in (0, 1)
+    else:
+        # pylint's exit code is a bit mask. 1: fatal error, 32: usage error.
+        # Killed processes have negative exit codes.
+        cacheable = returncode >= 0 and not returncode & (1 | 32)
+    if not cacheable:
+        lines.extend(z for z in err.splitlines() if z.strip())
+    return n, lines, cacheable
+#@+node:ekr.20261018051900.9: ** class TestCheckerService
+class TestCheckerService(unittest.TestCase):
+    """Test cases for the CheckerService class."""
+    #@+others
+    #@+node:ekr.20261018051900.10: *3* test_get_key
+    def test_get_key(self):
+        x = CheckerService()
+        key = x.get_key('pyflakes', '', 'a.py', b'a = 1\n')
+        assert key == x.get_key('pyflakes', '', 'a.py', b'a = 1\n')
+        assert key != x.get_key('pyflakes', '', 'a.py', b'a = 2\n')
+        assert key != x.get_key('pyflakes', '', 'b.py', b'a = 1\n')
+        assert key != x.get_key('pyflakes', x.hash_file(__file__), 'a.py', b'a = 1\n')
+        assert key != x.get_key('pylint', '', 'a.py', b'a = 1\n')
+        m = x.link_pattern.match(r'C:\leo\a.py:12:5: E501 line too long')
+        assert m and m.group(2) == '12', m
+    #@+node:ekr.20261018060204.4: *3* test_cancel_kills_subprocesses
+    def test_cancel_kills_subprocesses(self):
+        x = CheckerService()
+        batch = g.Bunch(checker='pylint', jobs=[], cancelled=False, procs=set())
+        x.batches.append(batch)
+        command = [sys.executable, '-c', 'import time; time.sleep(60)']
+        try:
+            future = x.get_thread_executor().submit(x.run_command, batch, 'pylint', command)
+            t1 = time.time()
+            while not batch.procs and time.time() - t1 < 10:
+                time.sleep(0.01)
+            assert batch.procs
+            x.cancel('pylint')
+            n_errors, lines, cacheable = future.result(timeout=10)
+            assert not cacheable and not batch.procs and not x.batches
+            # Cancelled batches start no more subprocesses.
+            assert x.run_command(batch, 'pylint', command) == (0, [], False)
+        finally:
+            x.shutdown()
     #@-others
 #@-others
 #@@language python
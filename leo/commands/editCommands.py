@@ -296,6 +296,15 @@ class EditCommandsClass(BaseEditCommandsClass):
         """Dump, all of Leo's file caches."""
         g.app.global_cacher.dump()
         g.app.commander_cacher.dump()
+
+    @cmd('cache-stats')
+    def cacheStats(self, event=None):
+        """
+        Report the hit rates, sizes, size per commander key
+        and largest entries of Leo's file caches.
+        """
+        g.app.global_cacher.stats()
+        g.app.commander_cacher.stats()
     #@+node:ekr.20150514063305.118: *3* ec.doNothing
     @cmd('do-nothing')
     def doNothing(self, event):
@@ -233,10 +233,10 @@ class GoToCommands:
         """
         if gnx:
             gnx = g.toUnicode(gnx)
-            for p in root.self_and_subtree(copy=False):
+            for p in self.c.outlineIndex.positions_for_gnx(gnx):
                 if p.matchHeadline(vnodeName):
-                    if p.v.fileIndex == gnx:
-                        return p.copy(), True
+                    if p == root or root.isAncestorOf(p):
+                        return p, True
             return None, False
         return root, False
     #@+node:ekr.20100216141722.5627: *4* goto.find_root
@@ -254,8 +254,8 @@ class GoToCommands:
                     return p.copy(), fileName
         # Search the entire tree for joined nodes.
         # Bug fix: Leo 4.5.1: *must* search *all* positions.
-        for p in c.all_positions():
-            if p.v == p1.v and p != p1:
+        for p in c.outlineIndex.positions(p1.v):
+            if p != p1:
                 # Found a joined position.
                 for p2 in p.self_and_parents():
                     fileName = not p2.isAtAllNode() and p2.anyAtFileNodeName()
@@ -6,12 +6,17 @@
 #@+node:ekr.20120219194520.10463: ** << imports >> (leoApp)
 import leo.core.leoGlobals as g
 import leo.core.leoExternalFiles as leoExternalFiles
+import leo.core.leoStartupTracer as leoStartupTracer
 import base64
+import hashlib
 import importlib
 import io
+import json
 StringIO = io.StringIO
 import os
 import optparse
+import pickle
+import re
 import subprocess
 import string
 import sys
@@ -73,6 +78,39 @@ class IdleTimeManager:
         if self.timer:
             self.timer.start()
     #@-others
+#@+node:ekr.20261018053623.1: ** class LazyClassDict
+class LazyClassDict(dict):
+    """
+    A dict whose values are classes defined in importer or writer plugins.
+
+    A value may be a tuple (module_name, class_name). Getting such a value
+    imports the module and replaces the tuple by the class, or by None if
+    the module can not be imported.
+    """
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if isinstance(value, tuple):
+            module_name, class_name = value
+            try:
+                # Important: use importlib to give imported modules their fully qualified names.
+                m = importlib.import_module(module_name)
+                value = getattr(m, class_name)
+            except Exception:
+                g.es_exception()
+                g.warning(f"can not import {module_name}.{class_name}")
+                value = None
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def values(self):
+        return [self[key] for key in self]
 #@+node:ekr.20120209051836.10241: ** class LeoApp
 class LeoApp:
     """A class representing the Leo application itself.
@@ -130,6 +168,8 @@ class LeoApp:
             # The name of a binding to trace, or None.
         self.trace_setting = None
             # The name of a setting to trace, or None.
+        self.trace_startup = None
+            # The path to the startup trace, or None.
         self.translateToUpperCase = False
             # Never set to True.
         self.use_global_docks = False
@@ -234,6 +274,9 @@ class LeoApp:
             # The singleton leoCacher.CommanderCacher instance.
         self.commander_db = None
             # The singleton db, managed by g.app.commander_cacher.
+        self.checkerService = None
+            # The singleton checkerCommands.CheckerService instance.
+            # Created on first use.
         self.config = None
             # The singleton leoConfig instance.
         self.db = None
@@ -256,6 +299,8 @@ class LeoApp:
             # The singleton nodeIndices instance.
         self.pluginsController = None
             # The singleton PluginsManager instance.
+        self.searchService = None
+            # The singleton leoSearch.SearchService instance.
         self.sessionManager = None
             # The singleton SessionManager instance.
         # The Commands class...
@@ -267,12 +312,12 @@ class LeoApp:
         #@+<< LeoApp: global reader/writer data >>
         #@+node:ekr.20170302075110.1: *5* << LeoApp: global reader/writer data >>
         # From leoAtFile.py.
-        self.atAutoWritersDict = {}
-        self.writersDispatchDict = {}
+        self.atAutoWritersDict = LazyClassDict()
+        self.writersDispatchDict = LazyClassDict()
         # From leoImport.py
-        self.atAutoDict = {}
+        self.atAutoDict = LazyClassDict()
             # Keys are @auto names, values are scanner classes.
-        self.classDispatchDict = {}
+        self.classDispatchDict = LazyClassDict()
         #@-<< LeoApp: global reader/writer data >>
         #@+<< LeoApp: global status vars >>
         #@+node:ekr.20161028040054.1: *5* << LeoApp: global status vars >>
@@ -1354,7 +1399,8 @@ class LeoApp:
         g.app.saveWindowState(c)
         g.app.saveEditorDockState(c)
         g.app.commander_cacher.commit()
-            # store cache, but don't close it.
+        g.app.global_cacher.commit()
+            # store caches, but don't close them.
         # This may remove frame from the window list.
         if frame in g.app.windowList:
             g.app.destroyWindow(frame)
@@ -1404,6 +1450,10 @@ class LeoApp:
         if g.app.ipk:
             g.app.ipk.cleanup_consoles()
         g.app.destroyAllOpenWithFiles()
+        if g.app.searchService:
+            g.app.searchService.shutdown()
+        if g.app.checkerService:
+            g.app.checkerService.shutdown()
         if hasattr(g.app, 'pyzo_close_handler'):
             # pylint: disable=no-member
             g.app.pyzo_close_handler()
@@ -1551,8 +1601,9 @@ class LeoApp:
         d = g.app.atAutoDict
         for key in d:
             # pylint: disable=cell-var-from-loop
-            aClass = d.get(key)
-            if aClass and g.match_word(p.h, 0, key):
+            # Match the key first: getting the class may import its module.
+            aClass = g.match_word(p.h, 0, key) and d.get(key)
+            if aClass:
 
                 def scanner_for_at_auto_cb(c, parent, s, **kwargs):
                     try:
@@ -1967,6 +2018,10 @@ class LoadManager:
             # closeLeoWindow())
         self.theme_c = None
             # #1374.
+        self.settingsKey = None
+            # A string identifying globalSettingsDict and globalBindingsDict,
+            # or None if the global dicts can not be cached.
+            # Set by LM.readGlobalSettingsFiles.
     #@+node:ekr.20120211121736.10812: *3* LM.Directory & file utils
     #@+node:ekr.20120219154958.10481: *4* LM.completeFileName
     def completeFileName(self, fileName):
@@ -2184,22 +2239,21 @@ class LoadManager:
         # Step 2: look for the @string theme-name setting in the first loaded file.
         path = lm.files and lm.files[0]
         if path and g.os_path_exists(path):
-            # Tricky: we must call lm.computeLocalSettings *here*.
-            theme_c = lm.openSettingsFile(path)
-            if theme_c:
-                settings_d, junk_shortcuts_d = lm.computeLocalSettings(
-                    c=theme_c,
-                    settings_d=lm.globalSettingsDict,
-                    bindings_d=lm.globalBindingsDict,
-                    localFlag=False,
-                )
-                setting = settings_d.get_string_setting('theme-name')
-                if setting:
-                    tag = theme_c.shortFileName()
-                    path = resolve(setting, tag=tag)
-                    if path:
-                        # Caller (LM.readGlobalSettingsFiles) sets lm.theme_path
-                        return path
+            # Tricky: we must compute the local settings *here*.
+            junk_c, settings_d, junk_shortcuts_d, junk_key = lm.readSettingsFile(
+                fn=path,
+                settings_d=lm.globalSettingsDict,
+                bindings_d=lm.globalBindingsDict,
+                localFlag=False,
+                key=lm.settingsKey,
+            )
+            setting = settings_d.get_string_setting('theme-name')
+            if setting:
+                tag = g.shortFileName(path)
+                path = resolve(setting, tag=tag)
+                if path:
+                    # Caller (LM.readGlobalSettingsFiles) sets lm.theme_path
+                    return path
         #
         # Step 3: use the @string theme-name setting in myLeoSettings.leo.
         # Note: the setting should *never* appear in leoSettings.leo!
@@ -2337,18 +2391,18 @@ class LoadManager:
         isLeoSettings = g.shortFileName(fn).lower() == 'leosettings.leo'
         exists = g.os_path_exists(fn)
         if fn and exists and lm.isLeoFile(fn) and not isLeoSettings:
-            # Open the file usinging a null gui.
+            # Open the file using a null gui, unless its settings are cached.
+            # Merge the settings from fn into *copies* of the global dicts.
             try:
                 g.app.preReadFlag = True
-                c = lm.openSettingsFile(fn)
+                junk_c, d1, d2, junk_key = lm.readSettingsFile(fn,
+                    lm.globalSettingsDict,
+                    lm.globalBindingsDict,
+                    localFlag=True,
+                    key=lm.settingsKey)
+                        # d1 and d2 are copies.
             finally:
                 g.app.preReadFlag = False
-            # Merge the settings from c into *copies* of the global dicts.
-            d1, d2 = lm.computeLocalSettings(c,
-                lm.globalSettingsDict,
-                lm.globalBindingsDict,
-                localFlag=True)
-                    # d1 and d2 are copies.
             d1.setName(settingsName)
             d2.setName(shortcutsName)
             return PreviousSettings(d1, d2)
@@ -2526,6 +2580,10 @@ class LoadManager:
         Read leoSettings.leo and myLeoSettings.leo using a null gui.
         
         New in Leo 6.1: this sets ivars for the ActiveSettingsOutline class.
+        
+        The first call uses cached settings if possible, opening only the
+        settings files that have changed. Later calls, including those made
+        by the ActiveSettingsOutline class, open all settings files.
         """
         trace = 'themes' in g.app.debug
         lm = self
@@ -2534,30 +2592,35 @@ class LoadManager:
         old_commanders = g.app.commanders()
         lm.leo_settings_path = lm.computeLeoSettingsPath()
         lm.my_settings_path = lm.computeMyLeoSettingsPath()
-        lm.leo_settings_c = lm.openSettingsFile(self.leo_settings_path)
-        lm.my_settings_c = lm.openSettingsFile(self.my_settings_path)
+        # Parsing @mode nodes uses the previous global bindings,
+        # so only the first call can use cached settings.
+        cached = lm.globalBindingsDict is None and not (
+            g.app.trace_binding or g.app.trace_setting)
+        key = '' if cached else None
+        settings_d, bindings_d = lm.createDefaultSettingsDicts()
+        # Merge the settings dicts from each outline into
+        # *new copies of* settings_d and bindings_d.
+        lm.leo_settings_c, settings_d, bindings_d, key = lm.readSettingsFile(
+            lm.leo_settings_path, settings_d, bindings_d, localFlag=False, key=key)
+        lm.my_settings_c, settings_d, bindings_d, key = lm.readSettingsFile(
+            lm.my_settings_path, settings_d, bindings_d, localFlag=False, key=key)
         commanders = [lm.leo_settings_c, lm.my_settings_c]
         commanders = [z for z in commanders if z]
-        settings_d, bindings_d = lm.createDefaultSettingsDicts()
-        for c in commanders:
-            # Merge the settings dicts from c's outline into
-            # *new copies of* settings_d and bindings_d.
-            settings_d, bindings_d = lm.computeLocalSettings(
-                c, settings_d, bindings_d, localFlag=False)
         # Adjust the name.
         bindings_d.setName('lm.globalBindingsDict')
         lm.globalSettingsDict = settings_d
         lm.globalBindingsDict = bindings_d
+        lm.settingsKey = key
         # Add settings from --theme or @string theme-name files.
         # This must be done *after* reading myLeoSettigns.leo.
         lm.theme_path = lm.computeThemeFilePath()
         if lm.theme_path:
-            lm.theme_c = lm.openSettingsFile(lm.theme_path)
-            if lm.theme_c:
-                # Merge theme_c's settings into globalSettingsDict.
-                settings_d, junk_shortcuts_d = lm.computeLocalSettings(
-                    lm.theme_c, settings_d, bindings_d, localFlag=False)
+            # Merge the theme's settings into globalSettingsDict.
+            lm.theme_c, settings_d, junk_shortcuts_d, theme_key = lm.readSettingsFile(
+                lm.theme_path, settings_d, bindings_d, localFlag=False, key=key)
+            if lm.theme_c or theme_key:
                 lm.globalSettingsDict = settings_d
+                lm.settingsKey = theme_key
                 # Set global vars
                 g.app.theme_directory = g.os_path_dirname(lm.theme_path)
                     # Used by the StyleSheetManager.
@@ -2577,6 +2640,172 @@ class LoadManager:
         for c in commanders:
             if c not in old_commanders:
                 g.app.forgetOpenFile(c.fileName())
+    #@+node:ekr.20261018054204.1: *4* LM.readSettingsFile & helpers
+    settings_cache_format = 1  # Change this to invalidate all cached settings.
+    ifenv_pattern = re.compile(rb'@ifenv\s+([^,<\s]+)')
+        # Finds the names of environment variables tested by @ifenv nodes.
+
+    config_ivars = (
+        'buttonsFileName', 'enabledPluginsFileName', 'enabledPluginsString',
+        'menusFileName', 'menusList',
+    )  # The g.app.config ivars that settings files may set.
+
+    def readSettingsFile(self, fn, settings_d, bindings_d, localFlag, key):
+        """
+        Merge the settings in fn into *new copies of* settings_d and
+        bindings_d, like lm.computeLocalSettings.
+        
+        key is a string identifying settings_d and bindings_d, or None. If key
+        is a string, the merged settings are cached in g.app.db, keyed by key
+        and the modification time, size and hash of fn. fn is opened with a
+        null gui only if its cached settings are out of date.
+        
+        Return (c, settings_d, bindings_d, key), where c is fn's commander or
+        None, and key identifies the merged dicts or is None.
+        """
+        lm = self
+        if not fn or not g.os_path_exists(fn):
+            return None, settings_d, bindings_d, key
+        db_key, key = lm.computeSettingsCacheKey(fn, localFlag, key)
+        entry = lm.readSettingsCache(db_key)
+        if entry and entry.get('key') == key:
+            lm.restoreConfigIvars(entry['config'])
+            if entry['settings'] is not None:
+                settings_d = entry['settings']
+            if entry['bindings'] is not None:
+                bindings_d = entry['bindings']
+            return None, settings_d, bindings_d, key
+        before = lm.saveConfigIvars()
+        c = lm.openSettingsFile(fn)
+        if not c:
+            return None, settings_d, bindings_d, None
+        settings_d2, bindings_d2 = lm.computeLocalSettings(
+            c, settings_d, bindings_d, localFlag)
+        config = lm.diffConfigIvars(before)
+        if db_key and config is not None:
+            lm.writeSettingsCache(db_key, {
+                'key': key,
+                'config': config,
+                # None: fn contains no settings of this kind.
+                'settings': None if settings_d2 is settings_d else settings_d2,
+                'bindings': None if bindings_d2 is bindings_d else bindings_d2,
+            })
+        return c, settings_d2, bindings_d2, key
+    #@+node:ekr.20261018054204.2: *5* LM.computeSettingsCacheKey
+    def computeSettingsCacheKey(self, fn, localFlag, key):
+        """
+        Return (db_key, key) for the settings in fn, merged into the dicts
+        identified by key. db_key is the settings' key in g.app.db. Return
+        (None, None) if key is None.
+        """
+        if key is None:
+            return None, None
+        lm = self
+        path = os.path.normcase(g.os_path_finalize(fn))
+        # Include the code that parses settings, and the defaults it defines.
+        code = [g.os_path_join(g.app.loadDir, z)
+            for z in ('leoApp.py', 'leoConfig.py', 'leoGlobals.py')]
+        try:
+            with open(path, 'rb') as f:
+                contents = f.read()
+            stamps = [(stat.st_mtime_ns, stat.st_size)
+                for stat in [os.stat(z) for z in [path] + code]]
+        except OSError:
+            return None, None
+        # Include everything that @ifplatform, @ifhostname and @ifenv test.
+        names = sorted(set(z.decode('utf-8', 'replace')
+            for z in self.ifenv_pattern.findall(contents)))
+        environment = [(z, os.getenv(z)) for z in names]
+        data = [
+            self.settings_cache_format, list(sys.version_info[:2]),
+            key, path, localFlag, hashlib.sha1(contents).hexdigest(), stamps,
+            sys.platform, lm.computeMachineName(), environment,
+        ]
+        key = hashlib.sha1(repr(data).encode('utf-8')).hexdigest()
+        name = hashlib.sha1(f"{path}:{localFlag}".encode('utf-8')).hexdigest()
+        return f"settings-cache:{name}", key
+    #@+node:ekr.20261018054204.3: *5* LM.readSettingsCache & writeSettingsCache
+    def readSettingsCache(self, db_key):
+        """Return the entry cached in g.app.db at db_key, or None."""
+        # g.app.db may be a dict or a g.NullObject.
+        data = g.app.db.get(db_key) if db_key and g.app.db else None
+        if not isinstance(data, bytes):
+            return None
+        try:
+            return pickle.loads(data)
+        except Exception:
+            return None  # A corrupt or outdated entry.
+
+    def writeSettingsCache(self, db_key, entry):
+        """
+        Cache the entry in g.app.db at db_key.
+        Do nothing if the entry contains positions, vnodes or commanders.
+        """
+        if not g.app.db:
+            return
+        import leo.core.leoCommands as leoCommands
+        import leo.core.leoNodes as leoNodes
+        outline_types = (leoCommands.Commands, leoNodes.Position, leoNodes.VNode)
+
+        class Pickler(pickle.Pickler):
+
+            def persistent_id(self, obj):
+                if isinstance(obj, outline_types):
+                    raise pickle.PicklingError(f"can not cache {obj!r}")
+                return None
+
+        f = io.BytesIO()
+        try:
+            Pickler(f, pickle.HIGHEST_PROTOCOL).dump(entry)
+        except (AttributeError, RecursionError, TypeError, pickle.PicklingError):
+            return  # Don't cache settings that can't be pickled.
+        g.app.db[db_key] = f.getvalue()
+        # Settings are read at startup: let other Leo processes use them now.
+        if g.app.global_cacher:
+            g.app.global_cacher.commit()
+    #@+node:ekr.20261018054204.4: *5* LM.saveConfigIvars, diffConfigIvars & restoreConfigIvars
+    def saveConfigIvars(self):
+        """Return a snapshot of the g.app.config data that settings files may set."""
+        config = g.app.config
+        return g.Bunch(
+            ivars={z: getattr(config, z, None) for z in self.config_ivars},
+            context_menus=dict(getattr(config, 'context_menus', {})),
+            modes=dict(config.modeCommandsDict.items()),
+            n_buttons=len(config.atCommonButtonsList),
+            n_commands=len(config.atCommonCommandsList),
+        )
+
+    def diffConfigIvars(self, before):
+        """
+        Return a dict describing the changes to g.app.config since the given
+        snapshot, or None if the changes can't be cached.
+        """
+        config = g.app.config
+        if (len(config.atCommonButtonsList) != before.n_buttons or
+            len(config.atCommonCommandsList) != before.n_commands
+        ):
+            return None  # @button and @command nodes are positions.
+
+        def diff(old, new):
+            return {key: val for key, val in new.items() if old.get(key) is not val}
+
+        return {
+            'ivars': diff(before.ivars, {z: getattr(config, z, None) for z in self.config_ivars}),
+            'context_menus': diff(before.context_menus, getattr(config, 'context_menus', {})),
+            'modes': diff(before.modes, dict(config.modeCommandsDict.items())),
+        }
+
+    def restoreConfigIvars(self, changes):
+        """Apply the changes returned by lm.diffConfigIvars to g.app.config."""
+        config = g.app.config
+        for ivar, val in changes['ivars'].items():
+            setattr(config, ivar, val)
+        if changes['context_menus']:
+            if not hasattr(config, 'context_menus'):
+                config.context_menus = {}
+            config.context_menus.update(changes['context_menus'])
+        for modeName, modeDict in changes['modes'].items():
+            config.modeCommandsDict[modeName] = modeDict
     #@+node:ekr.20120214165710.10838: *4* LM.traceSettingsDict
     def traceSettingsDict(self, d, verbose=False):
         if verbose:
@@ -2604,46 +2833,56 @@ class LoadManager:
         """Load the indicated file"""
         lm = self
         t1 = time.process_time()
-        # Phase 1: before loading plugins.
-        # Scan options, set directories and read settings.
-        print('')  # Give some separation for the coming traces.
-        if not lm.isValidPython():
-            return
-        lm.doPrePluginsInit(fileName, pymacs)
-            # sets lm.options and lm.files
-        g.app.computeSignon()
-        g.app.printSignon()
-        if lm.options.get('version'):
-            return
-        if not g.app.gui:
-            return
-        g.app.disable_redraw = True
-            # Disable redraw until all files are loaded.
-        #
-        # Phase 2: load plugins: the gui has already been set.
-        g.doHook("start1")
-        if g.app.killed:
-            return
-        g.app.idleTimeManager.start()
-        #
-        # Phase 3: after loading plugins. Create one or more frames.
-        if lm.options.get('script') and not self.files:
-            ok = True
-        else:
-            ok = lm.doPostPluginsInit()
-            # Fix #579: Key bindings don't take for commands defined in plugins
-            g.app.makeAllBindings()
-            if ok and g.app.diff:
-                lm.doDiff()
-        if not ok:
-            return
-        g.app.restoreGlobalWindowState()
-        g.es('')  # Clears horizontal scrolling in the log pane.
-        if g.app.listen_to_log_flag:
-            g.app.listenToLog()
-        if 'startup' in g.app.debug:
-            t2 = time.process_time()
-            g.es_print(f"startup time: {t2 - t1:5.2f} sec")
+        leoStartupTracer.start_from_argv()
+            # runLeo.py starts tracing before importing Leo's modules.
+        try:
+            # Phase 1: before loading plugins.
+            # Scan options, set directories and read settings.
+            print('')  # Give some separation for the coming traces.
+            if not lm.isValidPython():
+                return
+            with leoStartupTracer.phase('doPrePluginsInit'):
+                lm.doPrePluginsInit(fileName, pymacs)
+                    # sets lm.options and lm.files
+            g.app.computeSignon()
+            g.app.printSignon()
+            if lm.options.get('version'):
+                return
+            if not g.app.gui:
+                return
+            g.app.disable_redraw = True
+                # Disable redraw until all files are loaded.
+            #
+            # Phase 2: load plugins: the gui has already been set.
+            with leoStartupTracer.phase('load plugins'):
+                g.doHook("start1")
+            if g.app.killed:
+                return
+            g.app.idleTimeManager.start()
+            #
+            # Phase 3: after loading plugins. Create one or more frames.
+            if lm.options.get('script') and not self.files:
+                ok = True
+            else:
+                with leoStartupTracer.phase('doPostPluginsInit'):
+                    ok = lm.doPostPluginsInit()
+                # Fix #579: Key bindings don't take for commands defined in plugins
+                with leoStartupTracer.phase('makeAllBindings'):
+                    g.app.makeAllBindings()
+                if ok and g.app.diff:
+                    lm.doDiff()
+            if not ok:
+                return
+            g.app.restoreGlobalWindowState()
+            g.es('')  # Clears horizontal scrolling in the log pane.
+            if g.app.listen_to_log_flag:
+                g.app.listenToLog()
+            if 'startup' in g.app.debug:
+                t2 = time.process_time()
+                g.es_print(f"startup time: {t2 - t1:5.2f} sec")
+        finally:
+            # Report the trace however Leo exits.
+            leoStartupTracer.finish(g.app.trace_startup)
         g.app.gui.runMainLoop()
         # For scripts, the gui is a nullGui.
         # and the gui.setScript has already been called.
@@ -2673,8 +2912,9 @@ class LoadManager:
             try:  # #1403.
                 for n, fn in enumerate(lm.files):
                     lm.more_cmdline_files = n < len(lm.files) - 1
-                    c = lm.loadLocalFile(fn, gui=g.app.gui, old_c=None)
-                        # Returns None if the file is open in another instance of Leo.
+                    with leoStartupTracer.phase(f"loadLocalFile {g.shortFileName(fn)}"):
+                        c = lm.loadLocalFile(fn, gui=g.app.gui, old_c=None)
+                            # Returns None if the file is open in another instance of Leo.
                     if c and not c1:  # #1416:
                         c1 = c
             except Exception:
@@ -2700,8 +2940,9 @@ class LoadManager:
         g.app.disable_redraw = False
         if not c1:
             try:  # #1403.
-                c1 = lm.openEmptyWorkBook()
-                    # Calls LM.loadLocalFile.
+                with leoStartupTracer.phase('openEmptyWorkBook'):
+                    c1 = lm.openEmptyWorkBook()
+                        # Calls LM.loadLocalFile.
             except Exception:
                 g.es_print('Can not create empty workbook')
                 g.es_exception()
@@ -2793,10 +3034,11 @@ class LoadManager:
         lm.reportDirectories(verbose)
         # Read settings *after* setting g.app.config and *before* opening plugins.
         # This means if-gui has effect only in per-file settings.
-        lm.readGlobalSettingsFiles()
-            # reads only standard settings files, using a null gui.
-            # uses lm.files[0] to compute the local directory
-            # that might contain myLeoSettings.leo.
+        with leoStartupTracer.phase('readGlobalSettingsFiles'):
+            lm.readGlobalSettingsFiles()
+                # reads only standard settings files, using a null gui.
+                # uses lm.files[0] to compute the local directory
+                # that might contain myLeoSettings.leo.
         # Read the recent files file.
         localConfigFile = lm.files[0] if lm.files else None
         g.app.recentFilesManager.readRecentFiles(localConfigFile)
@@ -2819,44 +3061,29 @@ class LoadManager:
             # Was a LeoImportCommands method.
     #@+node:ekr.20140724064952.18037: *6* LM.createImporterData & helper
     def createImporterData(self):
-        """Create the data structures describing importer plugins."""
-        # Allow plugins to be defined in ~/.leo/plugins.
-        plugins1 = g.os_path_finalize_join(g.app.homeDir, '.leo', 'plugins')
-        plugins2 = g.os_path_finalize_join(g.app.loadDir, '..', 'plugins')
-        for kind, plugins in (('home', plugins1), ('leo', plugins2)):
-            pattern = g.os_path_finalize_join(
-                g.app.loadDir, '..', 'plugins', 'importers', '*.py')
-            for fn in g.glob_glob(pattern):
-                sfn = g.shortFileName(fn)
-                if sfn != '__init__.py':
-                    try:
-                        module_name = sfn[:-3]
-                        # Important: use importlib to give imported modules
-                        # their fully qualified names.
-                        m = importlib.import_module(
-                            f"leo.plugins.importers.{module_name}")
-                        self.parse_importer_dict(sfn, m)
-                        # print('createImporterData', m.__name__)
-                    except Exception:
-                        g.warning(f"can not import leo.plugins.importers.{module_name}")
+        """
+        Create the data structures describing importer plugins.
+        
+        Importers are imported on first use: see LazyClassDict.
+        """
+        manifest = self.getPluginManifest('importers', 'importer_dict')
+        for sfn, importer_d in manifest.items():
+            self.parse_importer_dict(sfn, importer_d)
     #@+node:ekr.20140723140445.18076: *7* LM.parse_importer_dict
-    def parse_importer_dict(self, sfn, m):
+    def parse_importer_dict(self, sfn, importer_d):
         """
         Set entries in g.app.classDispatchDict, g.app.atAutoDict and
-        g.app.atAutoNames using entries in m.importer_dict.
+        g.app.atAutoNames using the importer_dict described in the manifest.
         """
-        importer_d = getattr(m, 'importer_dict', None)
         if importer_d:
             at_auto = importer_d.get('@auto', [])
             scanner_class = importer_d.get('class', None)
-            # scanner_name = scanner_class.__name__
             extensions = importer_d.get('extensions', [])
             if at_auto:
                 # Make entries for each @auto type.
                 d = g.app.atAutoDict
                 for s in at_auto:
                     d[s] = scanner_class
-                    g.app.atAutoDict[s] = scanner_class
                     g.app.atAutoNames.add(s)
             if extensions:
                 # Make entries for each extension.
@@ -2871,29 +3098,21 @@ class LoadManager:
             g.warning(f"leo/plugins/importers/{sfn} has no importer_dict")
     #@+node:ekr.20140728040812.17990: *6* LM.createWritersData & helper
     def createWritersData(self):
-        """Create the data structures describing writer plugins."""
+        """
+        Create the data structures describing writer plugins.
+        
+        Writers are imported on first use: see LazyClassDict.
+        """
         trace = False and 'createWritersData' not in g.app.debug_dict
             # Do *not* remove this trace.
         if trace:
             # Suppress multiple traces.
             g.app.debug_dict['createWritersData'] = True
-        g.app.writersDispatchDict = {}
-        g.app.atAutoWritersDict = {}
-        plugins1 = g.os_path_finalize_join(g.app.homeDir, '.leo', 'plugins')
-        plugins2 = g.os_path_finalize_join(g.app.loadDir, '..', 'plugins')
-        for kind, plugins in (('home', plugins1), ('leo', plugins2)):
-            pattern = g.os_path_finalize_join(g.app.loadDir,
-                '..', 'plugins', 'writers', '*.py')
-            for fn in g.glob_glob(pattern):
-                sfn = g.shortFileName(fn)
-                if sfn != '__init__.py':
-                    try:
-                        # Important: use importlib to give imported modules their fully qualified names.
-                        m = importlib.import_module(f"leo.plugins.writers.{sfn[:-3]}")
-                        self.parse_writer_dict(sfn, m)
-                    except Exception:
-                        g.es_exception()
-                        g.warning(f"can not import leo.plugins.writers.{sfn}")
+        g.app.writersDispatchDict = LazyClassDict()
+        g.app.atAutoWritersDict = LazyClassDict()
+        manifest = self.getPluginManifest('writers', 'writer_dict')
+        for sfn, writer_d in manifest.items():
+            self.parse_writer_dict(sfn, writer_d)
         if trace:
             g.trace('LM.writersDispatchDict')
             g.printDict(g.app.writersDispatchDict)
@@ -2901,25 +3120,23 @@ class LoadManager:
             g.printDict(g.app.atAutoWritersDict)
         # Creates problems: See #40.
     #@+node:ekr.20140728040812.17991: *7* LM.parse_writer_dict
-    def parse_writer_dict(self, sfn, m):
+    def parse_writer_dict(self, sfn, writer_d):
         """
         Set entries in g.app.writersDispatchDict and g.app.atAutoWritersDict
-        using entries in m.writers_dict.
+        using the writer_dict described in the manifest.
         """
-        writer_d = getattr(m, 'writer_dict', None)
         if writer_d:
             at_auto = writer_d.get('@auto', [])
             scanner_class = writer_d.get('class', None)
             extensions = writer_d.get('extensions', [])
+            # Don't use d.get: it would import the module of the previous class.
             if at_auto:
                 # Make entries for each @auto type.
                 d = g.app.atAutoWritersDict
                 for s in at_auto:
-                    aClass = d.get(s)
+                    aClass = dict.get(d, s)
                     if aClass and aClass != scanner_class:
-                        g.trace(
-                            f"{sfn}: duplicate {s} class {aClass.__name__} "
-                            f"in {m.__file__}:")
+                        g.trace(f"{sfn}: duplicate {s} class {aClass!r}")
                     else:
                         d[s] = scanner_class
                         g.app.atAutoNames.add(s)
@@ -2927,13 +3144,100 @@ class LoadManager:
                 # Make entries for each extension.
                 d = g.app.writersDispatchDict
                 for ext in extensions:
-                    aClass = d.get(ext)
+                    aClass = dict.get(d, ext)
                     if aClass and aClass != scanner_class:
                         g.trace(f"{sfn}: duplicate {ext} class", aClass, scanner_class)
                     else:
                         d[ext] = scanner_class
         elif sfn not in ('basewriter.py',):
             g.warning(f"leo/plugins/writers/{sfn} has no writer_dict")
+    #@+node:ekr.20261018053623.2: *6* LM.getPluginManifest & helpers
+    def getPluginManifest(self, kind, dict_name):
+        """
+        Return a dict describing the modules in leo/plugins/<kind>, *without*
+        importing them. Keys are short file names. Values are copies of the
+        module's <dict_name> dict whose 'class' entry is a tuple
+        (module_name, class_name), or None if the module has no such dict.
+        
+        The manifest is cached in ~/.leo/db/<kind>.json. Only modules whose
+        modification time or size differs from the cached values are
+        imported.
+        """
+        directory = g.os_path_finalize_join(g.app.loadDir, '..', 'plugins', kind)
+        path = (g.os_path_join(g.app.homeLeoDir, 'db', f"{kind}.json")
+            if g.app.homeLeoDir else None)
+        cached = self.readPluginManifest(path)
+        modules, changed = {}, False
+        for fn in sorted(g.glob_glob(g.os_path_join(directory, '*.py'))):
+            sfn = g.shortFileName(fn)
+            if sfn == '__init__.py':
+                continue
+            try:
+                stat = os.stat(fn)
+            except OSError:
+                continue
+            stamp = [stat.st_mtime_ns, stat.st_size]
+            entry = cached.get(sfn)
+            if not entry or entry.get('stamp') != stamp:
+                changed = True
+                ok, d = self.describePlugin(kind, sfn[:-3], dict_name)
+                if not ok:
+                    continue  # Try again next time.
+                entry = {'stamp': stamp, 'dict': d}
+            modules[sfn] = entry
+        if path and (changed or list(modules) != list(cached)):
+            self.writePluginManifest(path, modules)
+        result = {}
+        for sfn, entry in modules.items():
+            d = entry['dict']
+            if d and d.get('class'):
+                d = dict(d)
+                d['class'] = tuple(d['class'])
+            result[sfn] = d
+        return result
+    #@+node:ekr.20261018053623.3: *7* LM.describePlugin
+    def describePlugin(self, kind, module_name, dict_name):
+        """
+        Import leo.plugins.<kind>.<module_name>.
+        
+        Return (ok, d), where d describes the module's <dict_name> dict in
+        the format used by getPluginManifest.
+        """
+        try:
+            # Important: use importlib to give imported modules their fully qualified names.
+            m = importlib.import_module(f"leo.plugins.{kind}.{module_name}")
+        except Exception:
+            g.es_exception()
+            g.warning(f"can not import leo.plugins.{kind}.{module_name}")
+            return False, None
+        plugin_d = getattr(m, dict_name, None)
+        if not plugin_d:
+            return True, None
+        aClass = plugin_d.get('class')
+        d = {
+            'class': [aClass.__module__, aClass.__name__] if aClass else None,
+            'extensions': list(plugin_d.get('extensions', [])),
+            '@auto': list(plugin_d.get('@auto', [])),
+        }
+        return True, d
+    #@+node:ekr.20261018053623.4: *7* LM.readPluginManifest & writePluginManifest
+    plugin_manifest_format = 1  # Change this to invalidate all manifests.
+
+    def readPluginManifest(self, path):
+        """Return the modules of the cached manifest at path, or {}."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                d = json.load(f)
+            if d.get('format') == self.plugin_manifest_format:
+                return d.get('modules') or {}
+        except Exception:
+            pass  # A missing, corrupt or outdated manifest.
+        return {}
+
+    def writePluginManifest(self, path, modules):
+        """Cache the manifest at path, replacing any previous manifest atomically."""
+        d = {'format': self.plugin_manifest_format, 'modules': modules}
+        g.write_file_atomically(path, json.dumps(d).encode('utf-8'))
     #@+node:ekr.20120219154958.10478: *5* LM.createGui
     def createGui(self, pymacs):
         lm = self
@@ -3003,6 +3307,7 @@ class LoadManager:
         import leo.core.leoConfig as leoConfig
         import leo.core.leoNodes as leoNodes
         import leo.core.leoPlugins as leoPlugins
+        import leo.core.leoSearch as leoSearch
         import leo.core.leoSessions as leoSessions
         # Import leoIPython only if requested.  The import is quite slow.
         self.setStdStreams()
@@ -3021,6 +3326,7 @@ class LoadManager:
         g.app.recentFilesManager = RecentFilesManager()
         g.app.config = leoConfig.GlobalConfigManager()
         g.app.nodeIndices = leoNodes.NodeIndices(g.app.leoID)
+        g.app.searchService = leoSearch.SearchService()
         g.app.sessionManager = leoSessions.SessionManager()
         # Complete the plugins class last.
         g.app.pluginsController.finishCreate()
@@ -3111,6 +3417,7 @@ class LoadManager:
         add_other('--trace',        'add one or more strings to g.app.debug', m=trace_m)
         add_other('--trace-binding', 'trace commands bound to a key', m='KEY')
         add_other('--trace-setting', 'trace where named setting is set', m="NAME")
+        add_other('--trace-startup', 'write a trace of startup costs to PATH', m='PATH')
         add_bool('--use-docks',      'use qt dock widgets')
         add_other('--window-size',  'initial window size (height x width)', m='SIZE')
         add_other('--window-spot',  'initial window position (top x left)', m='SPOT')
@@ -3246,6 +3553,9 @@ class LoadManager:
         # --trace-setting=setting
         g.app.trace_setting = options.trace_setting
             # g.app.config does not exist yet.
+        #
+        # --trace-startup=path
+        g.app.trace_startup = options.trace_startup
     #@+node:ekr.20190923170528.1: *6* LM.doWindowSpotOption
     def doWindowSpotOption(self, options):
 
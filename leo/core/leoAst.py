@@ -1022,21 +1022,42 @@ class TokenOrderGenerator:
         self.node = None
             # The node being visited.
             # The parent of the about-to-be visited node.
+        self.px = -1
+            # Index of the previously synced token.
+        self.statement_stack = []
+            # The nearest statement node of each node in self.node_stack.
         self.tokens = tokens
             # The immutable list of input tokens.
         self.tree = tree
             # The tree of ast.AST nodes.
+        self.next_significant = self.make_significant_index(tokens)
+            # next_significant[i] is the index of the first significant
+            # token at or after tokens[i].
         #
         # Traverse the tree.
-        try:
-            while True:
-                next(self.visitor(tree))
-        except StopIteration:
-            pass
+        self.visit_tree(tree)
         #
         # Ensure that all tokens are patched.
         self.node = tree
         yield from self.gen_token('endmarker', '')
+    #@+node:ekr.20261018053049.1: *5* tog.make_significant_index
+    def make_significant_index(self, tokens):
+        """
+        Return a list mapping each index i into tokens to the index of the
+        first significant token at or after tokens[i].
+        
+        The list has an extra entry, len(tokens), so that callers can look up
+        the index following the last token.
+        """
+        n = len(tokens)
+        result = [n] * (n + 1)
+        next_i = n
+        for i in range(n - 1, -1, -1):
+            token = tokens[i]
+            if is_significant(token.kind, token.value):
+                next_i = i
+            result[i] = next_i
+        return result
     #@+node:ekr.20191229071733.1: *5* tog.init_from_file
     def init_from_file(self, filename):  # pragma: no cover
         """
@@ -1069,6 +1090,7 @@ class TokenOrderGenerator:
     #@+node:ekr.20191223052749.1: *4* tog: Traversal...
     #@+node:ekr.20191113063144.3: *5* tog.begin_visitor
     begin_end_stack = []
+    is_statement_d = {}  # Keys are ast classes, values are is_statement_node(node).
     node_index = 0  # The index into the node_stack.
     node_stack = []  # The stack of parent nodes.
 
@@ -1077,11 +1099,12 @@ class TokenOrderGenerator:
         # Update the stats.
         self.n_nodes += 1
         # Do this first, *before* updating self.node.
-        node.parent = self.node
-        if self.node:
-            children = getattr(self.node, 'children', [])
-            children.append(node)
-            self.node.children = children
+        parent = node.parent = self.node
+        if parent:
+            try:
+                parent.children.append(node)
+            except AttributeError:
+                parent.children = [node]
         # Inject the node_index field.
         assert not hasattr(node, 'node_index'), g.callers()
         node.node_index = self.node_index
@@ -1090,6 +1113,18 @@ class TokenOrderGenerator:
         self.begin_end_stack.append(node.__class__.__name__)
         # Push the previous node.
         self.node_stack.append(self.node)
+        # Remember the nearest statement node, as in find_statement_node.
+        cls = node.__class__
+        is_statement = self.is_statement_d.get(cls)
+        if is_statement is None:
+            is_statement = self.is_statement_d[cls] = (
+                not isinstance(node, ast.Module) and is_statement_node(node))
+        if is_statement:
+            self.statement_stack.append(node)
+        elif self.statement_stack and cls is not ast.Module:
+            self.statement_stack.append(self.statement_stack[-1])
+        else:
+            self.statement_stack.append(None)
         # Update self.node *last*.
         self.node = node
     #@+node:ekr.20200104032811.1: *5* tog.end_visitor
@@ -1101,6 +1136,7 @@ class TokenOrderGenerator:
         assert self.node == node, (repr(self.node), repr(node))
         # Restore self.node.
         self.node = self.node_stack.pop()
+        self.statement_stack.pop()
     #@+node:ekr.20200110162044.1: *5* tog.find_next_significant_token
     def find_next_significant_token(self):
         """
@@ -1109,28 +1145,47 @@ class TokenOrderGenerator:
         
         Return the token, or None. Never change self.px.
         """
-        px = self.px + 1
-        while px < len(self.tokens):
-            token = self.tokens[px]
-            px += 1
-            if is_significant_token(token):
-                return token
+        px = self.next_significant[self.px + 1]
+        if px < len(self.tokens):
+            return self.tokens[px]
         # This will never happen, because endtoken is significant.
         return None  # pragma: no cover
     #@+node:ekr.20191121180100.1: *5* tog.gen*
     # Useful wrappers...
+    #
+    # Visitors delegate to the results of these methods with "yield from".
+    # gen yields the nodes to be visited to visit_tree. The other methods
+    # sync tokens immediately and yield nothing.
 
     def gen(self, z):
-        yield from self.visitor(z)
+        """
+        Return a sequence of the ast nodes in z, which may be None, a node or
+        a list of nodes.
+        """
+        if z is None:
+            return ()
+        if isinstance(z, (list, tuple)):
+            result = []
+            for z2 in z:
+                if isinstance(z2, ast.AST):
+                    result.append(z2)
+                else:  # pragma: no cover
+                    # Some fields may contain ints or strings.
+                    assert isinstance(z2, (int, str)), z2.__class__.__name__
+            return result
+        return (z,)
 
     def gen_name(self, val):
-        yield from self.visitor(self.sync_name(val))
+        self.sync_name(val)
+        return ()
 
     def gen_op(self, val):
-        yield from self.visitor(self.sync_op(val))
+        self.sync_token('op', val)
+        return ()
 
     def gen_token(self, kind, val):
-        yield from self.visitor(self.sync_token(kind, val))
+        self.sync_token(kind, val)
+        return ()
     #@+node:ekr.20191113063144.7: *5* tog.sync_token & set_links
     px = -1  # Index of the previously synced token.
 
@@ -1157,28 +1212,35 @@ class TokenOrderGenerator:
             f"kind: {kind:>10}: val: {val!r}")
         #
         # Step one: Look for token T.
+        #           Only insignificant tokens precede the next significant
+        #           token, tokens[next_px], so T must be one of those tokens.
         old_px = px = self.px + 1
-        while px < len(self.tokens):
+        next_px = self.next_significant[px]
+        if not is_significant(kind, val):
+            # Skip insignificant tokens that don't match.
+            while px < next_px and (kind, val) != (tokens[px].kind, tokens[px].value):
+                px += 1
+        else:
+            px = next_px
+        if px == next_px:
+            if px >= len(tokens):  # pragma: no cover
+                raise AssignLinksError(
+                     f"       file: {self.filename}\n"
+                     f"Looking for: {kind}.{g.truncate(val, 40)}\n"
+                     f"      found: end of token list")
             token = tokens[px]
             if (kind, val) == (token.kind, token.value):
-                break  # Success.
-            if kind == token.kind == 'number':
+                pass  # Success.
+            elif kind == token.kind == 'number':
                 val = token.value
-                break  # Benign: use the token's value, a string, instead of a number.
-            if is_significant_token(token):  # pragma: no cover
+                    # Benign: use the token's value, a string, instead of a number.
+            else:  # pragma: no cover
                 line_s = f"line {token.line_number}:"
                 raise AssignLinksError(
                     f"       file: {self.filename}\n"
                     f"{line_s:>12} {token.line.strip()}\n"
                     f"Looking for: {kind}.{g.truncate(val, 40)!r}\n"
                     f"      found: {token.kind}.{token.value!r}\n")
-            # Skip the insignificant token.
-            px += 1
-        else:  # pragma: no cover
-            raise AssignLinksError(
-                 f"       file: {self.filename}\n"
-                 f"Looking for: {kind}.{g.truncate(val, 40)}\n"
-                 f"      found: end of token list")
         #
         # Step two: Assign *secondary* links only for newline tokens.
         #           Ignore all other non-significant tokens.
@@ -1210,7 +1272,10 @@ class TokenOrderGenerator:
         if token.kind == 'op' and token.value in ',()':
             return
         # *Always* remember the last statement.
-        statement = find_statement_node(node)
+        if node is self.node and self.statement_stack:
+            statement = self.statement_stack[-1]
+        else:
+            statement = find_statement_node(node)
         if statement:
             self.last_statement_node = statement
             assert not isinstance(self.last_statement_node, ast.Module)
@@ -1238,10 +1303,10 @@ class TokenOrderGenerator:
     # It's valid for these to return None.
 
     def sync_name(self, val):
-        aList = val.split('.')
-        if len(aList) == 1:
+        if '.' not in val:
             self.sync_token('name', val)
         else:
+            aList = val.split('.')
             for i, part in enumerate(aList):
                 self.sync_token('name', part)
                 if i < len(aList) - 1:
@@ -1255,33 +1320,40 @@ class TokenOrderGenerator:
         token list.
         """
         self.sync_token('op', val)
-    #@+node:ekr.20191113081443.1: *5* tog.visitor (calls begin/end_visitor)
+    #@+node:ekr.20191113081443.1: *5* tog.visitor (calls begin_visitor)
     def visitor(self, node):
-        """Given an ast node, return a *generator* from its visitor."""
-        # This saves a lot of tests.
+        """
+        Begin visiting the given ast node.
+        Return the *generator* from its visitor.
+        """
         trace = False
-        if node is None:
-            return
         if trace:
             # Keep this trace. It's useful.
-            cn = node.__class__.__name__ if node else ' '
-            caller1, caller2 = g.callers(2).split(',')
-            g.trace(f"{caller1:>15} {caller2:<14} {cn}")
-        # More general, more convenient.
-        if isinstance(node, (list, tuple)):
-            for z in node or []:
-                if isinstance(z, ast.AST):
-                    yield from self.visitor(z)
-                else:  # pragma: no cover
-                    # Some fields may contain ints or strings.
-                    assert isinstance(z, (int, str)), z.__class__.__name__
-            return
+            g.trace(f"{self.node.__class__.__name__:>15} {node.__class__.__name__}")
         # We *do* want to crash if the visitor doesn't exist.
         method = getattr(self, 'do_' + node.__class__.__name__)
-        # Allow begin/end visitor to be generators.
         self.begin_visitor(node)
-        yield from method(node)
-        self.end_visitor(node)
+        return method(node)
+    #@+node:ekr.20261018053049.2: *5* tog.visit_tree (calls end_visitor)
+    def visit_tree(self, tree):
+        """
+        Visit all nodes of the tree in token order.
+        
+        Visitors are generators that yield (via self.gen) the child nodes to
+        visit. This method runs the visitors of all nodes being visited from
+        an explicit stack, rather than recursively, so the depth of the tree
+        doesn't matter.
+        """
+        stack = [self.visitor(tree)]
+        while stack:
+            for node in stack[-1]:
+                # Visit node before resuming its parent's visitor.
+                stack.append(self.visitor(node))
+                break
+            else:
+                # The visitor on top of the stack is finished.
+                stack.pop()
+                self.end_visitor(self.node)
     #@+node:ekr.20191113063144.13: *4* tog: Visitors...
     #@+node:ekr.20191113063144.32: *5*  tog.keyword: not called!
     # keyword arguments supplied to call (NULL identifier for **kwargs)
@@ -4914,6 +4986,12 @@ class TestTOG(BaseTest):
         # contents, tokens, tree = self.make_data(contents)
         # dump_ast(tree)
     #@+node:ekr.20191227052446.14: *4* Expressions & operators...
+    #@+node:ekr.20261018053049.3: *5* test_deeply_nested_expression
+    def test_deeply_nested_expression(self):
+        # The TOG visits nodes without recursion.
+        contents = 'x = ' + ' + '.join(['a'] * 1000) + '\n'
+        contents, tokens, tree = self.make_data(contents)
+        assert tree and tokens[-1].kind == 'endmarker'
     #@+node:ekr.20191227052446.15: *5* test_attribute
     def test_attribute(self):
         contents = r"""\
@@ -8,6 +8,9 @@
 #@+node:ekr.20041005105605.2: ** << imports >> (leoAtFile)
 import leo.core.leoGlobals as g
 import leo.core.leoNodes as leoNodes
+import leo.core.signal_manager as sig
+import contextlib
+import hashlib
 import os
 import re
 import sys
@@ -55,8 +58,14 @@ class AtFile:
         self.yesToAll = False
         # User options: set in reloadSettings.
         self.checkPythonCodeOnWrite = False
+        self.readerProcesses = 0
         self.runPyFlakesOnWrite = False
         self.underindentEscapeString = '\\-'
+        # **Only** at.readAll manages these dicts.
+        self.prefetchedFiles = {}
+            # Keys are full paths, values are futures returning the results of scan_external_file.
+        self.scannedRecords = {}
+            # Keys are full paths, values are records created by scan_external_file.
         self.reloadSettings()
     #@+node:ekr.20171113152939.1: *5* at.reloadSettings
     def reloadSettings(self):
@@ -64,6 +73,7 @@ class AtFile:
         c = self.c
         self.checkPythonCodeOnWrite = c.config.getBool(
             'check-python-code-on-write', default=True)
+        self.readerProcesses = c.config.getInt('external-file-reader-processes') or 0
         self.runPyFlakesOnWrite = c.config.getBool(
             'run-pyflakes-on-write', default=False)
         self.underindentEscapeString = c.config.getString(
@@ -363,9 +373,89 @@ class AtFile:
                 # at.tab_width
         gnx2vnode = c.fileCommands.gnxDict
         contents = fromString or file_s
-        FastAtRead(c, gnx2vnode).read_into_root(contents, fileName, root)
+        records = at.scannedRecords.pop(fileName, None) if fileName else None
+        if fromString:
+            FastAtRead(c, gnx2vnode).read_into_root(contents, fileName, root)
+        elif records and at.readFromRecords(records, root):
+            # A worker process has parsed the file. See at.prefetchFiles.
+            at.saveSnapshot(contents, fileName, root)
+        elif not at.readFromSnapshot(contents, fileName, root):
+            if FastAtRead(c, gnx2vnode).read_into_root(contents, fileName, root):
+                at.saveSnapshot(contents, fileName, root)
         root.clearDirty()
         return True
+    #@+node:ekr.20261018040804.1: *6* at.readFromSnapshot, at.readFromRecords & at.saveSnapshot
+    # Snapshots are tuples (version, root_gnx, records).
+    # records[0] describes the root. Records are tuples (gnx, h, b, child_gnxs),
+    # created by tree_records.
+    snapshotVersion = 1
+
+    def readFromSnapshot(self, contents, fileName, root):
+        """
+        Rebuild root's tree from the cached snapshot of fileName if the
+        snapshot was made from exactly the given contents.
+
+        Return True if the tree has been rebuilt.
+        """
+        at = self
+        digest = at.snapshotHash(contents)
+        snapshot = g.app.commander_cacher.get_file_snapshot(fileName, digest)
+        if not snapshot:
+            return False
+        version, root_gnx, records = snapshot
+        if version != at.snapshotVersion or root_gnx != root.gnx:
+            return False
+        if at.readFromRecords(records, root):
+            return True
+        # Forget the snapshot: saveSnapshot won't replace it.
+        g.app.commander_cacher.put_file_snapshot(fileName, digest, None)
+        return False
+
+    def readFromRecords(self, records, root):
+        """
+        Rebuild root's tree from records. Return True if the tree has been
+        rebuilt, or False if the records contain clones of existing nodes.
+        """
+        c = self.c
+        if records[0][0] != root.gnx:
+            return False
+        # Parse the file if it contains clones of existing nodes.
+        gnx2vnode = c.fileCommands.gnxDict
+        if any(gnx in gnx2vnode for gnx, h, b, child_gnxs in records[1:]):
+            return False
+        root.v._deleteAllChildren()
+        root.v._bodyString = records[0][2]
+        vnodes = {root.gnx: root.v}
+        for gnx, h, b, child_gnxs in records[1:]:
+            v = leoNodes.VNode(context=c, gnx=gnx)
+            v._headString, v._bodyString = h, b
+            vnodes[gnx] = v
+        for gnx, h, b, child_gnxs in records:
+            v = vnodes[gnx]
+            v.children = [vnodes[z] for z in child_gnxs]
+            for child in v.children:
+                child.parents.append(v)
+        sig.emit(c, 'tree_changed', root.v)
+        return True
+
+    def saveSnapshot(self, contents, fileName, root):
+        """
+        Cache a snapshot of root's tree, just read from fileName.
+
+        Do nothing if the tree contains clones of nodes outside the tree.
+        readFromSnapshot would reject such snapshots.
+        """
+        at = self
+        records, vnodes = tree_records(root.v)
+        seen = set(v.gnx for v in vnodes)
+        if any(parent.gnx not in seen for v in vnodes[1:] for parent in v.parents):
+            return
+        snapshot = at.snapshotVersion, root.gnx, records
+        digest = at.snapshotHash(contents)
+        g.app.commander_cacher.put_file_snapshot(fileName, digest, snapshot)
+
+    def snapshotHash(self, contents):
+        return hashlib.md5(g.toEncodedString(contents)).hexdigest()
     #@+node:ekr.20100122130101.6174: *6* at.deleteTnodeList
     def deleteTnodeList(self, p):  # AtFile method.
         """Remove p's tnodeList."""
@@ -478,8 +568,18 @@ class AtFile:
         t1 = time.time()
         c.init_error_dialogs()
         files = at.findFilesToRead(force, root)
-        for p in files:
-            at.readFileAtPosition(force, p)
+        executor = at.prefetchFiles(files)
+        try:
+            for p in files:
+                at.readFileAtPosition(force, p)
+        finally:
+            if executor:
+                for future in at.prefetchedFiles.values():
+                    future.cancel()
+                executor.shutdown()
+            at.prefetchedFiles, at.scannedRecords = {}, {}
+        g.app.commander_cacher.commit()
+            # Write the snapshots cached by at.read.
         for p in files:
             p.v.clearDirty()
         if not g.unitTesting:
@@ -494,40 +594,68 @@ class AtFile:
     def findFilesToRead(self, force, root):
 
         c = self.c
-        p = root.copy()
+        # When force is False, root is c.rootPosition().
+        frames = root.self_and_subtree_frames() if force else c.all_frames()
         scanned_tnodes = set()
         files = []
-        after = p.nodeAfterTree() if force else None
-        while p and p != after:
-            data = (p.gnx, g.fullPath(c, p))
+        for frame in frames:
+            v = frame.v
+            # Create positions only for @<file> nodes. Nested @<file> nodes
+            # are not valid (#1134), so g.fullPath returns '' for other nodes.
+            p = frame.position() if v.anyAtFileNodeName() else None
+            data = (v.gnx, g.fullPath(c, p) if p else '')
             # skip clones referring to exactly the same paths.
             if data in scanned_tnodes:
-                p.moveToNodeAfterTree()
+                frames.skip_subtree()
                 continue
             scanned_tnodes.add(data)
-            if not p.h.startswith('@'):
-                p.moveToThreadNext()
-            elif p.isAtIgnoreNode():
-                if p.isAnyAtFileNode():
-                    c.ignored_at_file_nodes.append(p.h)
-                p.moveToNodeAfterTree()
+            if not v.h.startswith('@'):
+                pass
+            elif v.isAtIgnoreNode():
+                if v.isAnyAtFileNode():
+                    c.ignored_at_file_nodes.append(v.h)
+                frames.skip_subtree()
             elif (
-                p.isAtThinFileNode() or
-                p.isAtAutoNode() or
-                p.isAtEditNode() or
-                p.isAtShadowFileNode() or
-                p.isAtFileNode() or
-                p.isAtCleanNode()  # 1134.
+                v.isAtThinFileNode() or
+                v.isAtAutoNode() or
+                v.isAtEditNode() or
+                v.isAtShadowFileNode() or
+                v.isAtFileNode() or
+                v.isAtCleanNode()  # 1134.
             ):
-                files.append(p.copy())
-                p.moveToNodeAfterTree()
-            elif p.isAtAsisFileNode() or p.isAtNoSentFileNode():
+                files.append(p or frame.position())
+                frames.skip_subtree()
+            elif v.isAtAsisFileNode() or v.isAtNoSentFileNode():
                 # Note (see #1081): @asis and @nosent can *not* be updated automatically.
                 # Doing so using refresh-from-disk will delete all child nodes.
-                p.moveToNodeAfterTree()
-            else:
-                p.moveToThreadNext()
+                frames.skip_subtree()
         return files
+    #@+node:ekr.20261018040622.1: *6* at.prefetchFiles
+    def prefetchFiles(self, files):
+        """
+        Read, decode and parse the external files of the given @file and
+        @thin nodes in a pool of at.readerProcesses worker processes, using
+        scan_external_file. Return the pool, or None.
+
+        at.readFileToUnicode and at.read use the results. Creating and
+        linking vnodes happens in the main process, in the same order as
+        without workers, so clones of nodes in other files work as before.
+        """
+        at, c = self, self.c
+        at.prefetchedFiles, at.scannedRecords = {}, {}
+        files = [p for p in files if p.isAtThinFileNode() or p.isAtFileNode()]
+        if at.readerProcesses < 2 or len(files) < 2:
+            return None
+        executor = g.process_pool(at.readerProcesses)
+        if not executor:
+            return None
+        default_encoding = c.config.default_derived_file_encoding
+        for p in files:
+            path = g.fullPath(c, p)
+            if path and path not in at.prefetchedFiles:
+                at.prefetchedFiles[path] = executor.submit(
+                    scan_external_file, path, p.gnx, default_encoding)
+        return executor
     #@+node:ekr.20190108054803.1: *6* at.readFileAtPosition
     def readFileAtPosition(self, force, p):
         '''Read the @<file> node at p.'''
@@ -851,6 +979,17 @@ class AtFile:
         Returns the string, or None on failure.
         '''
         at = self
+        future = at.prefetchedFiles.pop(fileName, None)
+            # See at.prefetchFiles.
+        if future:
+            try:
+                result = future.result()
+            except Exception:
+                result = None  # Read the file here, reporting all errors.
+            if result:
+                s, at.encoding, at.scannedRecords[fileName] = result
+                at.initReadLine(s)
+                return s
         s = at.openFileHelper(fileName)
             # Catches all exceptions.
         if s is None:
@@ -1096,33 +1235,32 @@ class AtFile:
             # The Write @<file> Nodes command.
             # Write all nodes in the selected tree.
             root = c.p
-            p = c.p
-            after = p.nodeAfterTree()
+            frames = root.self_and_subtree_frames()
         else:
             # Write dirty nodes in the entire outline.
             root = c.rootPosition()
-            p = c.rootPosition()
-            after = None
+            frames = c.all_frames()
         seen = set()
         files = []
-        while p and p != after:
-            if p.isAtIgnoreNode() and not p.isAtAsisFileNode():
+        for frame in frames:
+            v = frame.v
+            if v.isAtIgnoreNode() and not v.isAtAsisFileNode():
                 # Honor @ignore in *body* text, but *not* in @asis nodes.
-                if p.isAnyAtFileNode():
-                    c.ignored_at_file_nodes.append(p.h)
-                p.moveToNodeAfterTree()
-            elif p.isAnyAtFileNode():
-                data = p.v, g.fullPath(c, p)
+                if v.isAnyAtFileNode():
+                    c.ignored_at_file_nodes.append(v.h)
+                frames.skip_subtree()
+            elif v.isAnyAtFileNode():
+                # Create positions only for @<file> nodes.
+                p = frame.position()
+                data = v, g.fullPath(c, p)
                 if data in seen:
                     if trace and force:
                         g.trace('Already seen', p.h)
                 else:
                     seen.add(data)
-                    files.append(p.copy())
+                    files.append(p)
                 # Don't scan nested trees???
-                p.moveToNodeAfterTree()
-            else:
-                p.moveToThreadNext()
+                frames.skip_subtree()
         # When scanning *all* nodes, we only actually write dirty nodes.
         if not force:
             files = [z for z in files if z.isDirty()]
@@ -1463,8 +1601,9 @@ class AtFile:
         at = self
         d = g.app.atAutoWritersDict
         for key in d:
-            aClass = d.get(key)
-            if aClass and g.match_word(root.h, 0, key):
+            # Match the key first: getting the class may import its module.
+            aClass = g.match_word(root.h, 0, key) and d.get(key)
+            if aClass:
 
                 def writer_for_at_auto_cb(root):
                     # pylint: disable=cell-var-from-loop
@@ -3726,11 +3865,96 @@ class FastAtRead:
         root.v._deleteAllChildren()
         delims, first_lines, start_i = data
         self.scan_lines(delims, first_lines, lines, path, start_i)
+        sig.emit(self.c, 'tree_changed', root.v)
+            # scan_lines sets the text of existing vnodes directly.
         if trace:
             t2 = time.process_time()
             g.trace(f"{t2 - t1:5.2f} sec. {path}")
         return True
     #@-others
+#@+node:ekr.20261018063047.1: ** class ScannedVNode
+class ScannedVNode:
+    """
+    A lightweight stand-in for leoNodes.VNode, used by scan_external_file.
+    Creating real vnodes requires g.app, which worker processes lack.
+    """
+
+    def __init__(self, context, gnx):
+        self.context = context
+        self.fileIndex = gnx
+        self._headString = 'newHeadline'
+        self._bodyString = ''
+        self.children = []
+        self.parents = []
+
+    @property
+    def gnx(self):
+        return self.fileIndex
+
+    @property
+    def h(self):
+        return self._headString
+#@+node:ekr.20261018063047.2: ** scan_external_file & tree_records
+def scan_external_file(path, root_gnx, default_encoding):
+    """
+    Read, decode and parse the external file of an @file or @thin node
+    whose gnx is root_gnx. at.prefetchFiles runs this in worker processes.
+
+    Return (contents, encoding, records), where records are as in
+    tree_records, or None if anything is unusual. at.read then reads the
+    file as usual, reporting all errors.
+    """
+    try:
+        with open(path, 'rb') as f:
+            s = f.read()
+        e, s = g.stripBOM(s)
+        if not e:
+            # Get the encoding from the @+leo sentinel, as in at.parseLeoSentinel.
+            s_temp = g.toUnicode(s, 'ascii', reportErrors=False)
+            lines = [z for z in g.splitLines(s_temp) if '@+leo' in z]
+            m = lines and FastAtRead.header_pattern.match(lines[0])
+            if not m or not m.group(1) or (m.group(2) and not m.group(3)):
+                return None
+            e = m.group(6) if m.group(5) else default_encoding
+            if e and e.endswith(','):
+                e = e[:-1]
+            if not g.isValidEncoding(e):
+                return None
+        contents = g.toUnicode(s, encoding=e).replace('\r\n', '\n')
+        x = FastAtRead(None, {})
+        x.VNode = ScannedVNode
+        x.path = path
+        x.root = g.Bunch(gnx=root_gnx, v=ScannedVNode(None, root_gnx))
+            # FastAtRead uses only root.gnx and root.v.
+        lines = g.splitLines(contents.replace('\r', ''))
+        data = x.scan_header(lines)
+        if not data:
+            return None
+        delims, first_lines, start = data
+        root_v, last_lines = x.scan_lines(delims, first_lines, lines, path, start)
+        if not root_v:
+            return None
+        records, vnodes = tree_records(root_v)
+        return contents, e, records
+    except Exception:
+        return None
+
+def tree_records(root_v):
+    """
+    Return (records, vnodes) for root_v's tree, in outline order, without
+    duplicates. records[0] describes root_v. Records are tuples
+    (gnx, h, b, child_gnxs).
+    """
+    records, seen, todo, vnodes = [], set(), [root_v], []
+    while todo:
+        v = todo.pop()
+        if v.gnx not in seen:
+            seen.add(v.gnx)
+            vnodes.append(v)
+            records.append((v.gnx, v._headString, v._bodyString,
+                [z.gnx for z in v.children]))
+            todo.extend(reversed(v.children))
+    return records, vnodes
 #@+node:ekr.20200204092455.1: ** class TestAtFile
 class TestAtFile(unittest.TestCase):
     #@+others
@@ -3745,6 +3969,28 @@ class TestAtFile(unittest.TestCase):
             silent=True,
             verbose=False,
         )
+    #@+node:ekr.20261018061645.1: *4* TestAtFile.temp_caches
+    @contextlib.contextmanager
+    def temp_caches(self, directory):
+        """
+        A context manager that puts g.app.db, g.app.commander_db and all
+        other files Leo writes to ~/.leo into the given directory.
+        """
+        app = g.app
+        old = (app.homeLeoDir, app.global_cacher, app.db,
+            app.commander_cacher, app.commander_db)
+        app.homeLeoDir = directory
+        app.setGlobalDb()
+        try:
+            yield
+        finally:
+            for cacher in (app.global_cacher, app.commander_cacher):
+                try:
+                    cacher.db.close()
+                except Exception:
+                    pass  # Closing the last commander closes the caches.
+            (app.homeLeoDir, app.global_cacher, app.db,
+                app.commander_cacher, app.commander_db) = old
     #@+node:ekr.20200204112501.1: *4* TestAtFile.temp_dir
     def temp_dir(self):
         """Create a temp file with the given name."""
@@ -3759,36 +4005,146 @@ class TestAtFile(unittest.TestCase):
         warnings.simplefilter("ignore")
         import tempfile
         return tempfile.NamedTemporaryFile(mode='w')
-    #@+node:ekr.20200204094139.1: *3* TestAtFile.test_save_after_external_file_rename
-    def test_save_after_external_file_rename(self):
-        """Test #1469."""
-        import os
-        # Create a new outline with @file node and save it
+    #@+node:ekr.20261018040804.3: *3* TestAtFile.test_read_from_snapshot
+    def test_read_from_snapshot(self):
+        """Test at.readFromSnapshot."""
         bridge = self.bridge()
         temp_dir = self.temp_dir()
-        filename = f"{temp_dir.name}{os.sep}test_file.leo"
+        with self.temp_caches(temp_dir.name):
+            self.check_snapshots(bridge, temp_dir.name)
+
+    def check_snapshots(self, bridge, directory):
+        """Create, read and reread an outline in directory."""
+        import os
+        from unittest import mock
+        filename = f"{directory}{os.sep}test_file.leo"
         c = bridge.openLeoFile(filename)
-        p = c.rootPosition()
-        p.h = '@file 1'
-        p.b = 'b1'
+        root = c.rootPosition()
+        root.h = '@file snapshot.py'
+        root.b = '@others\n'
+        child = root.insertAsLastChild()
+        child.h = 'child'
+        child.b = '@others\n'
+        grand_child = child.insertAsLastChild()
+        grand_child.h = 'grand child'
+        grand_child.b = 'a = 1\n'
+        child.clone()
         c.save()
-        # Rename the @file node and save
-        p1 = c.rootPosition()
-        p1.h = "@file 1_renamed"
+
+        def outline(c):
+            return [(p.level(), p.gnx, p.h, p.b, len(p.v.parents))
+                for p in c.all_positions()]
+
+        expected = outline(c)
+        c.close()
+        # The first read parses the file and caches the snapshot.
+        c = bridge.openLeoFile(filename)
+        self.assertEqual(outline(c), expected)
+        c.close()
+        # The second read uses the snapshot.
+        with mock.patch.object(FastAtRead, 'read_into_root') as read_into_root:
+            c = bridge.openLeoFile(filename)
+        read_into_root.assert_not_called()
+        self.assertEqual(outline(c), expected)
+        # Clone a node of the @file tree outside the tree.
+        c.rootPosition().firstChild().clone().moveAfter(c.rootPosition())
         c.save()
-        # Remove the original "@file 1" from the disk
-        external_filename = f"{temp_dir.name}{os.sep}1"
-        assert os.path.exists(external_filename)
-        os.remove(external_filename)
-        assert not os.path.exists(external_filename)
-        # Change the @file contents, save and reopen the outline
-        p1.b = "b_1_changed"
+        expected = outline(c)
+        c.close()
+        # Reads neither use nor save snapshots of such trees.
+        for i in range(2):
+            c = bridge.openLeoFile(filename)
+            self.assertEqual(outline(c), expected)
+            path = c.rootPosition().anyAtFileNodeName()
+            path = g.os_path_finalize_join(directory, path)
+            with open(path, 'rb') as f:
+                digest = c.atFileCommands.snapshotHash(f.read())
+            self.assertIsNone(g.app.commander_cacher.get_file_snapshot(path, digest))
+            c.close()
+    #@+node:ekr.20261018063047.3: *3* TestAtFile.test_read_with_worker_processes
+    def test_read_with_worker_processes(self):
+        """Test at.prefetchFiles and at.readFromRecords."""
+        bridge = self.bridge()
+        temp_dir = self.temp_dir()
+        with self.temp_caches(temp_dir.name):
+            self.check_worker_processes(bridge, temp_dir.name)
+
+    def check_worker_processes(self, bridge, directory):
+        """Read an outline in directory with and without worker processes."""
+        import os
+        from unittest import mock
+        filename = f"{directory}{os.sep}test_file.leo"
+        c = bridge.openLeoFile(filename)
+        root = c.rootPosition()
+        for i in range(3):
+            p = c.lastTopLevel().insertAfter() if i else root
+            p.h = f"@file worker{i}.py"
+            p.b = '@others\n'
+            child = p.insertAsLastChild()
+            child.h = f"child {i}"
+            child.b = '@others\n'
+            grand_child = child.insertAsLastChild()
+            grand_child.h = f"grand child {i}"
+            grand_child.b = f"a = {i} # \u00e9\n"
+            grand_child.clone()
+        # Clone a node of the last @file tree outside the tree.
+        c.lastTopLevel().firstChild().clone().moveAfter(c.lastTopLevel())
         c.save()
+
+        def outline(c):
+            return [(p.level(), p.gnx, p.h, p.b, len(p.v.parents))
+                for p in c.all_positions()]
+
+        expected = outline(c)
         c.close()
-        c = bridge.openLeoFile(c.fileName())
-        p1 = c.rootPosition()
-        assert p1.h == "@file 1_renamed", repr(p1.h)
-        assert p1.b == "b_1_changed\n", repr(p1.b)
+        reloadSettings = AtFile.reloadSettings
+
+        def use_workers(at):
+            reloadSettings(at)
+            at.readerProcesses = 2
+
+        with mock.patch.object(AtFile, 'reloadSettings', use_workers):
+            with mock.patch.object(AtFile, 'readFromSnapshot', return_value=False):
+                with mock.patch.object(FastAtRead, 'read_into_root', autospec=True,
+                    side_effect=FastAtRead.read_into_root,
+                ) as read_into_root:
+                    c = bridge.openLeoFile(filename)
+        self.assertEqual(outline(c), expected)
+        # Only the file containing the clone of an existing node is parsed here.
+        self.assertEqual(read_into_root.call_count, 1)
+        self.assertEqual(read_into_root.call_args[0][3].h, '@file worker2.py')
+        c.close()
+    #@+node:ekr.20200204094139.1: *3* TestAtFile.test_save_after_external_file_rename
+    def test_save_after_external_file_rename(self):
+        """Test #1469."""
+        import os
+        # Create a new outline with @file node and save it
+        bridge = self.bridge()
+        temp_dir = self.temp_dir()
+        with self.temp_caches(temp_dir.name):
+            filename = f"{temp_dir.name}{os.sep}test_file.leo"
+            c = bridge.openLeoFile(filename)
+            p = c.rootPosition()
+            p.h = '@file 1'
+            p.b = 'b1'
+            c.save()
+            # Rename the @file node and save
+            p1 = c.rootPosition()
+            p1.h = "@file 1_renamed"
+            c.save()
+            # Remove the original "@file 1" from the disk
+            external_filename = f"{temp_dir.name}{os.sep}1"
+            assert os.path.exists(external_filename)
+            os.remove(external_filename)
+            assert not os.path.exists(external_filename)
+            # Change the @file contents, save and reopen the outline
+            p1.b = "b_1_changed"
+            c.save()
+            c.close()
+            c = bridge.openLeoFile(c.fileName())
+            p1 = c.rootPosition()
+            assert p1.h == "@file 1_renamed", repr(p1.h)
+            assert p1.b == "b_1_changed\n", repr(p1.b)
     #@-others
 #@-others
 if __name__ == '__main__':
@@ -18,8 +18,13 @@ except ImportError:
 
     g.command = command
 
+import argparse
+import hashlib
+import json
 import os
+import sys
 import time
+import unittest
 
 try:
     # pylint: disable=import-error
@@ -78,32 +83,10 @@ def orange_files(event):
     c = event.get('c')
     if not c or not c.p:
         return
-    t1 = time.process_time()
     tag = 'beautify-files'
     g.es(f"{tag}...")
     settings = orange_settings(c)
-    roots = g.findRootsWithPredicate(c, c.p)
-    n_changed = 0
-    for root in roots:
-        filename = g.fullPath(c, root)
-        if os.path.exists(filename):
-            print('')
-            print(f"{tag}: {g.shortFileName(filename)}")
-            changed = leoAst.Orange(settings=settings).beautify_file(filename)
-            if changed:
-                n_changed += 1
-            changed_s = 'changed' if changed else 'unchanged'
-            g.es(f"{changed_s:>9}: {g.shortFileName(filename)}")
-        else:
-            print('')
-            print(f"{tag}: file not found:{filename}")
-            g.es(f"{tag}: file not found:\n{filename}")
-    t2 = time.process_time()
-    print('')
-    g.es_print(
-        f"total files: {len(roots)}, "
-        f"changed files: {n_changed}, "
-        f"in {t2 - t1:5.2f} sec.")
+    beautify_roots(c, tag, ProjectBeautifier('beautify', settings=settings))
 #@+node:ekr.20200103055814.1: *4* blacken-files
 @g.command('blacken-files')
 def blacken_files(event):
@@ -152,30 +135,9 @@ def fstringify_files(event):
     c = event.get('c')
     if not c or not c.p:
         return
-    t1 = time.process_time()
     tag = 'fstringify-files'
     g.es(f"{tag}...")
-    roots = g.findRootsWithPredicate(c, c.p)
-    n_changed = 0
-    for root in roots:
-        filename = g.fullPath(c, root)
-        if os.path.exists(filename):
-            print('')
-            print(g.shortFileName(filename))
-            changed = leoAst.Fstringify().fstringify_file(filename)
-            changed_s = 'changed' if changed else 'unchanged'
-            if changed: n_changed += 1
-            g.es_print(f"{changed_s:>9}: {g.shortFileName(filename)}")
-        else:
-            print('')
-            print(f"File not found:{filename}")
-            g.es(f"File not found:\n{filename}")
-    t2 = time.process_time()
-    print('')
-    g.es_print(
-        f"total files: {len(roots)}, "
-        f"changed files: {n_changed}, "
-        f"in {t2 - t1:5.2f} sec.")
+    beautify_roots(c, tag, ProjectBeautifier('fstringify'))
 #@+node:ekr.20200103055858.1: *4* fstringify-files-diff
 @g.command('diff-fstringify-files')
 @g.command('fstringify-files-diff')
@@ -256,6 +218,28 @@ def orange_settings(c):
         'max_split_line_length': max_split_line_length,
         'tab_width': abs(c.tab_width),
     }
+#@+node:ekr.20261018052239.1: *4* beautify_roots
+def beautify_roots(c, tag, beautifier):
+    """
+    Beautify or fstringify the external files at c.p with the given
+    ProjectBeautifier.
+    """
+    paths = []
+    for root in g.findRootsWithPredicate(c, c.p):
+        path = g.fullPath(c, root)
+        if os.path.exists(path):
+            paths.append(path)
+        else:
+            print('')
+            print(f"{tag}: file not found:{path}")
+            g.es(f"{tag}: file not found:\n{path}")
+    result = beautifier.run(paths)
+    for path in result.changed:
+        g.es_print(f"  changed: {g.shortFileName(path)}")
+    for path, message in result.errors:
+        g.es_print(f"    error: {g.shortFileName(path)} {message}".rstrip())
+    print('')
+    g.es_print(beautifier.summary(result))
 #@+node:ekr.20191028140926.1: *3* Beautify:test functions
 #@+node:ekr.20191029184103.1: *4* function: show
 def show(obj, tag, dump):
@@ -299,6 +283,221 @@ def should_beautify(p):
 def should_kill_beautify(p):
     """Return True if p.b contains @killbeautify"""
     return 'killbeautify' in g.get_directives_dict(p)
+#@+node:ekr.20261018052239.2: *3* function: beautify_file
+def beautify_file(kind, filename, settings):
+    """
+    Beautify or fstringify the given file, in one of a ProjectBeautifier's
+    worker processes or in Leo's own process.
+
+    Return (status, message), where status is 'changed', 'unchanged' or
+    'error'.
+    """
+    try:
+        tog = leoAst.TokenOrderGenerator()
+        contents, encoding, tokens, tree = tog.init_from_file(filename)
+        if contents is None:
+            return 'error', 'can not read file'
+        if not contents.strip():
+            return 'unchanged', ''
+        if not tokens or not tree:
+            return 'error', f"can not {kind}"
+        if kind == 'fstringify':
+            results = leoAst.Fstringify().fstringify(contents, filename, tokens, tree)
+        else:
+            results = leoAst.Orange(settings=settings).beautify(
+                contents, filename, tokens, tree)
+    except Exception as e:
+        return 'error', f"{e.__class__.__name__}: {e}"
+    # Something besides newlines must change.
+    if leoAst.regularize_nls(contents) == leoAst.regularize_nls(results):
+        return 'unchanged', ''
+    leoAst.write_file(filename, results, encoding=encoding)
+    return 'changed', ''
+#@+node:ekr.20261018052239.3: ** class ProjectBeautifier
+class ProjectBeautifier:
+    """
+    The ProjectBeautifier class beautifies or fstringifies many files at
+    once, using all cores.
+
+    run(paths) skips the files that are known to be clean, and handles all
+    other files in a pool of worker processes.
+
+    The cache, in ~/.leo/db/beautify.json, maps the path of each clean file
+    to a key: a hash of the kind of run, the settings, Python's version,
+    leoAst.py and the file's contents. Changing any of them invalidates the file's entry.
+
+    The beautify-files and fstringify-files commands use this class, as does
+    the command line::
+
+        python -m leo.core.leoBeautify [--fstringify] PATH...
+    """
+
+    def __init__(self, kind='beautify', settings=None,
+        cache_path=None, max_workers=None, use_cache=True,
+    ):
+        """Ctor for the ProjectBeautifier class."""
+        assert kind in ('beautify', 'fstringify'), repr(kind)
+        self.base_hash = None
+            # The hash of everything except the file's contents.
+        self.cache = None
+            # Keys are absolute paths, values are keys of clean files.
+            # Loaded on first use.
+        self.cache_path = cache_path
+            # The path to the cache. None: use ~/.leo/db/beautify.json.
+        self.kind = kind
+            # 'beautify' or 'fstringify'.
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.settings = settings or {}
+            # The settings for leoAst.Orange. See orange_settings.
+        self.use_cache = use_cache
+    #@+others
+    #@+node:ekr.20261018052239.4: *3* beautifier.run & summary
+    def run(self, paths):
+        """
+        Beautify or fstringify the files with the given paths.
+
+        Return a g.Bunch with the following ivars:
+
+        n:          the number of files.
+        n_cached:   the number of files known to be clean.
+        changed:    a list of the paths of all changed files.
+        errors:     a list of tuples (path, message).
+        elapsed:    the elapsed time, in seconds.
+        """
+        t1 = time.perf_counter()
+        cache = self.load_cache()
+        result = g.Bunch(n=len(paths), n_cached=0, changed=[], errors=[], elapsed=0.0)
+        todo = []  # A list of (size, path, key).
+        for path in paths:
+            path = os.path.abspath(path)
+            try:
+                with open(path, 'rb') as f:
+                    contents = f.read()
+            except OSError as e:
+                result.errors.append((path, str(e)))
+                continue
+            key = self.get_key(contents)
+            if cache.get(path) == key:
+                result.n_cached += 1
+            else:
+                todo.append((len(contents), path, key))
+        # Start with the largest files, so that they don't finish last.
+        todo.sort(key=lambda z: -z[0])
+        statuses = self.beautify_all([path for size, path, key in todo])
+        for (size, path, key), (status, message) in zip(todo, statuses):
+            if status == 'unchanged':
+                cache[path] = key
+            else:
+                # A changed file is checked again next time.
+                cache.pop(path, None)
+                if status == 'changed':
+                    result.changed.append(path)
+                else:
+                    result.errors.append((path, message))
+        self.save_cache()
+        result.changed.sort()
+        result.errors.sort()
+        result.elapsed = time.perf_counter() - t1
+        return result
+
+    def summary(self, result):
+        """Return a one-line summary of the result of run."""
+        rate = result.n / result.elapsed if result.elapsed > 0 else 0.0
+        return (
+            f"total files: {result.n}, "
+            f"changed files: {len(result.changed)}, "
+            f"cached files: {result.n_cached}, "
+            f"errors: {len(result.errors)}, "
+            f"in {result.elapsed:5.2f} sec., "
+            f"{rate:.1f} files/sec.")
+    #@+node:ekr.20261018052239.5: *3* beautifier.beautify_all & get_executor
+    def beautify_all(self, paths):
+        """Yield (status, message) for each of the given paths, in order."""
+        executor = self.get_executor(len(paths))
+        if not executor:
+            for path in paths:
+                yield beautify_file(self.kind, path, self.settings)
+            return
+        try:
+            futures = [executor.submit(beautify_file, self.kind, path, self.settings)
+                for path in paths]
+            for future in futures:
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield 'error', f"{e.__class__.__name__}: {e}"
+        finally:
+            executor.shutdown()
+
+    def get_executor(self, n):
+        """
+        Return a process pool for beautifying n files, or None if the files
+        should be beautified in Leo's own process.
+        """
+        max_workers = min(n, self.max_workers)
+        if max_workers < 2:
+            return None
+        return g.process_pool(max_workers)
+    #@+node:ekr.20261018052239.6: *3* beautifier.get_key, load_cache & save_cache
+    def get_key(self, contents):
+        """Return the cache key for the given contents (bytes) of a file."""
+        if not self.base_hash:
+            h = hashlib.sha1()
+            with open(leoAst.__file__, 'rb') as f:
+                h.update(f.read())
+            data = [self.kind, self.settings, list(sys.version_info[:2])]
+            h.update(json.dumps(data, sort_keys=True).encode('utf-8'))
+            self.base_hash = h
+        h = self.base_hash.copy()
+        h.update(contents)
+        return h.hexdigest()
+
+    def get_cache_path(self):
+        """Return the path to the cache."""
+        if not self.cache_path:
+            if g.app and g.app.homeLeoDir:
+                directory = g.os_path_join(g.app.homeLeoDir, 'db')
+            else:
+                directory = g.os_path_finalize_join('~', '.leo', 'db')
+            self.cache_path = g.os_path_join(directory, 'beautify.json')
+        return self.cache_path
+
+    def load_cache(self):
+        """Return the cache, reading it on first use."""
+        if self.cache is None:
+            self.cache = {}
+            if self.use_cache:
+                try:
+                    with open(self.get_cache_path(), 'r', encoding='utf-8') as f:
+                        d = json.load(f)
+                    if isinstance(d, dict):
+                        self.cache = d
+                except Exception:
+                    pass  # A missing or corrupt cache.
+        return self.cache
+
+    def save_cache(self):
+        """Write the cache, replacing the previous cache atomically."""
+        if not self.use_cache:
+            return
+        data = json.dumps(self.cache).encode('utf-8')
+        g.write_file_atomically(self.get_cache_path(), data)
+    #@+node:ekr.20261018052239.7: *3* beautifier.find_files
+    def find_files(self, paths):
+        """
+        Return the list of all files in paths, replacing each directory by
+        all the .py files it contains.
+        """
+        result = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, dirs, files in os.walk(path):
+                    dirs[:] = sorted(z for z in dirs if not z.startswith('.'))
+                    result.extend(os.path.join(root, z) for z in sorted(files) if z.endswith('.py'))
+            else:
+                result.append(path)
+        return result
+    #@-others
 #@+node:ekr.20110917174948.6903: ** class CPrettyPrinter
 class CPrettyPrinter:
     #@+others
@@ -576,7 +775,80 @@ class CPrettyPrinter:
             return len(s)
         return j + 2
     #@-others
+#@+node:ekr.20261018052239.9: ** class TestProjectBeautifier
+class TestProjectBeautifier(unittest.TestCase):
+    """Test cases for the ProjectBeautifier class."""
+    #@+others
+    #@+node:ekr.20261018052239.10: *3* test_run
+    def test_run(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, 'beautify.json')
+            paths = []
+            for i, s in enumerate(('a=b\n', 'a = b\n', 'def f(x):\n    return x+y\n')):
+                path = os.path.abspath(os.path.join(directory, f"file{i}.py"))
+                with open(path, 'w') as f:
+                    f.write(s)
+                paths.append(path)
+
+            def run(**kwargs):
+                beautifier = ProjectBeautifier(cache_path=cache_path, max_workers=1, **kwargs)
+                result = beautifier.run(paths)
+                assert not result.errors, result.errors
+                return result
+
+            result = run()
+            assert result.changed == [paths[0], paths[2]], result.changed
+            assert result.n_cached == 0, result.n_cached
+            # Only the file that was clean to begin with is known to be clean.
+            result = run()
+            assert not result.changed and result.n_cached == 1, result
+            result = run()
+            assert result.n_cached == 3, result.n_cached
+            # Changing the settings invalidates the cache.
+            result = run(settings={'tab_width': 8})
+            assert result.n_cached == 0, result.n_cached
+    #@-others
+#@+node:ekr.20261018052239.8: ** main
+def main(argv=None):
+    """Beautify or fstringify the given files and directories."""
+    parser = argparse.ArgumentParser(
+        prog='python -m leo.core.leoBeautify',
+        description='Beautify or fstringify python files, using all cores.')
+    add = parser.add_argument
+    add('paths', metavar='PATH', nargs='+',
+        help='a python file or a directory containing python files')
+    add('--fstringify', action='store_true', help='fstringify instead of beautifying')
+    add('-j', '--jobs', type=int, help='the number of worker processes (default: all cores)')
+    add('--no-cache', action='store_true', help='also beautify files known to be clean')
+    add('--allow-joined-strings', action='store_true')
+    add('--max-join-line-length', type=int, default=88)
+    add('--max-split-line-length', type=int, default=88)
+    add('--tab-width', type=int, default=4)
+    args = parser.parse_args(argv)
+    if args.fstringify:
+        kind, settings = 'fstringify', {}
+    else:
+        # Use the same settings as orange_settings, so the command line and
+        # Leo's commands share the cache.
+        kind, settings = 'beautify', {
+            'allow_joined_strings': args.allow_joined_strings,
+            'max_join_line_length': min(args.max_join_line_length, args.max_split_line_length),
+            'max_split_line_length': args.max_split_line_length,
+            'tab_width': abs(args.tab_width),
+        }
+    beautifier = ProjectBeautifier(kind, settings=settings,
+        max_workers=args.jobs, use_cache=not args.no_cache)
+    result = beautifier.run(beautifier.find_files(args.paths))
+    for path in result.changed:
+        print(f"  changed: {path}")
+    for path, message in result.errors:
+        print(f"    error: {path} {message}".rstrip())
+    print(beautifier.summary(result))
+    return 1 if result.errors else 0
 #@-others
+if __name__ == '__main__':
+    sys.exit(main())
 #@@language python
 #@@tabwidth -4
 #@-leo
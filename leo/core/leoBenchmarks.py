@@ -0,0 +1,924 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20261018035742.1: * @file leoBenchmarks.py
+"""
+Benchmarks for Leo's core classes.
+
+Run the benchmarks from the leo-editor folder::
+
+    python -m leo.core.leoBenchmarks            # Run all benchmarks.
+    python -m leo.core.leoBenchmarks --list     # List all benchmarks.
+    python -m leo.core.leoBenchmarks vnode-memory --n 500000
+
+Benchmarks use a null gui, so they run without any windows.
+"""
+#@+<< imports >>
+#@+node:ekr.20261018035742.2: ** << imports >> (leoBenchmarks)
+import argparse
+import gc
+import re
+import sys
+import time
+import tracemalloc
+#@-<< imports >>
+benchmarks = {}  # Keys are benchmark names, values are functions.
+#@+others
+#@+node:ekr.20261018035742.3: ** Utils
+#@+node:ekr.20261018035742.4: *3* function: benchmark
+def benchmark(name):
+    """A decorator that registers a benchmark function."""
+
+    def decorator(func):
+        benchmarks[name] = func
+        return func
+
+    return decorator
+#@+node:ekr.20261018035742.5: *3* function: get_commander
+_bridge = None
+
+def get_commander(path=None):
+    """
+    Return a commander for the .leo file at path, or a new commander.
+    The first call creates a null-gui bridge that loads no plugins.
+    """
+    global _bridge
+    if not _bridge:
+        import leo.core.leoBridge as leoBridge
+        _bridge = leoBridge.controller(gui='nullGui',
+            loadPlugins=False, readSettings=False, silent=True, verbose=False)
+    return _bridge.openLeoFile(path or '')
+#@+node:ekr.20261018040014.2: *3* function: default_leo_path
+def default_leo_path():
+    """Return the path to LeoDocs.leo, a large .leo file."""
+    import leo.core.leoGlobals as g
+    return g.os_path_finalize_join(g.app.loadDir, '..', 'doc', 'LeoDocs.leo')
+#@+node:ekr.20261018040136.1: *3* function: make_outline
+def make_outline(c, n, width=100):
+    """
+    Replace c's outline by a generated outline containing n nodes.
+    Top-level organizer nodes each contain width children.
+    """
+    import leo.core.leoNodes as leoNodes
+    hidden_v = c.hiddenRootNode
+    for v in hidden_v.children:
+        v.parents.remove(hidden_v)
+    hidden_v.children = []
+    body = ''.join(f"line {i}: a <typical> line & more\n" for i in range(5))
+    parent_v = None
+    for i in range(n):
+        v = leoNodes.VNode(context=c)
+        v._headString = f"node {i}"
+        v._bodyString = f"# node {i}\n{body}"
+        if i % (width + 1) == 0:
+            parent_v = v
+            hidden_v.children.append(v)
+            v.parents.append(hidden_v)
+        else:
+            parent_v.children.append(v)
+            v.parents.append(parent_v)
+    c.selectPosition(c.rootPosition())
+    return hidden_v.children
+#@+node:ekr.20261018035742.6: *3* function: report
+def report(name, **kwargs):
+    """Print one line of benchmark results."""
+    fields = ', '.join(
+        f"{key}: {val:.4f}" if isinstance(val, float) else f"{key}: {val}"
+        for key, val in kwargs.items())
+    print(f"{name}: {fields}")
+#@+node:ekr.20261018035742.7: ** benchmark: vnode-memory
+@benchmark('vnode-memory')
+def bench_vnode_memory(args):
+    """
+    Report the bytes allocated per VNode, with and without __slots__.
+    The 'dict' class mimics the layout of VNodes before slots.
+    """
+    import leo.core.leoGlobals as g
+    import leo.core.leoNodes as leoNodes
+    c = get_commander()
+    n = args.n
+
+    class DictVNode:
+        """A VNode with the ivars of legacy VNodes, kept in a __dict__."""
+
+        def __init__(self, context, gnx):
+            self._headString = 'newHeadline'
+            self._bodyString = ''
+            self.children = []
+            self.parents = []
+            self.fileIndex = gnx
+            self.iconVal = 0
+            self.statusBits = 0
+            self.context = context
+            self.expandedPositions = []
+            self.insertSpot = None
+            self.scrollBarSpot = None
+            self.selectionLength = 0
+            self.selectionStart = 0
+            g.app.nodeIndices.new_vnode_helper(context, gnx, self)
+
+    def measure(factory):
+        gnxs = [f"benchmark.{i}" for i in range(n)]
+        gc.collect()
+        tracemalloc.start()
+        t1 = time.perf_counter()
+        nodes = [factory(c, gnx) for gnx in gnxs]
+        t2 = time.perf_counter()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del nodes
+        return size / n, t2 - t1
+
+    # Don't let new vnodes accumulate in c.fileCommands.gnxDict.
+    gnxDict = c.fileCommands.gnxDict
+    try:
+        for kind, factory in (
+            ('dict', DictVNode),
+            ('slots', lambda c, gnx: leoNodes.VNode(context=c, gnx=gnx)),
+        ):
+            c.fileCommands.gnxDict = {}
+            per_node, seconds = measure(factory)
+            report(f"vnode-memory {kind}", nodes=n,
+                bytes_per_node=round(per_node), seconds=seconds)
+    finally:
+        c.fileCommands.gnxDict = gnxDict
+#@+node:ekr.20261018040014.1: ** benchmark: leo-read
+@benchmark('leo-read')
+def bench_leo_read(args):
+    """
+    Compare the time and peak memory used by FastRead's readers
+    for the .leo file given by --path.
+    """
+    import leo.core.leoFileCommands as leoFileCommands
+    c = get_commander()
+    path = args.path or default_leo_path()
+
+    def read_all_at_once(fast):
+        with open(path, 'rb') as f:
+            s = f.read()
+        return fast.readWithElementTree(path, s)
+
+    for kind, reader in (
+        ('element-tree', read_all_at_once),
+        ('iterparse', lambda fast: fast.readWithIterparse(path)),
+    ):
+        c.fileCommands.gnxDict = {}
+        fast = leoFileCommands.FastRead(c, c.fileCommands.gnxDict)
+        gc.collect()
+        tracemalloc.start()
+        t1 = time.perf_counter()
+        reader(fast)
+        t2 = time.perf_counter()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report(f"leo-read {kind}", nodes=len(c.fileCommands.gnxDict),
+            final_kb=size // 1024, peak_kb=peak // 1024, seconds=t2 - t1)
+#@+node:ekr.20261018040136.2: ** benchmark: leo-save
+@benchmark('leo-save')
+def bench_leo_save(args):
+    """
+    Report the time to save an outline of --n nodes after changing
+    the bodies of 1, 100 and 10000 nodes.
+    """
+    import tempfile
+    c = get_commander()
+    fc = c.fileCommands
+    make_outline(c, args.n)
+    nodes = list(c.all_unique_nodes())
+    # Time fc.putTnodes separately.
+    tnode_times = []
+    put_tnodes = fc.putTnodes
+
+    def timed_put_tnodes():
+        t1 = time.perf_counter()
+        put_tnodes()
+        tnode_times.append(time.perf_counter() - t1)
+
+    fc.putTnodes = timed_put_tnodes
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/leo-save-benchmark.leo"
+        fc.write_Leo_file(path, outlineOnlyFlag=True)
+        for n_dirty in (1, 100, 10000):
+            for v in nodes[:n_dirty]:
+                v.b = v.b + '#\n'
+            t1 = time.perf_counter()
+            fc.write_Leo_file(path, outlineOnlyFlag=True)
+            t2 = time.perf_counter()
+            report("leo-save", nodes=len(nodes), dirty=n_dirty,
+                seconds=t2 - t1, tnodes_seconds=tnode_times[-1])
+    del fc.putTnodes
+#@+node:ekr.20261018040804.4: ** benchmark: leo-open
+@benchmark('leo-open')
+def bench_leo_open(args):
+    """
+    Report cold and warm times to open the .leo file given by --path
+    (default: LeoPyRef.leo). Warm opens rebuild unchanged external
+    files from the snapshots cached by cold opens.
+    """
+    import tempfile
+    import leo.core.leoCache as leoCache
+    import leo.core.leoGlobals as g
+    get_commander()  # Create the bridge.
+    path = args.path or g.os_path_finalize_join(
+        g.app.loadDir, '..', 'core', 'LeoPyRef.leo')
+    cacher = g.app.commander_cacher
+    old_db = cacher.db
+    with tempfile.TemporaryDirectory() as directory:
+        # Don't touch the user's caches.
+        cacher.db = leoCache.SqlitePickleShare(directory)
+        try:
+            for kind in ('cold', 'warm', 'warm'):
+                t1 = time.perf_counter()
+                c = get_commander(path)
+                t2 = time.perf_counter()
+                n = len(list(c.all_unique_nodes()))
+                    # Don't call c.close: closing the bridge's last
+                    # commander calls g.app.finishQuit, closing the caches.
+                report(f"leo-open {kind}", nodes=n, seconds=t2 - t1)
+        finally:
+            cacher.db.close()
+            cacher.db = old_db
+#@+node:ekr.20261018041127.3: ** benchmark: cache
+@benchmark('cache')
+def bench_cache(args):
+    """
+    Report the times to open a SqlitePickleShare, to write --n keys
+    and to read them back, with cold and warm LRU caches. For
+    comparison, also report the time to write up to 1000 keys, each
+    in its own transaction.
+    """
+    import tempfile
+    import leo.core.leoCache as leoCache
+    get_commander()  # Init g.app.
+    n = args.n
+    value = {'expanded': [f"ekr.20200101000000.{i}" for i in range(10)],
+        'state': 'a typical cached string ' * 4}
+    keys = [f"/home/user/file{i}.leo:::key{i}" for i in range(n)]
+    with tempfile.TemporaryDirectory() as directory:
+        t1 = time.perf_counter()
+        db = leoCache.SqlitePickleShare(directory)
+        t2 = time.perf_counter()
+        report('cache open', seconds=t2 - t1)
+        n_single = min(n, 1000)
+        t1 = time.perf_counter()
+        for key in keys[:n_single]:
+            db[key] = value
+            db.commit()
+        t2 = time.perf_counter()
+        report('cache write one per transaction', keys=n_single, seconds=t2 - t1)
+        t1 = time.perf_counter()
+        for key in keys:
+            db[key] = value
+        db.commit()
+        t2 = time.perf_counter()
+        report('cache write batched', keys=n, seconds=t2 - t1)
+        db.close()
+        db = leoCache.SqlitePickleShare(directory)
+        t1 = time.perf_counter()
+        for key in keys:
+            db[key]
+        t2 = time.perf_counter()
+        report('cache read', keys=n, seconds=t2 - t1)
+        # Read keys that fit in the LRU cache.
+        db.uncache()
+        for kind in ('cold', 'warm'):
+            t1 = time.perf_counter()
+            for key in keys[:n_single]:
+                db[key]
+            t2 = time.perf_counter()
+            report(f"cache read {kind}", keys=n_single, seconds=t2 - t1)
+        db.close()
+#@+node:ekr.20261018041614.6: ** benchmark: positions-for-v
+@benchmark('positions-for-v')
+def bench_positions_for_v(args):
+    """
+    Report the time per call to find all positions of a cloned vnode
+    in a generated outline of --n nodes in which many nodes have
+    several clones: by scanning the outline, and by c.outlineIndex.
+    """
+    c = get_commander()
+    top_level = make_outline(c, args.n)
+    # Clone every 10th node into 5 other organizers.
+    targets = [(i, v) for i, parent_v in enumerate(top_level)
+        for v in parent_v.children[::10]]
+    for i, v in targets:
+        for j in range(1, 6):
+            organizer = top_level[(i + 7 * j) % len(top_level)]
+            v._addLink(len(organizer.children), organizer)
+    targets = [v for i, v in targets]
+    n_positions = sum(1 for p in c.all_positions())
+    for kind, n_calls, find in (
+        ('scan', 10, lambda v: [p.copy() for p in c.all_positions() if p.v is v]),
+        ('index', 10000, c.outlineIndex.positions),
+    ):
+        vnodes = [targets[(i * 7919) % len(targets)] for i in range(n_calls)]
+        t1 = time.perf_counter()
+        for v in vnodes:
+            positions = find(v)
+            assert len(positions) == 6, len(positions)
+        t2 = time.perf_counter()
+        report(f"positions-for-v {kind}", positions=n_positions,
+            calls=n_calls, usec_per_call=round(1e6 * (t2 - t1) / n_calls))
+#@+node:ekr.20261018042245.7: ** benchmark: traversal
+@benchmark('traversal')
+def bench_traversal(args):
+    """
+    Compare the time to traverse outlines with positions and with frames:
+    a generated outline of --n nodes, nested 10 levels deep, and the .leo
+    file given by --path.
+    """
+    c = get_commander()
+    hidden_v = c.hiddenRootNode
+    top_level = list(make_outline(c, args.n))
+    # Nest the organizers in chains of 10.
+    for i, v in enumerate(top_level):
+        if i % 10:
+            parent_v = top_level[i - 1]
+            hidden_v.children.remove(v)
+            v.parents.remove(hidden_v)
+            parent_v.children.append(v)
+            v.parents.append(parent_v)
+    c.selectPosition(c.rootPosition())
+    real_c = get_commander(args.path or default_leo_path())
+    for kind, c in (('generated', c), ('file', real_c)):
+        n = sum(1 for z in c.all_frames())
+        for name, iterable in (
+            ('all_positions', lambda: c.all_positions()),
+            ('all_positions(copy=False)', lambda: c.all_positions(copy=False)),
+            ('all_frames', lambda: c.all_frames()),
+            ('all_unique_positions', lambda: c.all_unique_positions()),
+            ('all_unique_frames', lambda: c.all_unique_frames()),
+        ):
+            gc.collect()
+            t1 = time.perf_counter()
+            for z in iterable():
+                pass
+            t2 = time.perf_counter()
+            report(f"traversal {kind} {name}", nodes=n, seconds=t2 - t1,
+                nsec_per_node=round(1e9 * (t2 - t1) / n))
+    t1 = time.perf_counter()
+    files = real_c.atFileCommands.findFilesToRead(False, real_c.rootPosition())
+    t2 = time.perf_counter()
+    report("traversal file findFilesToRead", files=len(files), seconds=t2 - t1)
+#@+node:ekr.20261018043431.1: ** benchmark: find-all
+@benchmark('find-all')
+def bench_find_all(args):
+    """
+    Compare the time to find all matches in a generated outline of --n
+    nodes: with LeoFind.searchHelper and g.getLine, as the interactive
+    find commands do, and with a BatchSearcher.
+    """
+    import leo.core.leoGlobals as g
+    import leo.core.leoFind as leoFind
+    c = get_commander()
+    make_outline(c, args.n)
+    fc = c.findCommands
+    fc.reverse = fc.pattern_match = fc.findAllUniqueFlag = False
+
+    def widget_find_all(pattern, ignore_case, whole_word):
+        fc.ignore_case, fc.whole_word = ignore_case, whole_word
+        lines = []
+        for p in c.all_unique_positions(copy=False):
+            for s in (p.h, p.b):
+                i = 0
+                while True:
+                    pos, newpos = fc.searchHelper(s, i, len(s), pattern)
+                    if pos == -1:
+                        break
+                    j, k = g.getLine(s, pos)
+                    lines.append(s[j:k])
+                    i = newpos
+        return lines
+
+    def batch_find_all(pattern, ignore_case, whole_word):
+        searcher = leoFind.BatchSearcher(pattern,
+            ignore_case=ignore_case, whole_word=whole_word)
+        lines = []
+        for frame in c.all_unique_frames():
+            for s in (frame.v.h, frame.v.b):
+                lines.extend(line for line, m in searcher.find_lines(s))
+        return lines
+
+    for pattern, ignore_case, whole_word in (
+        ('typical', False, False),
+        ('LINE', True, False),
+        ('node', False, True),
+    ):
+        for kind, find_all in (('widget', widget_find_all), ('batch', batch_find_all)):
+            t1 = time.perf_counter()
+            lines = find_all(pattern, ignore_case, whole_word)
+            t2 = time.perf_counter()
+            report(f"find-all {kind} {pattern!r}", nodes=args.n,
+                matches=len(lines), seconds=t2 - t1)
+#@+node:ekr.20261018043944.10: ** benchmark: search-index
+@benchmark('search-index')
+def bench_search_index(args):
+    """
+    Report the times to build, save and load c.searchIndex for a generated
+    outline of --n nodes, the time to update it after changing one node,
+    and the time per query with and without the index.
+    """
+    import tempfile
+    import leo.core.leoCache as leoCache
+    import leo.core.leoFind as leoFind
+    import leo.core.leoGlobals as g
+    c = get_commander()
+    make_outline(c, args.n)
+    c.mFileName = g.os_path_finalize('search-index-benchmark.leo')
+    index = c.searchIndex
+    size = sum(len(z.h) + len(z.b) for z in c.all_unique_nodes())
+    t1 = time.perf_counter()
+    index.update()
+    t2 = time.perf_counter()
+    report("search-index build", nodes=args.n, text_kb=size // 1024,
+        trigrams=len(index.trigrams), tokens=len(index.tokens), seconds=t2 - t1)
+    # Queries reindex only changed nodes.
+    v = c.rootPosition().v
+    t1 = time.perf_counter()
+    v.b = v.b + 'changed = True\n'
+    assert index.plain_candidates('changed = True') == {v}
+    t2 = time.perf_counter()
+    report("search-index update", msec=round(1000 * (t2 - t1), 2))
+    n = args.n // 2
+    for kind, pattern, kwargs, candidates in (
+        ('plain', f"node {n}\n", {},
+            lambda: index.plain_candidates(f"node {n}\n")),
+        ('word', str(n), {'whole_word': True},
+            lambda: index.plain_candidates(str(n), whole_word=True)),
+        ('regex', f"^# node {n}$", {'regex': True},
+            lambda: index.regex_candidates(f"^# node {n}$", re.MULTILINE)),
+    ):
+        searcher = leoFind.BatchSearcher(pattern, **kwargs)
+
+        def match(v):
+            return any(searcher.find_spans(v.h)) or any(searcher.find_spans(v.b))
+
+        t1 = time.perf_counter()
+        hits1 = [z.v for z in c.all_unique_frames() if match(z.v)]
+        t2 = time.perf_counter()
+        hits2 = [v for v in candidates() if match(v)]
+        t3 = time.perf_counter()
+        assert len(hits1) == len(hits2) == 1, (hits1, hits2)
+        report(f"search-index {kind}", scan_msec=round(1000 * (t2 - t1), 1),
+            index_msec=round(1000 * (t3 - t2), 1))
+    cacher = g.app.commander_cacher
+    old_db = cacher.db
+    with tempfile.TemporaryDirectory() as directory:
+        # Don't touch the user's caches.
+        cacher.db = leoCache.SqlitePickleShare(directory)
+        try:
+            index.changed = True
+            t1 = time.perf_counter()
+            index.save()
+            cacher.commit()
+            t2 = time.perf_counter()
+            index2 = leoFind.SearchIndex(c)
+            index2.update()
+            t3 = time.perf_counter()
+            assert index2.trigrams == index.trigrams
+            report("search-index cache", save_seconds=t2 - t1, load_seconds=t3 - t2)
+        finally:
+            cacher.db.close()
+            cacher.db = old_db
+#@+node:ekr.20261018044930.9: ** benchmark: search-service
+@benchmark('search-service')
+def bench_search_service(args):
+    """
+    Compare the time to search all nodes of a generated outline of --n
+    nodes in Leo's process with the time taken by a SearchService, and
+    report the time the SearchService blocks Leo.
+    """
+    import leo.core.leoSearch as leoSearch
+    c = get_commander()
+    make_outline(c, args.n)
+    pattern = r'line \d: a <\w+>'  # The search index can't help.
+    service = leoSearch.SearchService()
+    hits = []
+    c.searchIndex.update()  # Don't include the time to build the index.
+    try:
+        t1 = time.perf_counter()
+        snapshot = service.snapshot(c, pattern, False, False, True)
+        t2 = time.perf_counter()
+        results = leoSearch.search_shard(snapshot, pattern,
+            False, False, True, True, True)
+        t3 = time.perf_counter()
+        report("search-service in-process", nodes=args.n, hits=len(results),
+            snapshot_seconds=t2 - t1, search_seconds=t3 - t2)
+        for kind in ('first', 'second'):
+            # The first search starts the worker processes.
+            hits.clear()
+            t1 = time.perf_counter()
+            service.search([c], pattern, hits.extend, regex=True)
+            t2 = time.perf_counter()
+            assert len(hits) == len(results), (len(hits), len(results))
+            report(f"search-service {kind}", workers=service.max_workers,
+                hits=len(hits), seconds=t2 - t1)
+    finally:
+        service.shutdown()
+#@+node:ekr.20261018050450.4: ** benchmark: undo
+@benchmark('undo')
+def bench_undo(args):
+    """
+    Report the memory used by undo beads after 300 changes to a 5 MB body,
+    and after a tree change that alters every tenth body of a generated
+    outline of --n nodes.
+    """
+    c = get_commander()
+    u = c.undoer
+    p = c.rootPosition()
+    line = 'a typical line of text in a large body\n'
+    p.v.b = line * (5 * 1024 * 1024 // len(line))
+    c.selectPosition(p)
+    gc.collect()
+    tracemalloc.start()
+    t1 = time.perf_counter()
+    for i in range(300):
+        bunch = u.beforeChangeNodeContents(p)
+        j = len(p.b) * i // 300
+        p.v.b = p.b[:j] + 'x' + p.b[j:]
+        u.afterChangeNodeContents(p, 'Change', bunch)
+    t2 = time.perf_counter()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Whole-body snapshots would keep every version of the body.
+    size -= len(p.b)  # Don't count the new body.
+    report("undo body", body_kb=len(p.b) // 1024, changes=300, beads_kb=size // 1024,
+        snapshots_kb=300 * len(p.b) // 1024, msec_per_change=1000 * (t2 - t1) / 300)
+    u.clearUndoState()
+    make_outline(c, args.n, width=args.n)
+    root = c.rootPosition()
+    gc.collect()
+    tracemalloc.start()
+    t1 = time.perf_counter()
+    bunch = u.beforeChangeTree(root)
+    for i, v in enumerate(root.v.children):
+        if i % 10 == 0:
+            v.b = v.b.replace('typical', 'changed')
+    u.afterChangeTree(root, 'Change Tree', bunch)
+    t2 = time.perf_counter()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report("undo tree", nodes=args.n, changed=len(u.beads[u.bead].treeDelta),
+        bead_kb=size // 1024, peak_kb=peak // 1024, seconds=t2 - t1)
+    t1 = time.perf_counter()
+    u.undo()
+    t2 = time.perf_counter()
+    u.redo()
+    t3 = time.perf_counter()
+    report("undo tree", undo_seconds=t2 - t1, redo_seconds=t3 - t2)
+#@+node:ekr.20261018051043.8: ** benchmark: redraw
+@benchmark('redraw')
+def bench_redraw(args):
+    """
+    Time the redraw instructions for contracting and expanding one node of
+    a fully expanded generated outline of --n nodes, using difflib and the
+    linear diff.
+    """
+    import difflib
+    import leo.core.leoFastRedraw as leoFastRedraw
+
+    def apply(rows, opcodes):
+        """Apply opcodes to a copy of rows. Indices refer to the old rows."""
+        rows = rows[:]
+        for op in reversed(opcodes):
+            if op[0] == 'move':
+                kind, i, j, gnxs0, gnxs1 = op
+                moved = rows[i : i + len(gnxs0)]
+                rows[j:j] = moved
+                del rows[i : i + len(gnxs0)]
+            elif op[0] == 'replace':
+                rows[op[1] : op[1] + len(op[2])] = [z + '\n' for z in op[3]]
+            elif op[0] == 'insert':
+                rows[op[1] : op[1]] = [z + '\n' for z in op[2]]
+            else:
+                del rows[op[1] : op[1] + len(op[2])]
+        return rows
+
+    c = get_commander()
+    organizers = make_outline(c, args.n)
+    for p in c.all_positions():
+        p.expand()
+    redrawer = leoFastRedraw.FastRedraw()
+    t1 = time.perf_counter()
+    a = redrawer.flatten_outline(c)
+    t2 = time.perf_counter()
+    report("redraw", rows=len(a), flatten_seconds=t2 - t1)
+    p = c.rootPosition()
+    for i in range(len(organizers) // 2):
+        p.moveToNext()
+    p.contract()
+    b = redrawer.flatten_outline(c)
+    for kind, old, new in (('contract', a, b), ('expand', b, a)):
+        t1 = time.perf_counter()
+        difflib.SequenceMatcher(None, old, new).get_opcodes()
+        t2 = time.perf_counter()
+        opcodes = redrawer.make_redraw_list(old, new)
+        t3 = time.perf_counter()
+        assert apply(old, opcodes) == new
+        report(f"redraw {kind}", difflib_seconds=t2 - t1, diff_seconds=t3 - t2)
+#@+node:ekr.20261018051306.9: ** benchmark: qt-tree
+@benchmark('qt-tree')
+def bench_qt_tree(args):
+    """
+    Time redrawing and selecting nodes of generated outlines in a
+    LeoQtTreeView, using Qt's offscreen platform.
+    """
+    import os
+    import leo.core.leoGlobals as g
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    # leoQt refuses to import Qt in Leo's bridge.
+    in_bridge, g.in_bridge = g.in_bridge, False
+    try:
+        from leo.core.leoQt import QtWidgets
+        import leo.plugins.qt_tree as qt_tree
+    except Exception:
+        QtWidgets = None
+    finally:
+        g.in_bridge = in_bridge
+    if not QtWidgets:
+        print('qt-tree: skipped: can not import Qt')
+        return
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    for n in (args.n // 100, args.n // 10, args.n):
+        c = get_commander()
+        organizers = make_outline(c, n)
+        # Expand the first and last organizers.
+        organizers[0].expand()
+        organizers[-1].expand()
+        view = qt_tree.LeoQtTreeView(c)
+        view.resize(400, 800)
+        view.show()
+        app.processEvents()
+        t1 = time.perf_counter()
+        view.redraw()
+        app.processEvents()
+        t2 = time.perf_counter()
+        p = c.rootPosition()
+        p.moveToLastNode()
+        c.selectPosition(p)
+        view.redraw_after_select(p)
+        app.processEvents()
+        t3 = time.perf_counter()
+        assert view.tree_model.index_position(view.currentIndex()) == p
+        report("qt-tree", nodes=n, redraw_seconds=t2 - t1, select_seconds=t3 - t2,
+            paths=len(view.tree_model.paths))
+        view.close()
+#@+node:ekr.20261018051458.10: ** benchmark: external-files
+@benchmark('external-files')
+def bench_external_files(args):
+    """
+    Time one idle-time check of n/50 external files, scanning all @<file>
+    nodes as before and using the FileWatcher, then time detecting changes
+    to ten of those files.
+    """
+    import os
+    import tempfile
+    import leo.core.leoApp as leoApp
+    import leo.core.leoExternalFiles as leoExternalFiles
+    import leo.core.leoGlobals as g
+    c = get_commander()
+    if not g.app.idleTimeManager:
+        g.app.idleTimeManager = leoApp.IdleTimeManager()
+    n = max(10, args.n // 50)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        root = c.rootPosition()
+        for i in range(n):
+            path = os.path.join(directory, f"dir{i // 100}", f"file{i}.py")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(f"# file {i}\n" + 'a = 1\n' * 2000)
+            p = root.insertAsLastChild()
+            p.h = f"@clean {path}"
+            paths.append(path)
+        efc = leoExternalFiles.ExternalFilesController()
+        efc.enabled_d[c] = True
+        g.app.windowList.append(c.frame)
+        try:
+            efc.idle_check_commander(c)  # Initialize all checksums.
+            t1 = time.perf_counter()
+            efc.idle_check_commander(c)
+            t2 = time.perf_counter()
+            efc.checksum_d, efc._time_d = {}, {}
+            t3 = time.perf_counter()
+            efc.idle_check_commanders()  # Index and watch all files.
+            t4 = time.perf_counter()
+            efc.executor.shutdown(wait=True)
+            efc.executor = None
+            efc.idle_check_commanders()  # Finish all initial checksums.
+            t5 = time.perf_counter()
+            efc.idle_check_commanders()
+            t6 = time.perf_counter()
+            report("external-files", files=n, old_idle_seconds=t2 - t1,
+                index_seconds=t4 - t3, idle_seconds=t6 - t5,
+                inotify=efc.watcher.fd is not None)
+            old_sums = dict(efc.checksum_d)
+            for path in paths[::n // 10][:10]:
+                with open(path, 'a') as f:
+                    f.write('b = 2\n')
+            t1 = time.perf_counter()
+            while True:
+                efc.idle_check_commanders()
+                changed = [z for z in paths if efc.checksum_d.get(z) != old_sums.get(z)]
+                if len(changed) == 10 and not efc.checksum_futures:
+                    break
+                time.sleep(0.001)
+            t2 = time.perf_counter()
+            report("external-files", changed=len(changed), detect_seconds=t2 - t1)
+        finally:
+            g.app.windowList.remove(c.frame)
+            efc.shut_down()
+#@+node:ekr.20261018052239.11: ** benchmark: beautify
+@benchmark('beautify')
+def bench_beautify(args):
+    """
+    Time beautifying a copy of leo/core in one process and in all worker
+    processes, then time a second run, which skips all clean files.
+    """
+    import os
+    import shutil
+    import tempfile
+    import leo.core.leoBeautify as leoBeautify
+    core = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, 'beautify.json')
+        for max_workers, use_cache in ((1, False), (None, True)):
+            target = os.path.join(directory, f"core{int(use_cache)}")
+            shutil.copytree(core, target, ignore=shutil.ignore_patterns('__pycache__'))
+            beautifier = leoBeautify.ProjectBeautifier(
+                cache_path=cache_path, max_workers=max_workers, use_cache=use_cache)
+            paths = beautifier.find_files([target])
+            result = beautifier.run(paths)
+            report(f"beautify workers={beautifier.max_workers}", files=result.n,
+                changed=len(result.changed), errors=len(result.errors),
+                seconds=result.elapsed, files_per_second=result.n / result.elapsed)
+        result = leoBeautify.ProjectBeautifier(cache_path=cache_path).run(paths)
+        report("beautify cached", files=result.n, cached=result.n_cached,
+            seconds=result.elapsed, files_per_second=result.n / result.elapsed)
+#@+node:ekr.20261018053049.4: ** benchmark: leoAst
+@benchmark('leoAst')
+def bench_leo_ast(args):
+    """
+    Time the tokenize, parse, link and beautify phases of leoAst.Orange
+    separately, for all .py files in the --path directory (default:
+    leo/core).
+    """
+    import glob
+    import os
+    import leo.core.leoAst as leoAst
+    directory = args.path or os.path.dirname(os.path.abspath(__file__))
+    paths = sorted(glob.glob(os.path.join(directory, '**', '*.py'), recursive=True))
+    times = {'tokenize': 0.0, 'parse': 0.0, 'link': 0.0, 'beautify': 0.0}
+    n_lines, errors = 0, 0
+    for path in paths:
+        encoding, contents = leoAst.read_file_with_encoding(path)
+        if not contents:
+            continue
+        try:
+            t1 = time.perf_counter()
+            tokens = leoAst.make_tokens(contents)
+            t2 = time.perf_counter()
+            tree = leoAst.parse_ast(contents)
+            t3 = time.perf_counter()
+            if not tokens or not tree:
+                errors += 1
+                continue
+            tog = leoAst.TokenOrderGenerator()
+            tog.filename = path
+            list(tog.create_links(tokens, tree))
+            t4 = time.perf_counter()
+            leoAst.Orange().beautify(contents, path, tokens, tree)
+            t5 = time.perf_counter()
+        except Exception:
+            errors += 1
+            continue
+        n_lines += contents.count('\n')
+        for phase, seconds in zip(times, (t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+            times[phase] += seconds
+    for phase, seconds in times.items():
+        report(f"leoAst {phase}", files=len(paths), errors=errors, seconds=seconds,
+            lines_per_second=n_lines / seconds if seconds else 0)
+#@+node:ekr.20261018053623.5: ** benchmark: plugin-registry
+@benchmark('plugin-registry')
+def bench_plugin_registry(args):
+    """
+    Time LM.createAllImporterData in fresh processes: importing all importer
+    and writer plugins as before, creating the manifest, and reading the
+    cached manifest.
+    """
+    import os
+    import subprocess
+    import tempfile
+    script = (
+        "import sys, time\n"
+        "import leo.core.leoGlobals as g\n"
+        "import leo.core.leoApp as leoApp\n"
+        "g.app = leoApp.LeoApp()\n"
+        "lm = g.app.loadManager = leoApp.LoadManager()\n"
+        "lm.computeStandardDirectories()\n"
+        "g.app.homeLeoDir = sys.argv[1]\n"
+        "t1 = time.perf_counter()\n"
+        "if sys.argv[2] == 'eager':\n"
+        "    for kind in ('importers', 'writers'):\n"
+        "        for fn in g.glob_glob(g.os_path_finalize_join(g.app.loadDir, '..', 'plugins', kind, '*.py')):\n"
+        "            g.import_module(f'leo.plugins.{kind}.{g.shortFileName(fn)[:-3]}')\n"
+        "else:\n"
+        "    lm.createAllImporterData()\n"
+        "print(time.perf_counter() - t1)\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in ('eager', 'cold', 'warm'):
+            out = subprocess.run([sys.executable, '-c', script, directory, kind],
+                cwd=root, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                universal_newlines=True).stdout
+            report(f"plugin-registry {kind}", seconds=float(out.split()[-1]))
+#@+node:ekr.20261018054204.5: ** benchmark: settings
+@benchmark('settings')
+def bench_settings(args):
+    """
+    Time LM.readGlobalSettingsFiles in fresh processes: without a cache,
+    creating the cached settings, and reading the cached settings.
+    """
+    import os
+    import subprocess
+    import tempfile
+    script = (
+        "import sys, time\n"
+        "import leo.core.leoBridge as leoBridge\n"
+        "bridge = leoBridge.controller(gui='nullGui',\n"
+        "    loadPlugins=False, readSettings=False, silent=True, verbose=False)\n"
+        "g = bridge.globals()\n"
+        "lm = g.app.loadManager\n"
+        "lm.globalSettingsDict = lm.globalBindingsDict = None\n"
+        "if sys.argv[2] == 'uncached':\n"
+        "    g.app.db = g.NullObject()\n"
+        "else:\n"
+        "    import leo.core.leoCache as leoCache\n"
+        "    g.app.db = g.app.global_cacher.db = leoCache.SqlitePickleShare(sys.argv[1])\n"
+        "t1 = time.perf_counter()\n"
+        "lm.readGlobalSettingsFiles()\n"
+        "print(time.perf_counter() - t1)\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in ('uncached', 'cold', 'warm'):
+            out = subprocess.run([sys.executable, '-c', script, directory, kind],
+                cwd=root, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                universal_newlines=True).stdout
+            report(f"settings {kind}", seconds=float(out.split()[-1]))
+#@+node:ekr.20261018054728.13: ** benchmark: startup
+@benchmark('startup')
+def bench_startup(args):
+    """
+    Start Leo with the null gui and --trace-startup in a fresh process,
+    loading --path (default: LeoDocs.leo). Report the startup phases.
+    """
+    import json
+    import os
+    import subprocess
+    import tempfile
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    path = args.path or os.path.join(root, 'leo', 'doc', 'LeoDocs.leo')
+    with tempfile.TemporaryDirectory() as directory:
+        trace_path = os.path.join(directory, 'startup.json')
+        subprocess.run([sys.executable, 'launchLeo.py', '--gui=null', '--silent',
+            f"--trace-startup={trace_path}", path],
+            cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(trace_path) as f:
+            trace = json.load(f)
+    report('startup', seconds=trace['seconds'], modules=len(trace['modules']))
+    for phase in trace['phases']:
+        if phase['depth'] == 0 and 'seconds' in phase:
+            report(f"startup {phase['name']}", seconds=phase['seconds'])
+#@+node:ekr.20261018035742.8: ** main
+def main(argv=None):
+    """Run the benchmarks named on the command line."""
+    parser = argparse.ArgumentParser(
+        prog='python -m leo.core.leoBenchmarks',
+        description='Run benchmarks for Leo\'s core classes.')
+    parser.add_argument('names', nargs='*', metavar='NAME',
+        help='benchmarks to run (default: all)')
+    parser.add_argument('--list', action='store_true',
+        help='list all benchmarks and exit')
+    parser.add_argument('--n', type=int, default=100000,
+        help='size of generated outlines (default: 100000)')
+    parser.add_argument('--path', default=None,
+        help='the .leo file or directory used by some benchmarks')
+    args = parser.parse_args(argv)
+    if args.list:
+        for name in sorted(benchmarks):
+            print(name)
+        return 0
+    for name in args.names:
+        if name not in benchmarks:
+            print(f"unknown benchmark: {name}")
+            return 1
+    for name in args.names or sorted(benchmarks):
+        benchmarks[name](args)
+    return 0
+#@-others
+if __name__ == '__main__':
+    sys.exit(main())
+#@@language python
+#@@tabwidth -4
+#@@pagewidth 70
+#@-leo
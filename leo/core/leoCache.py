@@ -4,11 +4,14 @@
 #@+<< imports >>
 #@+node:ekr.20100208223942.10436: ** << imports >> (leoCache)
 import leo.core.leoGlobals as g
+import collections
 import fnmatch
 import os
 import pickle
 import sqlite3
 import stat
+import time
+import unittest
 import zlib
 #@-<< imports >>
 # Abbreviations used throughout.
@@ -47,22 +50,70 @@ class CommanderCacher:
         # Careful: self.db may be a dict.
         if hasattr(self.db, 'conn'):
             # pylint: disable=no-member
-            self.db.conn.commit()
-            self.db.conn.close()
+            evict(self.db)
+            self.db.close()
     #@+node:ekr.20180627042809.1: *3* cacher.commit
     def commit(self):
         # Careful: self.db may be a dict.
         if hasattr(self.db, 'conn'):
             # pylint: disable=no-member
-            self.db.conn.commit()
+            self.db.commit()
     #@+node:ekr.20180611054447.1: *3* cacher.dump
     def dump(self):
         """Dump the indicated cache if --trace-cache is in effect."""
         dump_cache(g.app.commander_db, tag='Commander Cache')
+    #@+node:ekr.20261018041410.3: *3* cacher.stats
+    def stats(self):
+        """Report statistics for the cache-stats command."""
+        print_cache_stats(self.db, tag='Commander Cache')
     #@+node:ekr.20180627053508.1: *3* cacher.get_wrapper
     def get_wrapper(self, c, fn=None):
         """Return a new wrapper for c."""
         return CommanderWrapper(c, fn=fn)
+    #@+node:ekr.20261018040804.2: *3* cacher.get/put_file_snapshot
+    # at.read uses snapshots to avoid parsing unchanged external files.
+
+    def get_file_snapshot(self, path, digest):
+        """
+        Return the cached snapshot of the external file at path,
+        or None if the snapshot was made from different contents.
+        """
+        try:
+            data = self.db.get(f"{path}:::at-file-snapshot")
+        except Exception:
+            return None
+        if isinstance(data, tuple) and len(data) == 2 and data[0] == digest:
+            return data[1]
+        return None
+
+    def put_file_snapshot(self, path, digest, snapshot):
+        """
+        Cache the snapshot of the external file at path.
+        cacher.commit writes the snapshot.
+        """
+        try:
+            self.db[f"{path}:::at-file-snapshot"] = (digest, snapshot)
+        except Exception:
+            g.es_exception()
+    #@+node:ekr.20261018043944.7: *3* cacher.get/put_search_index
+    # leoFind.SearchIndex caches its index beside the outline.
+
+    def get_search_index(self, path):
+        """Return the cached search index of the outline at path, or None."""
+        try:
+            return self.db.get(f"{path}:::search-index")
+        except Exception:
+            return None
+
+    def put_search_index(self, path, data):
+        """
+        Cache the search index of the outline at path.
+        cacher.commit writes the index.
+        """
+        try:
+            self.db[f"{path}:::search-index"] = data
+        except Exception:
+            g.es_exception()
     #@+node:ekr.20100208065621.5890: *3* cacher.test
     def test(self):
 
@@ -95,7 +146,12 @@ class CommanderCacher:
         
         save and save-as set changeName to True, save-to does not.
         """
+        index = getattr(c, 'searchIndex', None)
+        if index and changeName:
+            index.save()
         self.commit()
+        g.app.global_cacher.commit()
+            # c.db writes to g.app.db.
         if fn and changeName:
             # 1484: Change only the key!
             if isinstance(c.db, CommanderWrapper):
@@ -176,8 +232,18 @@ class GlobalCacher:
             # pylint: disable=no-member
             if 'cache' in g.app.debug:
                 self.dump(tag='Shutdown')
-            self.db.conn.commit()
-            self.db.conn.close()
+            evict(self.db)
+            self.db.close()
+    #@+node:ekr.20261018041127.4: *3* g_cacher.commit
+    def commit(self):
+        # Careful: self.db may be a dict.
+        if hasattr(self.db, 'conn'):
+            # pylint: disable=no-member
+            self.db.commit()
+    #@+node:ekr.20261018041410.4: *3* g_cacher.stats
+    def stats(self):
+        """Report statistics for the cache-stats command."""
+        print_cache_stats(self.db, tag='Global Cache')
     #@+node:ekr.20180627045953.1: *3* g_cacher.dump
     def dump(self, tag=''):
         """Dump the indicated cache if --trace-cache is in effect."""
@@ -467,26 +533,51 @@ class SqlitePickleShare:
     def init_dbtables(self, conn):
         sql = 'create table if not exists cachevalues(key text primary key, data blob);'
         conn.execute(sql)
+        # db.evict uses the last access time of each key.
+        columns = [row[1] for row in conn.execute('pragma table_info(cachevalues);')]
+        if 'atime' not in columns:
+            conn.execute('alter table cachevalues add column atime real default 0;')
     #@+node:vitalije.20170716201700.3: *4*  __init__ (SqlitePickleShare)
-    def __init__(self, root):
+    # Values written by this class start with this versioned prefix.
+    # Legacy values are zlib streams, which can't start with b'l'.
+    format_prefix = b'leo-cache-1:'
+
+    def __init__(self, root, cache_bytes=1 << 20):
         """
         Init the SqlitePickleShare class.
         root: The directory that contains the data. Created if it doesn't exist.
+        cache_bytes: The size of the LRU cache of values, in compressed bytes.
         """
         self.root = abspath(expanduser(root))
         if not isdir(self.root) and not g.unitTesting:
             self._makedirs(self.root)
         dbfile = ':memory:' if g.unitTesting else join(root, 'cache.sqlite')
         self.conn = sqlite3.connect(dbfile, isolation_level=None)
+        self.conn.execute('pragma journal_mode=wal;')
+        self.conn.execute('pragma synchronous=normal;')
         self.init_dbtables(self.conn)
-        self.cache = {}
-            # Keys are normalized file names.
-            # Values are tuples (obj, orig_mod_time)
+        self.cache = collections.OrderedDict()
+            # An LRU cache. Keys are keys, values are compressed data.
+            # Hits unpickle the data, so callers never share cached objects.
+        self.cache_bytes = cache_bytes
+            # The maximum total size of the cached values.
+        self.cached_bytes = 0
+            # The total size of the cached values.
+        self.pending = {}
+            # Writes not yet committed.
+            # Keys are keys, values are compressed data or _sentinel (deleted).
+        self.accessed = {}
+            # Access times not yet committed. Keys are keys, values are times.
+        self.lru_hits = self.db_hits = self.misses = 0
+            # Statistics for the cache-stats command.
+        prefix = self.format_prefix
 
         def loadz(data):
             if data:
                 # Retain this code for maximum compatibility.
                 try:
+                    if data[: len(prefix)] == prefix:
+                        data = data[len(prefix) :]
                     val = pickle.loads(zlib.decompress(data))
                 except(ValueError, TypeError):
                     g.es("Unpickling error - Python 3 data accessed from Python 2?")
@@ -495,13 +586,10 @@ class SqlitePickleShare:
             return None
 
         def dumpz(val):
-            try:
-                # Use Python 2's highest protocol, 2, if possible
-                data = pickle.dumps(val, protocol=2)
-            except Exception:
-                # Use best available if that doesn't work (unlikely)
-                data = pickle.dumps(val, pickle.HIGHEST_PROTOCOL)
-            return sqlite3.Binary(zlib.compress(data))
+            data = pickle.dumps(val, pickle.HIGHEST_PROTOCOL)
+            # Compress large values, such as search indices, much faster.
+            level = 1 if len(data) > 1 << 20 else 6
+            return sqlite3.Binary(prefix + zlib.compress(data, level))
 
         self.loader = loadz
         self.dumper = dumpz
@@ -513,27 +601,37 @@ class SqlitePickleShare:
     #@+node:vitalije.20170716201700.5: *4* __delitem__
     def __delitem__(self, key):
         """ del db["key"] """
-        try:
-            self.conn.execute(
-                '''delete from cachevalues
-                where key=?''', (key,))
-        except sqlite3.OperationalError:
-            pass
+        self.pending[key] = _sentinel
+        self.uncache(key)
     #@+node:vitalije.20170716201700.6: *4* __getitem__
     def __getitem__(self, key):
         """ db['key'] reading """
-        try:
-            obj = None
-            for row in self.conn.execute(
-                '''select data from cachevalues
-                where key=?''', (key,)):
-                obj = self.loader(row[0])
-                break
-            else:
-                raise KeyError(key)
-        except sqlite3.Error:
+        cache = self.cache
+        if key in cache:
+            cache.move_to_end(key)
+            self.accessed[key] = time.time()
+            self.lru_hits += 1
+            return self.loader(cache[key])
+        data = self.pending.get(key)
+        if data is _sentinel:
+            self.misses += 1
             raise KeyError(key)
-        return obj
+        if data is None:
+            try:
+                for row in self.conn.execute(
+                    '''select data from cachevalues
+                    where key=?''', (key,)):
+                    data = row[0]
+                    break
+                else:
+                    self.misses += 1
+                    raise KeyError(key)
+            except sqlite3.Error:
+                raise KeyError(key)
+            self.accessed[key] = time.time()
+        self.db_hits += 1
+        self._remember(key, data)
+        return self.loader(data)
     #@+node:vitalije.20170716201700.7: *4* __iter__
     def __iter__(self):
 
@@ -544,18 +642,30 @@ class SqlitePickleShare:
         return f"SqlitePickleShare('{self.root}')"
     #@+node:vitalije.20170716201700.9: *4* __setitem__
     def __setitem__(self, key, value):
-        """ db['key'] = 5 """
-        try:
-            data = self.dumper(value)
-            self.conn.execute(
-                '''replace into cachevalues(key, data) values(?,?);''',
-                (key, data))
-        except sqlite3.OperationalError as e:
-            g.es_exception(e)
+        """
+        db['key'] = 5
+
+        Writes are pending until db.commit.
+        """
+        data = self.dumper(value)
+        self.pending[key] = data
+        self._remember(key, data)
     #@+node:vitalije.20170716201700.10: *3* _makedirs
     def _makedirs(self, fn, mode=0o777):
 
         os.makedirs(fn, mode)
+    #@+node:ekr.20261018041127.1: *3* _remember
+    def _remember(self, key, data):
+        """Add data to the LRU cache, evicting least-recently used values."""
+        cache = self.cache
+        self.uncache(key)
+        if len(data) > self.cache_bytes:
+            return
+        cache[key] = data
+        self.cached_bytes += len(data)
+        while self.cached_bytes > self.cache_bytes:
+            key2, data2 = cache.popitem(last=False)
+            self.cached_bytes -= len(data2)
     #@+node:vitalije.20170716201700.11: *3* _openFile (SqlitePickleShare)
     def _openFile(self, fn, mode='r'):
         """ Open this file.  Return a file object.
@@ -604,11 +714,83 @@ class SqlitePickleShare:
         # Deletes all files in the fcache subdirectory.
         # It would be more thorough to delete everything
         # below the root directory, but it's not necessary.
+        self.pending = {}
+        self.accessed = {}
+        self.uncache()
         self.conn.execute('delete from cachevalues;')
+    #@+node:ekr.20261018041127.2: *3* close & commit (SqlitePickleShare)
+    def close(self):
+        """Commit all pending writes and close the connection."""
+        self.commit()
+        self.conn.close()
+
+    def commit(self):
+        """Write all pending writes and access times in a single transaction."""
+        conn = self.conn
+        pending, self.pending = self.pending, {}
+        accessed, self.accessed = self.accessed, {}
+        if conn.in_transaction:
+            # reset_protocol_in_values may leave a deferred transaction.
+            conn.commit()
+        if not pending and not accessed:
+            return
+        now = time.time()
+        deletes = [(key,) for key, data in pending.items() if data is _sentinel]
+        writes = [(key, data, now) for key, data in pending.items() if data is not _sentinel]
+        reads = [(atime, key) for key, atime in accessed.items() if key not in pending]
+        try:
+            conn.execute('begin;')
+            conn.executemany(
+                '''delete from cachevalues where key=?;''', deletes)
+            conn.executemany(
+                '''replace into cachevalues(key, data, atime) values(?,?,?);''', writes)
+            conn.executemany(
+                '''update cachevalues set atime=? where key=?;''', reads)
+            conn.execute('commit;')
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('rollback;')
+            g.es_exception(e)
+    #@+node:ekr.20261018041410.1: *3* evict (SqlitePickleShare)
+    def evict(self, max_bytes):
+        """
+        Delete the least-recently used keys until the values take at
+        most 90% of max_bytes. Return the number of deleted keys.
+        """
+        self.commit()
+        conn = self.conn
+        total = conn.execute(
+            'select total(length(data)) from cachevalues;').fetchone()[0]
+        if total <= max_bytes:
+            return 0
+        # Evict below max_bytes, so that evictions (and vacuums) are rare.
+        target = 0.9 * max_bytes
+        rows = conn.execute(
+            '''select key, length(data) from cachevalues
+            where key != ? order by atime;''', (self.protocol_key,)).fetchall()
+        deletes = []
+        for key, size in rows:
+            if total <= target:
+                break
+            deletes.append((key,))
+            total -= size or 0
+        try:
+            conn.execute('begin;')
+            conn.executemany('delete from cachevalues where key=?;', deletes)
+            conn.execute('commit;')
+            conn.execute('vacuum;')
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('rollback;')
+            g.es_exception(e)
+            return 0
+        self.uncache(*[z[0] for z in deletes])
+        return len(deletes)
     #@+node:vitalije.20170716201700.16: *3* get  (SqlitePickleShare)
     def get(self, key, default=None):
 
         if not self.has_key(key):
+            self.misses += 1
             return default
         try:
             val = self[key]
@@ -617,12 +799,17 @@ class SqlitePickleShare:
             return default
     #@+node:vitalije.20170716201700.17: *3* has_key (SqlightPickleShare)
     def has_key(self, key):
+        if key in self.cache:
+            return True
+        if key in self.pending:
+            return self.pending[key] is not _sentinel
         sql = 'select 1 from cachevalues where key=?;'
         for row in self.conn.execute(sql, (key,)):
             return True
         return False
     #@+node:vitalije.20170716201700.18: *3* items
     def items(self):
+        self.commit()
         sql = 'select key,data from cachevalues;'
         for key, data in self.conn.execute(sql):
             yield key, data
@@ -631,6 +818,7 @@ class SqlitePickleShare:
 
     def keys(self, globpat=None):
         """Return all keys in DB, or all keys matching a glob"""
+        self.commit()
         if globpat is None:
             sql = 'select key from cachevalues;'
             args = tuple()
@@ -641,8 +829,10 @@ class SqlitePickleShare:
         for key in self.conn.execute(sql, args):
             yield key
     #@+node:vitalije.20170818091008.1: *3* reset_protocol_in_values
+    protocol_key = '__cache_pickle_protocol__'
+
     def reset_protocol_in_values(self):
-        PROTOCOLKEY = '__cache_pickle_protocol__'
+        PROTOCOLKEY = self.protocol_key
         if self.get(PROTOCOLKEY, 3) == 2: return
         #@+others
         #@+node:vitalije.20170818115606.1: *4* viewrendered special case
@@ -673,10 +863,38 @@ class SqlitePickleShare:
         self.conn.commit()
 
         self.conn.isolation_level = None
+        self.commit()
+    #@+node:ekr.20261018041410.2: *3* stats (SqlitePickleShare)
+    def stats(self, n=10):
+        """
+        Return a dict describing the db and its use, for the cache-stats
+        command. Sizes are in compressed bytes.
+        """
+        self.commit()
+        rows = self.conn.execute(
+            'select key, length(data) from cachevalues;').fetchall()
+        prefixes = {}
+            # Keys are the prefixes of keys, usually the paths of .leo files.
+        for key, size in rows:
+            prefix = key.split(':::')[0] if ':::' in key else None
+            prefixes[prefix] = prefixes.get(prefix, 0) + (size or 0)
+        return {
+            'keys': len(rows),
+            'bytes': sum(size or 0 for key, size in rows),
+            'lru_hits': self.lru_hits,
+            'db_hits': self.db_hits,
+            'misses': self.misses,
+            'prefixes': sorted(prefixes.items(), key=lambda z: -z[1])[:n],
+            'largest': sorted(rows, key=lambda z: -(z[1] or 0))[:n],
+        }
     #@+node:vitalije.20170716201700.23: *3* uncache
     def uncache(self, *items):
-        """not used in SqlitePickleShare"""
-        pass
+        """Remove all, or the specified items, from the LRU cache."""
+        if not items:
+            self.cache.clear()
+            self.cached_bytes = 0
+        for key in items:
+            self.cached_bytes -= len(self.cache.pop(key, b''))
     #@-others
 #@+node:ekr.20180627050237.1: ** function: dump_cache
 def dump_cache(db, tag):
@@ -729,6 +947,66 @@ def dump_list(heading, aList):
         else:
             print(f"{key:30}:")
             g.printObj(val)
+#@+node:ekr.20261018041410.5: ** function: evict
+def evict(db):
+    """
+    Evict the least-recently used entries of db if db is larger than
+    @int max-cache-megabytes.
+    """
+    megabytes = g.app.config and g.app.config.getInt('max-cache-megabytes')
+    if not megabytes or megabytes < 0:
+        return
+    n = db.evict(megabytes * 1024 * 1024)
+    if n and 'cache' in g.app.debug:
+        print(f"evicted {n} keys from {db!r}")
+#@+node:ekr.20261018041410.6: ** function: print_cache_stats
+def print_cache_stats(db, tag):
+    """Print statistics about the given cache."""
+    g.es_print(f"\n===== {tag} =====\n")
+    if not isinstance(db, SqlitePickleShare):
+        g.es_print('no statistics')
+        return
+    d = db.stats()
+    lookups = d['lru_hits'] + d['db_hits'] + d['misses']
+    hits = d['lru_hits'] + d['db_hits']
+    hit_rate = 100.0 * hits / lookups if lookups else 0.0
+    lru_rate = 100.0 * d['lru_hits'] / hits if hits else 0.0
+    g.es_print(f"{d['keys']} keys, {d['bytes'] // 1024} KB")
+    g.es_print(f"{lookups} lookups, hit rate: {hit_rate:.1f}%, "
+        f"in-memory hit rate: {lru_rate:.1f}%")
+    g.es_print('\nsize per commander key...\n')
+    for prefix, size in d['prefixes']:
+        g.es_print(f"{size // 1024:8} KB {prefix or '(global)'}")
+    g.es_print('\ntop consumers...\n')
+    for key, size in d['largest']:
+        g.es_print(f"{(size or 0) // 1024:8} KB {key}")
+#@+node:ekr.20261018060204.1: ** class TestSqlitePickleShare
+class TestSqlitePickleShare(unittest.TestCase):
+    """Test cases for the SqlitePickleShare class."""
+    #@+others
+    #@+node:ekr.20261018060204.2: *3* test_values_are_not_shared
+    def test_values_are_not_shared(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            db = SqlitePickleShare(directory)
+            try:
+                # Changing a stored value must not change the cached value.
+                x = [1]
+                db['k'] = x
+                x.append(2)
+                assert db['k'] == [1], db['k']  # A hit in the LRU cache.
+                db.commit()
+                db.uncache()
+                assert db['k'] == [1], db['k']  # A hit in the database.
+                # Changing a value that was read must not change the cached value.
+                y = db['k']
+                y.append(3)
+                assert db['k'] == [1], db['k']
+                assert db['k'] is not db['k']
+                assert db.lru_hits >= 3, db.lru_hits
+            finally:
+                db.conn.close()
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
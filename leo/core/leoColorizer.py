@@ -782,27 +782,19 @@ class BaseJEditColorizer(BaseColorizer):
          """
         # Add any new user keywords to leoKeywordsDict.
         d = self.keywordsDict
-        keys = list(d.keys())
         for s in g.globalDirectiveList:
             key = '@' + s
-            if key not in keys:
+            if key not in d:
                 d[key] = 'leokeyword'
-        # Create a temporary chars list.  It will be converted to a dict later.
-        chars = [z for z in string.ascii_letters + string.digits]
-        for key in list(d.keys()):
-            for ch in key:
-                if ch not in chars:
-                    chars.append(g.checkUnicode(ch))
+        # Create a temporary chars set. Modes may define thousands of keywords.
+        chars = set(string.ascii_letters + string.digits)
+        chars.update(''.join(d))
         # jEdit2Py now does this check, so this isn't really needed.
         # But it is needed for forth.py.
-        for ch in (' ', '\t'):
-            if ch in chars:
-                # g.es_print('removing %s from word_chars' % (repr(ch)))
-                chars.remove(ch)
+        chars.discard(' ')
+        chars.discard('\t')
         # Convert chars to a dict for faster access.
-        self.word_chars = {}
-        for z in chars:
-            self.word_chars[z] = z
+        self.word_chars = {z: z for z in chars}
     #@+node:ekr.20110605121601.18584: *4* bjc.setModeAttributes
     def setModeAttributes(self):
         """
@@ -248,6 +248,7 @@ class Commands:
         c.fileCommands = DummyFileCommands()
         self.hiddenRootNode = leoNodes.VNode(context=c, gnx=gnx)
         self.hiddenRootNode.h = '<hidden root vnode>'
+        self.outlineIndex = leoNodes.OutlineIndex(c)
         c.fileCommands = None
         # Create the gui frame.
         title = c.computeWindowTitle(c.mFileName)
@@ -318,6 +319,7 @@ class Commands:
         self.shadowController       = leoShadow.ShadowController(c)
         self.fileCommands           = leoFileCommands.FileCommands(c)
         self.findCommands           = leoFind.LeoFind(c)
+        self.searchIndex            = leoFind.SearchIndex(c)
         self.atFileCommands         = leoAtFile.AtFile(c)
         self.importCommands         = leoImport.LeoImportCommands(c)
         self.markupCommands         = leoMarkup.MarkupCommands(c)
@@ -790,6 +792,23 @@ class Commands:
     all_vnodes_iter = all_nodes
     all_unique_tnodes_iter = all_unique_nodes
     all_unique_vnodes_iter = all_unique_nodes
+    #@+node:ekr.20261018042245.6: *5* c.all_frames & all_unique_frames
+    def all_frames(self, unique=False):
+        """
+        Return a leoNodes.FrameIterator yielding frames for all nodes of the
+        outline, in outline order.
+
+        Unlike c.all_positions, the iterator never copies positions.
+        """
+        c = self
+        return leoNodes.FrameIterator(leoNodes.Frame(c.hiddenRootNode, 0, None), unique=unique)
+
+    def all_unique_frames(self):
+        """
+        Return a leoNodes.FrameIterator yielding frames for all nodes of the
+        outline, in outline order. Yields only the first frame for each vnode.
+        """
+        return self.all_frames(unique=True)
     #@+node:ekr.20091001141621.6044: *5* c.all_positions
     def all_positions(self, copy=True):
         """A generator return all positions of the outline, in outline order."""
@@ -804,46 +823,19 @@ class Commands:
     all_positions_iter = all_positions
     allNodes_iter = all_positions
     #@+node:ekr.20191014093239.1: *5* c.all_positions_for_v
-    # from leo.core.leoNodes import Position
-
     def all_positions_for_v(self, v, stack=None):
         """
         Generates all positions p in this outline where p.v is v.
-        
-        Should be called with stack=None.
-        
-        The generated positions are not necessarily in outline order.
-        
-        By Виталије Милошевић (Vitalije Milosevic).
-        """
-        c = self
 
-        if stack is None:
-            stack = []
+        The stack argument is no longer used.
 
+        The generated positions are in outline order.
+        """
+        c = self
         if not isinstance(v, leoNodes.VNode):
             g.es_print(f"not a VNode: {v!r}")
             return  # Stop the generator.
-
-        def allinds(v, target_v):
-            """Yield all indices i such that v.children[i] == target_v."""
-            for i, x in enumerate(v.children):
-                if x is target_v:
-                    yield i
-
-        def stack2pos(stack):
-            """Convert the stack to a position."""
-            v, i = stack[-1]
-            return leoNodes.Position(v, i, stack[:-1])
-
-        for v2 in set(v.parents):
-            for i in allinds(v2, v):
-                stack.insert(0, (v, i))
-                if v2 is c.hiddenRootNode:
-                    yield stack2pos(stack)
-                else:
-                    yield from c.all_positions_for_v(v2, stack)
-                stack.pop(0)
+        yield from c.outlineIndex.positions(v)
     #@+node:ekr.20161120121226.1: *5* c.all_roots
     def all_roots(self, copy=True, predicate=None):
         """
@@ -1202,22 +1194,7 @@ class Commands:
         c = self
         context = v.context  # v's commander.
         assert(c == context)
-        stack = []
-        while v.parents:
-            parent = v.parents[0]
-            if v in parent.children:
-                n = parent.children.index(v)
-            else:
-                return None
-            stack.insert(0, (v, n),)
-            v = parent
-        # v.parents includes the hidden root node.
-        if not stack:
-            # a VNode not in the tree
-            return None
-        v, n = stack.pop()
-        p = leoNodes.Position(v, n, stack)
-        return p
+        return c.outlineIndex.position(v)
     #@+node:ekr.20090130135126.1: *4* c.Properties
     def __get_p(self):
         c = self
@@ -3964,7 +3941,10 @@ class Commands:
         c = self
         pat = re.compile(regex, flags)
         res = leoNodes.PosList()
+        candidates = c.searchIndex.regex_candidates(regex, flags)
         for p in c.all_positions():
+            if candidates is not None and p.v not in candidates:
+                continue
             m = re.match(pat, p.h)
             if m:
                 pc = p.copy()
@@ -3980,7 +3960,10 @@ class Commands:
         c = self
         pat = re.compile(regex, flags)
         res = leoNodes.PosList()
+        candidates = c.searchIndex.regex_candidates(regex, flags)
         for p in c.all_positions():
+            if candidates is not None and p.v not in candidates:
+                continue
             m = re.finditer(pat, p.b)
             t1, t2 = itertools.tee(m, 2)
             try:
@@ -3996,14 +3979,12 @@ class Commands:
         """Select the first clone of target that is outside any @file node."""
         c = self
         if target.isCloned():
-            v = target.v
-            for p in c.all_positions():
-                if p.v == v:
-                    for parent in p.self_and_parents(copy=False):
-                        if parent.isAnyAtFileNode():
-                            break
-                    else:
-                        return p
+            for p in c.outlineIndex.positions(target.v):
+                for parent in p.self_and_parents(copy=False):
+                    if parent.isAnyAtFileNode():
+                        break
+                else:
+                    return p
         return target
     #@+node:ekr.20171124155725.1: *3* c.Settings
     #@+node:ekr.20171114114908.1: *4* c.registerReloadSettings
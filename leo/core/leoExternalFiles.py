@@ -3,11 +3,18 @@
 #@+node:ekr.20160306114544.1: * @file leoExternalFiles.py
 #@@first
 import leo.core.leoGlobals as g
+import concurrent.futures
+import ctypes
+import ctypes.util
 import getpass
 import os
+import struct
 import subprocess
+import sys
 import tempfile
 import time
+import unittest
+import zlib
 #@+others
 #@+node:ekr.20160306110233.1: ** class ExternalFile
 class ExternalFile:
@@ -67,8 +74,17 @@ class ExternalFilesController:
         self.has_changed_d = {}
             # Keys are commanders. Values are bools.
             # Used only to limit traces.
-        self.unchecked_commanders = []
-            # Copy of g.app.commanders()
+        self.checksum_futures = {}
+            # Keys are full paths, values are futures computing checksums.
+        self.executor = None
+            # The thread computing checksums, created on first use.
+        self.index_d = {}
+            # Keys are commanders.
+            # Values are dicts: keys are full paths, values are @<file> vnodes.
+        self.index_interval = 10
+            # Rescan an outline for @<file> nodes every 10 seconds.
+        self.index_time_d = {}
+            # Keys are commanders, values are the times of the last scan.
         self.unchecked_files = []
             # Copy of self file. Only one files is checked at idle time.
         self._time_d = {}
@@ -77,6 +93,8 @@ class ExternalFilesController:
             # get_time(path), see set_time() for notes.
         self.yesno_all_time = 0  # previous yes/no to all answer, time of answer
         self.yesno_all_answer = None  # answer, 'yes-all', or 'no-all'
+        self.watcher = FileWatcher()
+            # Reports changes to the files of @<file> nodes.
         g.app.idleTimeManager.add_callback(self.on_idle)
     #@+node:ekr.20150405105938.1: *3* efc.entries
     #@+node:ekr.20150405194745.1: *4* efc.check_overwrite (called from c.checkTimeStamp)
@@ -142,18 +160,11 @@ class ExternalFilesController:
                 for ef in self.unchecked_files:
                     self.idle_check_open_with_file(ef)
                 self.unchecked_files = []
-            elif self.unchecked_commanders:
-                # Check the next commander for which
-                # @bool check_for_changed_external_file is True.
-                c = self.unchecked_commanders.pop()
-                self.idle_check_commander(c)
             else:
-                # Add all commanders for which
-                # @bool check_for_changed_external_file is True.
-                self.unchecked_commanders = [
-                    z for z in g.app.commanders() if self.is_enabled(z)
-                ]
                 self.unchecked_files = [z for z in self.files if z.exists()]
+            # Check the @<file> nodes of all commanders for which
+            # @bool check_for_changed_external_file is True.
+            self.idle_check_commanders()
         else:
             # First, check all existing open-with files.
             for ef in self.files:  # A list of ExternalFile instances.
@@ -164,25 +175,132 @@ class ExternalFilesController:
             for c in g.app.commanders():
                 if self.is_enabled(c):
                     self.idle_check_commander(c)
+    #@+node:ekr.20261018051458.1: *5* efc.idle_check_commanders & helpers
+    def idle_check_commanders(self):
+        '''
+        Check the external files of enabled commanders for changes.
+
+        The watcher reports the files that may have changed. Files whose
+        modification times differ from the recorded times are checksummed
+        in a worker thread. Only files whose checksums differ are handled by
+        idle_check_at_file_node.
+        '''
+        commanders = [z for z in g.app.commanders() if self.is_enabled(z)]
+        for c in list(self.index_d):
+            if c not in commanders:
+                self.forget_commander(c)
+        # Rescan at most one outline for @<file> nodes.
+        now = time.time()
+        for c in commanders:
+            if now - self.index_time_d.get(c, 0) >= self.index_interval:
+                self.index_commander(c)
+                break
+        for path in self.watcher.poll():
+            self.check_changed_path(path)
+        for path, future in list(self.checksum_futures.items()):
+            if future.done():
+                del self.checksum_futures[path]
+                try:
+                    new_sum = future.result()
+                except (OSError, concurrent.futures.CancelledError):
+                    continue
+                self.finish_checksum(path, new_sum)
+    #@+node:ekr.20261018051458.2: *6* efc.check_changed_path & finish_checksum
+    def check_changed_path(self, path):
+        '''Start checksumming path if its modification time has changed.'''
+        if not g.os_path_exists(path) or g.os_path_isdir(path):
+            return
+        if self.get_mtime(path) != self.get_time(path):
+            self.start_checksum(path)
+
+    def finish_checksum(self, path, new_sum):
+        '''Handle the checksum of path computed in the worker thread.'''
+        old_sum = self.checksum_d.get(path)
+        if old_sum is None or old_sum == new_sum:
+            # A new file, or the mod time changed, but its contents didn't.
+            self.checksum_d[path] = new_sum
+            self.set_time(path)
+            return
+        for c, paths in list(self.index_d.items()):
+            v = paths.get(path)
+            if v and c in g.app.commanders():
+                p = c.vnode2position(v)
+                if p:
+                    self.idle_check_at_file_node(c, p, new_sum)
+                    return
+        self.checksum_d[path] = new_sum
+        self.set_time(path)
+
+    def start_checksum(self, path):
+        '''Compute the checksum of path in the worker thread.'''
+        if not self.executor:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        future = self.checksum_futures.get(path)
+        if future:
+            future.cancel()
+        self.checksum_futures[path] = self.executor.submit(self.checksum, path)
+    #@+node:ekr.20261018051458.3: *6* efc.index_commander & forget_commander
+    def index_commander(self, c):
+        '''Update the paths of all @<file> nodes in c and watch them.'''
+        old_paths = self.index_d.get(c, {})
+        paths = {}
+        for frame in c.all_unique_frames():
+            if frame.v.isAnyAtFileNode():
+                path = g.fullPath(c, frame.position())
+                if path and path not in paths:
+                    paths[path] = frame.v
+        self.index_d[c] = paths
+        self.index_time_d[c] = time.time()
+        for path in old_paths:
+            if path not in paths and not self.is_indexed(path):
+                self.watcher.unwatch(path)
+        for path in paths:
+            if path not in old_paths:
+                self.watcher.watch(path)
+                if (
+                    path not in self.checksum_d
+                    and g.os_path_exists(path) and not g.os_path_isdir(path)
+                ):
+                    # Remember the present contents.
+                    self.set_time(path)
+                    self.start_checksum(path)
+
+    def forget_commander(self, c):
+        '''Stop watching the files of a closed or disabled commander.'''
+        paths = self.index_d.pop(c, {})
+        self.index_time_d.pop(c, None)
+        for path in paths:
+            if not self.is_indexed(path):
+                self.watcher.unwatch(path)
+
+    def is_indexed(self, path):
+        '''True if path is the path of any indexed @<file> node.'''
+        return any(path in z for z in self.index_d.values())
     #@+node:ekr.20150404045115.1: *5* efc.idle_check_commander
     def idle_check_commander(self, c):
         '''
         Check all external files corresponding to @<file> nodes in c for
         changes.
+
+        on_idle no longer calls this method: see idle_check_commanders.
         '''
         # #1100: always scan the entire file for @<file> nodes.
         # #1134: Nested @<file> nodes are no longer valid, but this will do no harm.
-        for p in c.all_unique_positions():
-            if p.isAnyAtFileNode():
-                self.idle_check_at_file_node(c, p)
+        # Create positions only for @<file> nodes.
+        for frame in c.all_unique_frames():
+            if frame.v.isAnyAtFileNode():
+                self.idle_check_at_file_node(c, frame.position())
     #@+node:ekr.20150403044823.1: *5* efc.idle_check_at_file_node
-    def idle_check_at_file_node(self, c, p):
-        '''Check the @<file> node at p for external changes.'''
+    def idle_check_at_file_node(self, c, p, new_sum=None):
+        '''
+        Check the @<file> node at p for external changes.
+        new_sum is the file's checksum, if known.
+        '''
         trace = False
             # Matt, set this to True, but only for the file that interests you.\
             # trace = p.h == '@file unregister-leo.leox'
         path = g.fullPath(c, p)
-        has_changed = self.has_changed(c, path)
+        has_changed = self.has_changed(c, path, new_sum)
         if trace:
             g.trace('changed', has_changed, p.h)
         if has_changed:
@@ -195,7 +313,7 @@ class ExternalFilesController:
                 c.redraw()
             # Always update the path & time to prevent future warnings.
             self.set_time(path)
-            self.checksum_d[path] = self.checksum(path)
+            self.checksum_d[path] = new_sum or self.checksum(path)
     #@+node:ekr.20150407124259.1: *5* efc.idle_check_open_with_file & helper
     def idle_check_open_with_file(self, ef):
         '''Update the open-with node given by ef.'''
@@ -459,6 +577,10 @@ class ExternalFilesController:
         for ef in self.files[:]:
             self.destroy_temp_file(ef)
         self.files = []
+        self.watcher.close()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
     #@+node:ekr.20150405110219.1: *3* efc.utilities
     # pylint: disable=no-value-for-parameter
     #@+node:ekr.20150405200212.1: *4* efc.ask
@@ -503,12 +625,16 @@ class ExternalFilesController:
             # Careful: may be unit testing.
     #@+node:ekr.20150404052819.1: *4* efc.checksum
     def checksum(self, path):
-        '''Return the checksum of the file at the given path.'''
-        import hashlib
+        '''
+        Return the checksum of the file at the given path.
+
+        Checksums are compared only after modification times differ, so
+        the size and crc32 suffice. crc32 is much faster than md5.
+        '''
         # #1454: Explicitly close the file.
         with open(path, 'rb') as f:
             s = f.read()
-        return hashlib.md5(s).hexdigest()
+        return f"{len(s)}:{zlib.crc32(s):08x}"
     #@+node:ekr.20031218072017.2614: *4* efc.destroy_temp_file
     def destroy_temp_file(self, ef):
         '''Destroy the *temp* file corresponding to ef, an ExternalFile instance.'''
@@ -531,8 +657,11 @@ class ExternalFilesController:
         '''
         return self._time_d.get(g.os_path_realpath(path))
     #@+node:ekr.20150403045207.1: *4* efc.has_changed
-    def has_changed(self, c, path):
-        '''Return True if p's external file has changed outside of Leo.'''
+    def has_changed(self, c, path, new_sum=None):
+        '''
+        Return True if p's external file has changed outside of Leo.
+        new_sum is the file's checksum, if known.
+        '''
         if not g.os_path_exists(path):
             return False
         if g.os_path_isdir(path):
@@ -551,7 +680,8 @@ class ExternalFilesController:
         #
         # Check the checksums *only* if the mod times don't match.
         old_sum = self.checksum_d.get(path)
-        new_sum = self.checksum(path)
+        if new_sum is None:
+            new_sum = self.checksum(path)
         if new_sum == old_sum:
             # The modtime changed, but it's contents didn't.
             # Update the time, so we don't keep checking the checksums.
@@ -616,6 +746,213 @@ class ExternalFilesController:
             title='External file changed',
         )
     #@-others
+#@+node:ekr.20261018051458.4: ** class FileWatcher
+class FileWatcher:
+    '''
+    A class reporting changes to watched files.
+
+    On Linux, the watcher asks inotify to watch the directories containing
+    the files. Elsewhere, or when inotify fails, the watcher polls at most
+    batch_size directories per call to poll(), scanning each directory
+    with a single os.scandir.
+
+    poll() returns the set of watched paths that may have changed.
+    '''
+    # inotify event masks. See /usr/include/linux/inotify.h
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    mask = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+        | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+    def __init__(self, use_inotify=True, batch_size=50):
+        '''Ctor for the FileWatcher class.'''
+        self.batch_size = batch_size
+            # The maximum number of directories scanned by each poll.
+        self.dirs = {}
+            # Keys are directories, values are sets of watched paths.
+        self.fd = None
+            # The inotify file descriptor, or None.
+        self.libc = None
+        self.poll_dirs = []
+            # Directories that must be polled, in round-robin order.
+        self.poll_n = 0
+            # The index of the next directory to poll.
+        self.stats = {}
+            # Keys are polled paths, values are (mtime, size) or None.
+        self.wd_dirs = {}
+            # Keys are inotify watch descriptors, values are directories.
+        if use_inotify:
+            self.init_inotify()
+    #@+others
+    #@+node:ekr.20261018051458.5: *3* watcher.init_inotify & close
+    def init_inotify(self):
+        '''Set self.fd to a non-blocking inotify file descriptor, if possible.'''
+        if not sys.platform.startswith('linux'):
+            return
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (AttributeError, OSError):
+            return
+        if fd >= 0:
+            self.libc, self.fd = libc, fd
+
+    def close(self):
+        '''Stop watching all files.'''
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self.dirs, self.poll_dirs, self.stats, self.wd_dirs = {}, [], {}, {}
+    #@+node:ekr.20261018051458.6: *3* watcher.watch & unwatch
+    def watch(self, path):
+        '''Start watching the file at path.'''
+        directory = os.path.dirname(path)
+        paths = self.dirs.get(directory)
+        if paths is None:
+            paths = self.dirs[directory] = set()
+            wd = -1
+            if self.fd is not None:
+                wd = self.libc.inotify_add_watch(
+                    self.fd, os.fsencode(directory), self.mask)
+            if wd < 0 or wd in self.wd_dirs:
+                # Too many watches, a missing directory or an alias.
+                self.poll_dirs.append(directory)
+            else:
+                self.wd_dirs[wd] = directory
+        paths.add(path)
+        if directory in self.poll_dirs:
+            self.stats[path] = self.stat(path)
+
+    def unwatch(self, path):
+        '''Stop watching the file at path.'''
+        directory = os.path.dirname(path)
+        paths = self.dirs.get(directory)
+        if paths is None or path not in paths:
+            return
+        paths.remove(path)
+        self.stats.pop(path, None)
+        if paths:
+            return
+        del self.dirs[directory]
+        if directory in self.poll_dirs:
+            self.poll_dirs.remove(directory)
+        for wd, directory2 in list(self.wd_dirs.items()):
+            if directory2 == directory:
+                del self.wd_dirs[wd]
+                self.libc.inotify_rm_watch(self.fd, wd)
+    #@+node:ekr.20261018051458.7: *3* watcher.poll & helpers
+    def poll(self):
+        '''Return the set of watched paths that may have changed.'''
+        changed = set()
+        if self.fd is not None:
+            self.read_events(changed)
+        self.poll_batch(changed)
+        return changed
+
+    def poll_batch(self, changed):
+        '''Scan the next batch of polled directories.'''
+        for n in range(min(self.batch_size, len(self.poll_dirs))):
+            self.poll_n = (self.poll_n + 1) % len(self.poll_dirs)
+            directory = self.poll_dirs[self.poll_n]
+            paths = self.dirs[directory]
+            stats = {}
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.path in paths:
+                            stat = entry.stat()
+                            stats[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+            for path in paths:
+                if stats.get(path) != self.stats.get(path):
+                    self.stats[path] = stats.get(path)
+                    changed.add(path)
+
+    def read_events(self, changed):
+        '''Add the paths of all pending inotify events to changed.'''
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError:
+                return  # BlockingIOError: no more events.
+            if not data:
+                return
+            i = 0
+            while i + 16 <= len(data):
+                wd, mask, cookie, length = struct.unpack_from('iIII', data, i)
+                name = data[i + 16 : i + 16 + length].rstrip(b'\0')
+                i += 16 + length
+                directory = self.wd_dirs.get(wd)
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were lost.
+                    for directory in self.wd_dirs.values():
+                        changed.update(self.dirs[directory])
+                elif directory is None:
+                    pass
+                elif mask & self.IN_IGNORED:
+                    # The directory was deleted or unmounted. Poll it.
+                    del self.wd_dirs[wd]
+                    self.poll_dirs.append(directory)
+                    for path in self.dirs[directory]:
+                        self.stats[path] = self.stat(path)
+                        changed.add(path)
+                elif name:
+                    path = os.path.join(directory, os.fsdecode(name))
+                    if path in self.dirs[directory]:
+                        changed.add(path)
+                else:
+                    changed.update(self.dirs[directory])
+
+    def stat(self, path):
+        '''Return (mtime, size) for the file at path, or None.'''
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    #@-others
+#@+node:ekr.20261018051458.8: ** class TestFileWatcher
+class TestFileWatcher(unittest.TestCase):
+    '''Test cases for the FileWatcher class.'''
+    #@+others
+    #@+node:ekr.20261018051458.9: *3* test_watcher
+    def test_watcher(self):
+        import tempfile
+        for use_inotify in (True, False):
+            with tempfile.TemporaryDirectory() as directory:
+                paths = [os.path.join(directory, f"file{i}.py") for i in range(3)]
+                for path in paths:
+                    with open(path, 'w') as f:
+                        f.write('a = 1\n')
+                watcher = FileWatcher(use_inotify=use_inotify)
+                try:
+                    for path in paths[:2]:
+                        watcher.watch(path)
+                    assert not watcher.poll(), use_inotify
+                    for path in paths:
+                        with open(path, 'w') as f:
+                            f.write('a = 22\n')
+                    os.remove(paths[1])
+                    assert watcher.poll() == set(paths[:2]), use_inotify
+                    assert not watcher.poll(), use_inotify
+                    watcher.unwatch(paths[0])
+                    with open(paths[0], 'w') as f:
+                        f.write('a = 333\n')
+                    assert not watcher.poll(), use_inotify
+                finally:
+                    watcher.close()
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -9,9 +9,11 @@ For an explanation, see this thread:
 https://groups.google.com/forum/#!topic/leo-editor/hpHyHU2sWtM
 """
 import leo.core.leoGlobals as g
-import difflib
+import bisect
+import collections
 import re
 import time
+import unittest
 
 class FastRedraw:
     #@+others
@@ -58,19 +60,21 @@ class FastRedraw:
         t1 = time.process_time()
         aList = []
         for p in c.rootPosition().self_and_siblings():
-            self.extend_flattened_outline(aList, p)
+            self.extend_flattened_outline(aList, p, 0)
         if trace:
             t2 = time.process_time()
             print(f"app.flatten_outline: {len(aList)} entries {t2 - t1:6.4f} sec.")
         return aList
 
-    def extend_flattened_outline(self, aList, p):
+    def extend_flattened_outline(self, aList, p, level=None):
         """Add p and all p's visible descendants to aList."""
-        aList.append(f"{p.level()}:{p.gnx}:{p.h}\n")
+        if level is None:
+            level = p.level()
+        aList.append(f"{level}:{p.gnx}:{p.h}\n")
             # Padding the fields causes problems later.
         if p.isExpanded():
             for child in p.children():
-                self.extend_flattened_outline(aList, child)
+                self.extend_flattened_outline(aList, child, level + 1)
     #@+node:ekr.20181202060924.3: ** LeoGui.make_redraw_list
     def make_redraw_list(self, a, b):
         """
@@ -86,8 +90,7 @@ class FastRedraw:
             return [z.strip() for z in aList]
         #@+others # Define local helpers
         #@-others
-        d = difflib.SequenceMatcher(None, a, b)
-        op_codes = list(d.get_opcodes())
+        op_codes = self.get_opcodes(a, b)
         # dump_diff_op_codes(a, b, op_codes)
         #
         # Generate the instruction list, and verify the result.
@@ -108,6 +111,91 @@ class FastRedraw:
             print('app.make_redraw_list: opcodes after peephole...')
             self.dump_opcodes(opcodes)
         return opcodes
+    #@+node:ekr.20261018051043.1: ** FastRedraw.get_opcodes & helpers
+    def get_opcodes(self, a, b):
+        """
+        Return a list of opcodes (tag, i1, i2, j1, j2) that change list a
+        into list b, like difflib.SequenceMatcher.get_opcodes.
+
+        difflib can take quadratic time. This diff takes time roughly
+        proportional to len(a) + len(b): it strips common leading and
+        trailing rows, then matches the rows that appear exactly once in
+        both lists (a patience diff).
+        """
+        result = []
+        self.diff_range(a, b, 0, len(a), 0, len(b), result)
+        # Merge adjacent opcodes, as difflib does.
+        opcodes = []
+        for op in result:
+            tag, i1, i2, j1, j2 = op
+            if i1 == i2 and j1 == j2:
+                continue
+            if opcodes:
+                tag0, i0, i2_0, j0, j2_0 = opcodes[-1]
+                if (tag == 'equal') == (tag0 == 'equal'):
+                    if tag != 'equal':
+                        tag = 'insert' if i0 == i2 else 'delete' if j0 == j2 else 'replace'
+                    opcodes[-1] = (tag, i0, i2, j0, j2)
+                    continue
+            opcodes.append(op)
+        return opcodes
+
+    def diff_range(self, a, b, i1, i2, j1, j2, result):
+        """Append the opcodes that change a[i1:i2] into b[j1:j2] to result."""
+        n = 0
+        while i1 + n < i2 and j1 + n < j2 and a[i1 + n] == b[j1 + n]:
+            n += 1
+        result.append(('equal', i1, i1 + n, j1, j1 + n))
+        i1, j1 = i1 + n, j1 + n
+        n = 0
+        while i1 < i2 - n and j1 < j2 - n and a[i2 - n - 1] == b[j2 - n - 1]:
+            n += 1
+        i2, j2, tail = i2 - n, j2 - n, ('equal', i2 - n, i2, j2 - n, j2)
+        if i1 == i2:
+            result.append(('insert', i1, i2, j1, j2))
+        elif j1 == j2:
+            result.append(('delete', i1, i2, j1, j2))
+        else:
+            anchors = self.find_anchors(a, b, i1, i2, j1, j2)
+            if not anchors:
+                result.append(('replace', i1, i2, j1, j2))
+            for i, j in anchors:
+                self.diff_range(a, b, i1, i, j1, j, result)
+                result.append(('equal', i, i + 1, j, j + 1))
+                i1, j1 = i + 1, j + 1
+            if anchors:
+                self.diff_range(a, b, i1, i2, j1, j2, result)
+        result.append(tail)
+
+    def find_anchors(self, a, b, i1, i2, j1, j2):
+        """
+        Return a list of tuples (i, j) such that a[i] == b[j] and a[i]
+        appears exactly once in a[i1:i2] and in b[j1:j2]. Both i and j
+        increase, and the list is as long as possible.
+        """
+        a_counts = collections.Counter(a[i1:i2])
+        b_counts = collections.Counter(b[j1:j2])
+        b_index = {z: j for j, z in enumerate(b[j1:j2], j1) if b_counts[z] == 1}
+        pairs = [(i, b_index[z]) for i, z in enumerate(a[i1:i2], i1)
+            if a_counts[z] == 1 and z in b_index]
+        # Find the longest increasing subsequence of the j's.
+        ends, end_js, back = [], [], []
+        for n, (i, j) in enumerate(pairs):
+            k = bisect.bisect_left(end_js, j)
+            back.append(ends[k - 1] if k else None)
+            if k == len(ends):
+                ends.append(n)
+                end_js.append(j)
+            else:
+                ends[k] = n
+                end_js[k] = j
+        anchors = []
+        n = ends[-1] if ends else None
+        while n is not None:
+            anchors.append(pairs[n])
+            n = back[n]
+        anchors.reverse()
+        return anchors
     #@+node:ekr.20181202060924.6: ** LeoGui.peep_hole
     def peep_hole(self, opcodes):
         """Scan the list of opcodes, merging adjacent op-codes."""
@@ -129,14 +217,52 @@ class FastRedraw:
                 if gnxs0[0] == gnxs1[0]:
                     result.append(['move', index0, index1, gnxs0, gnxs1])
                     i += 2  # Don't scan either op again!
-                    break
+                    continue
             # The default is to retain the opcode.
             result.append(op0)
             i += 1
         return result
     #@-others
 
-#@@language python
-#@@tabwidth -4
-#@@pagewidth 70
+class TestFastRedraw(unittest.TestCase):
+    """Test cases for leoFastRedraw.py"""
+
+    def test_get_opcodes(self):
+        import random
+        x = FastRedraw()
+        rng = random.Random(42)
+        for n in range(500):
+            a = [rng.choice('abcdefghij') for z in range(rng.randint(0, 12))]
+            b = a[:]
+            for z in range(rng.randint(0, 4)):
+                i = rng.randint(0, len(b))
+                if b and rng.random() < 0.5:
+                    del b[i : i + rng.randint(1, 3)]
+                else:
+                    b[i:i] = rng.choice('abcdefghijk') * rng.randint(1, 3)
+            result, i, j = [], 0, 0
+            for tag, i1, i2, j1, j2 in x.get_opcodes(a, b):
+                assert (i1, j1) == (i, j), (a, b)
+                if tag == 'equal':
+                    assert a[i1:i2] == b[j1:j2], (a, b)
+                result.extend(b[j1:j2])
+                i, j = i2, j2
+            assert (i, j) == (len(a), len(b)), (a, b)
+            assert result == b, (a, b)
+        # Insertions and deletions take a single opcode.
+        a = list(range(1000))
+        b = a[:500] + ['x', 'y'] + a[500:]
+        assert x.get_opcodes(a, b)[1] == ('insert', 500, 500, 500, 502)
+        assert x.get_opcodes(b, a)[1] == ('delete', 500, 502, 500, 500)
+
+    def test_peep_hole(self):
+        x = FastRedraw()
+        a = [f"0:gnx{i}:h{i}\n" for i in range(10)]
+        b = a[:2] + a[3:7] + [a[2]] + a[7:]
+        opcodes = x.make_redraw_list(a, b)
+        assert opcodes == [['move', 2, 7, ['0:gnx2:h2'], ['0:gnx2:h2']]], opcodes
+        # The peephole must scan all opcodes.
+        b = b[:-2] + [a[9], a[8]]
+        opcodes = x.make_redraw_list(a, b)
+        assert [z[0] for z in opcodes] == ['move', 'move'], opcodes
 #@-leo
@@ -12,7 +12,9 @@ except Exception:
     pass
 import leo.core.leoGlobals as g
 import leo.core.leoNodes as leoNodes
+import leo.core.signal_manager as sig
 import binascii
+import codecs
 from collections import defaultdict
 import difflib
 import time
@@ -21,6 +23,7 @@ StringIO = io.StringIO
 BytesIO = io.BytesIO
 import os
 import pickle
+import re
 import tempfile
 import zipfile
 import sqlite3
@@ -38,6 +41,37 @@ class BadLeoFile(Exception):
 
     def __str__(self):
         return "Bad Leo File:" + self.message
+#@+node:ekr.20261018040432.1: ** class ChunkedWriter
+class ChunkedWriter:
+    """
+    A file-like object for fc.outputFile.
+
+    It buffers the many small strings put by fc.put and writes them to a
+    binary file as encoded chunks of about chunk_size characters.
+    """
+
+    chunk_size = 1 << 20
+
+    def __init__(self, theFile, encoding):
+        self.encoder = codecs.getincrementalencoder(encoding)('replace')
+        self.chunks = []
+        self.size = 0
+        self.theFile = theFile
+
+    def write(self, s):
+        self.chunks.append(s)
+        self.size += len(s)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self, final=False):
+        s = ''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        self.theFile.write(self.encoder.encode(s, final))
+
+    def close(self):
+        """Write all remaining output. Do not close the file."""
+        self.flush(final=True)
 #@+node:ekr.20180602062323.1: ** class FastRead
 class FastRead:
 
@@ -55,9 +89,7 @@ class FastRead:
     #@+node:ekr.20180604110143.1: *3* fast.readFile/FromClipboard & helper
     def readFile(self, path):
         """Read the file, change splitter ratiors, and return its hidden vnode."""
-        with open(path, 'rb') as f:
-            s = f.read()
-        v, g_element = self.readWithElementTree(path, s)
+        v, g_element = self.readWithIterparse(path)
         if not v:  # #1510.
             return None
         self.scanGlobals(g_element)
@@ -86,6 +118,180 @@ class FastRead:
             new_vnode.h = 'newHeadline'
             v.children = [new_vnode]
         return v
+    #@+node:ekr.20261018035909.1: *4* fast.readWithIterparse & helpers
+    chunk_size = 1 << 20
+    # Like translate_table, for the byte stream. #1510.
+    delete_bytes = bytes(z for z in range(20) if chr(z) not in '\t\r\n')
+    encoding_pattern = re.compile(rb'<\?xml[^>]*encoding=["\']([^"\']+)["\']')
+
+    def readWithIterparse(self, path):
+        """
+        Read the .leo file at path incrementally, creating vnodes and
+        attaching bodies as the parser produces elements.
+
+        Unlike readWithElementTree, this method never holds the entire file
+        in memory. It creates the same outline as readWithElementTree,
+        which it calls if the file isn't utf-8 or the parser fails.
+        """
+        with open(path, 'rb') as f:
+            head = f.read(self.chunk_size)
+            m = self.encoding_pattern.search(head, 0, 200)
+            encoding = m.group(1).decode('ascii', 'replace').lower() if m else 'utf-8'
+            if encoding not in ('utf-8', 'utf8'):
+                # readWithElementTree decodes the file as utf-8 regardless.
+                return self.readWithElementTree(path, head + f.read())
+            undo_d = {}
+            try:
+                return self.scanLeoEvents(f, head, undo_d)
+            except Exception:
+                # Leave no trace of the partial read.
+                self.undoPartialRead(undo_d)
+                f.seek(0)
+                # Report the error in the usual way.
+                return self.readWithElementTree(path, f.read())
+    #@+node:ekr.20261018035909.2: *5* fast.scanLeoEvents
+    def scanLeoEvents(self, f, head, undo_d):
+        """
+        Parse the .leo file f, whose first bytes are head, with an
+        XMLPullParser. Return (hidden_v, g_element).
+
+        undo_d describes the vnodes created or changed so far. Keys are gnxs.
+        Values are None for new vnodes, (body, parents) for existing vnodes.
+        """
+        c, fc = self.c, self.c.fileCommands
+        gnx2vnode = self.gnx2vnode
+        gnx2body, gnx2ua = {}, defaultdict(dict)
+            # Bodies and uA's of <t> elements that precede their <v> elements.
+        seen = set()  # The gnxs of all <v> elements seen so far.
+        stack = []
+            # Entries are (element, v, scan) for all open <vnodes> and <v> elements.
+            # scan is False for clones: the first copy defines their children.
+        g_element = hidden_v = t_elements = None
+        parser = ElementTree.XMLPullParser(events=('start', 'end'))
+
+        def create_hidden_vnode():
+            gnx = 'hidden-root-vnode-gnx'
+            undo_d[gnx] = None
+            hidden_v = leoNodes.VNode(context=c, gnx=gnx)
+            hidden_v._headString = '<hidden root vnode>'
+            gnx2vnode[gnx] = hidden_v
+            return hidden_v
+
+        def start_v(e):
+            """Create or link the vnode for a <v> element, like scanVnodes."""
+            parent_e, parent_v, scan = stack[-1]
+            if not scan:
+                stack.append((e, None, False))
+                return
+            gnx = e.attrib['t']
+            seen.add(gnx)
+            v = gnx2vnode.get(gnx)
+            if v:
+                # A clone. The body overrides any previous body text.
+                if gnx not in undo_d:
+                    undo_d[gnx] = v._bodyString, v.parents[:]
+                parent_v.children.append(v)
+                v.parents.append(parent_v)
+                v._bodyString = gnx2body.get(gnx, '')
+                stack.append((e, v, False))
+                return
+            undo_d[gnx] = None
+            v = leoNodes.VNode(context=c, gnx=gnx)
+            gnx2vnode[gnx] = v
+            parent_v.children.append(v)
+            v.parents.append(parent_v)
+            v._bodyString = gnx2body.get(gnx, '')
+            v._headString = 'PLACE HOLDER'
+            # Handle all other v attributes, as in scanVnodes.
+            d = e.attrib
+            s = d.get('tnodeList', '')
+            tnodeList = s and s.split(',')
+            if tnodeList:
+                # This tnodeList will be resolved later.
+                v.tempTnodeList = tnodeList
+            s = d.get('descendentTnodeUnknownAttributes')
+            if s:
+                aDict = fc.getDescendentUnknownAttributes(s, v=v)
+                if aDict:
+                    fc.descendentTnodeUaDictList.append(aDict)
+            s = d.get('descendentVnodeUnknownAttributes')
+            if s:
+                aDict = fc.getDescendentUnknownAttributes(s, v=v)
+                if aDict:
+                    fc.descendentVnodeUaDictList.append((v, aDict),)
+            uaDict = gnx2ua.get(gnx) or {}
+            for key, val in d.items():
+                if key not in self.nativeVnodeAttributes:
+                    uaDict[key] = self.resolveUa(key, val)
+            if uaDict:
+                v.unknownAttributes = uaDict
+            stack.append((e, v, True))
+
+        def end_t(e):
+            """Attach the body and uA's of a <t> element to its vnode."""
+            gnx = e.attrib['tx']
+            body = e.text or ''
+            ua = {key: self.resolveUa(key, val)
+                for key, val in e.attrib.items() if key != 'tx'}
+            if gnx in seen:
+                v = gnx2vnode[gnx]
+                v._bodyString = body
+                if ua and undo_d.get(gnx, True) is None:
+                    # <v> uA's override <t> uA's, as in scanVnodes.
+                    ua.update(getattr(v, 'unknownAttributes', {}))
+                    v.unknownAttributes = ua
+            else:
+                gnx2body[gnx] = body
+                gnx2ua[gnx].update(ua)
+
+        def handle_events():
+            nonlocal g_element, hidden_v, t_elements
+            for event, e in parser.read_events():
+                tag = e.tag
+                if event == 'start':
+                    if tag == 'v' and stack:
+                        start_v(e)
+                    elif tag == 'vnodes':
+                        hidden_v = create_hidden_vnode()
+                        stack.append((e, hidden_v, True))
+                    elif tag == 'tnodes':
+                        t_elements = e
+                elif tag == 'v' and stack:
+                    stack.pop()
+                    # Free the element. It is always its parent's last child.
+                    del stack[-1][0][-1]
+                elif tag == 'vh' and stack:
+                    v, scan = stack[-1][1:]
+                    if scan:
+                        v._headString = g.toUnicode(e.text or '')
+                elif tag == 'vnodes':
+                    stack.pop()
+                elif tag == 't' and t_elements is not None:
+                    end_t(e)
+                    del t_elements[-1]
+                elif tag == 'globals':
+                    g_element = e
+
+        chunk = head
+        while chunk:
+            parser.feed(chunk.translate(None, self.delete_bytes))
+            handle_events()
+            chunk = f.read(self.chunk_size)
+        parser.close()
+        handle_events()
+        if not hidden_v:
+            hidden_v = create_hidden_vnode()
+        self.handleBits()
+        return hidden_v, g_element
+    #@+node:ekr.20261018035909.3: *5* fast.undoPartialRead
+    def undoPartialRead(self, undo_d):
+        """Undo the changes to self.gnx2vnode made by a failed scanLeoEvents."""
+        for gnx, data in undo_d.items():
+            if data is None:
+                self.gnx2vnode.pop(gnx, None)
+            else:
+                v = self.gnx2vnode[gnx]
+                v._bodyString, v.parents = data
     #@+node:ekr.20180602062323.7: *4* fast.readWithElementTree & helpers
     # #1510: https://en.wikipedia.org/wiki/Valid_characters_in_XML.
     translate_table = {z: None for z in range(20) if chr(z) not in '\t\r\n'}
@@ -497,6 +703,8 @@ class FileCommands:
             p._linkCopiedAfter(current)
         # Fix #862: paste-retaining-clones can corrupt the outline.
         self.linkChildrenToParents(p)
+        sig.emit(c, 'tree_changed', p.v)
+            # FastRead sets the text of existing clones directly.
         c.selectPosition(p)
         self.initReadIvars()
         return p
@@ -1347,12 +1555,16 @@ class FileCommands:
         v = p.v
         #
         # Precompute constants.
-        isAuto = p.isAtAutoNode() and p.atAutoNodeName().strip()
-        isEdit = p.isAtEditNode() and p.atEditNodeName().strip() and not p.hasChildren()
-            # Write the entire @edit tree if it has children.
-        isFile = p.isAtFileNode()
-        isShadow = p.isAtShadowFileNode()
-        isThin = p.isAtThinFileNode()
+        if v._headString.startswith('@'):
+            isAuto = p.isAtAutoNode() and p.atAutoNodeName().strip()
+            isEdit = p.isAtEditNode() and p.atEditNodeName().strip() and not p.hasChildren()
+                # Write the entire @edit tree if it has children.
+            isFile = p.isAtFileNode()
+            isShadow = p.isAtShadowFileNode()
+            isThin = p.isAtThinFileNode()
+        else:
+            # A fast path: only @<file> nodes are written lazily.
+            isAuto = isEdit = isFile = isShadow = isThin = False
         #
         # Set forcewrite.
         if isIgnore or p.isAtIgnoreNode():
@@ -1555,8 +1767,12 @@ class FileCommands:
         fileName, theActualFile = self.createActualFile(fileName, toOPML, toZip)
         if not theActualFile: return False
         self.mFileName = fileName
-        self.outputFile = StringIO()  # Always write to a string.
         try:
+            if toZip:
+                self.outputFile = StringIO()
+            else:
+                # Stream encoded chunks to the file.
+                self.outputFile = ChunkedWriter(theActualFile, self.leo_file_encoding)
             if toOPML:
                 if hasattr(c, 'opmlController'):
                     c.opmlController.putToOPML(owner=self)
@@ -1565,13 +1781,13 @@ class FileCommands:
                     g.trace('leoOPML plugin not active.')
             else:
                 self.putLeoFile()
-            s = self.outputFile.getvalue()
-            g.app.write_Leo_file_string = s  # 2010/01/19: always set this.
             if toZip:
+                s = self.outputFile.getvalue()
+                g.app.write_Leo_file_string = s
                 self.writeZipFile(s)
             else:
-                s = bytes(s, self.leo_file_encoding, 'replace')
-                theActualFile.write(s)
+                # g.app.write_Leo_file_string is set only when writing to strings.
+                self.outputFile.close()
                 theActualFile.close()
                 c.setFileTimeStamp(fileName)
                 # raise AttributeError # To test handleWriteLeoFileException.
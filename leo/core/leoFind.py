@@ -2,6 +2,9 @@
 #@+node:ekr.20060123151617: * @file leoFind.py
 """Leo's gui-independent find classes."""
 import leo.core.leoGlobals as g
+import leo.core.signal_manager as sig
+import bisect
+import hashlib
 import keyword
 import re
 import sys
@@ -112,6 +115,381 @@ class SearchWidget:
     def toPythonIndex(self, i):
         return g.toPythonIndex(self.s, i)
     #@-others
+#@+node:ekr.20261018042659.1: ** class BatchSearcher
+class BatchSearcher:
+    """
+    A widget-free search engine for the find-all and replace-all commands.
+
+    This class scans strings directly, so it never loads text into a
+    SearchWidget. Matches are the same as the matches found by repeated
+    forward searches with LeoFind.search:
+
+    - Regex searches ignore the whole-word option and skip empty matches.
+    - Plain searches find non-overlapping matches, in lower case if
+      ignore_case is True, that satisfy LeoFind.matchWord if whole_word
+      is True.
+    """
+
+    def __init__(self, pattern, ignore_case=False, whole_word=False, regex=False):
+        """
+        Ctor for BatchSearcher class.
+
+        pattern is a regular expression if regex is True. Raise re.error if
+        it is invalid. Otherwise, backslashes in pattern must already have
+        been replaced, as in LeoFind.replaceBackSlashes.
+        """
+        self.ignore_case = ignore_case
+        self.whole_word = whole_word and not regex
+        if regex:
+            flags = re.MULTILINE
+            if ignore_case:
+                flags |= re.IGNORECASE
+            self.pattern = None
+            self.re_obj = re.compile(pattern, flags)
+        else:
+            self.pattern = pattern.lower() if ignore_case else pattern
+            self.re_obj = None
+    #@+others
+    #@+node:ekr.20261018042659.2: *3* bs.find_spans
+    def find_spans(self, s):
+        """
+        Yield tuples (i, j, m) for all matches s[i:j] in s.
+        m is the match object for regex searches, None otherwise.
+        """
+        if self.re_obj:
+            search, i, n = self.re_obj.search, 0, len(s)
+            while i < n:
+                m = search(s, i)
+                if not m:
+                    return
+                i, j = m.span()
+                if i == j:
+                    # Like LeoFind.regexHelper: skip empty matches.
+                    i += 1
+                else:
+                    yield i, j, m
+                    i = j
+            return
+        pattern = self.pattern
+        n = len(pattern)
+        if not n:
+            return
+        if self.ignore_case:
+            s = s.lower()
+        i = s.find(pattern)
+        while i > -1:
+            if not self.whole_word or self.match_word(s, i):
+                yield i, i + n, None
+            i = s.find(pattern, i + n)
+    #@+node:ekr.20261018042659.3: *3* bs.find_lines
+    def find_lines(self, s):
+        """
+        Yield tuples (line, m) for all matches in s, where line is the line
+        of s containing the start of the match, as in g.getLine.
+        m is the match object for regex searches, None otherwise.
+        """
+        starts = None
+        for i, j, m in self.find_spans(s):
+            if starts is None:
+                # The offsets of all lines, computed once.
+                starts = [0]
+                starts.extend(z.end() for z in re.finditer('\n', s))
+            k = bisect.bisect_right(starts, i)
+            yield s[starts[k - 1] : starts[k] if k < len(starts) else len(s)], m
+    #@+node:ekr.20261018042659.4: *3* bs.match_word
+    def match_word(self, s, i):
+        """Like LeoFind.matchWord: return True if s[i:] starts with a whole word."""
+        pattern = self.pattern
+        n = len(pattern)
+        ch1 = s[i - 1] if i > 0 else '.'
+        ch2 = s[i + n] if i + n < len(s) else '.'
+        in_word = (
+            g.isWordChar(pattern[0]) and g.isWordChar(ch1) or
+            g.isWordChar(pattern[-1]) and g.isWordChar(ch2))
+        return not in_word
+    #@-others
+#@+node:ekr.20261018043944.1: ** class SearchIndex
+class SearchIndex:
+    """
+    An inverted index of the headlines and bodies of c's outline, c.searchIndex.
+
+    The index maps trigrams and word tokens of the case-folded text of each
+    node to sets of vnodes. It finds *candidate* nodes: every node that
+    contains a match is a candidate, but candidates may not contain matches.
+    Callers must still search candidates with the exact pattern.
+
+    Queries update the index incrementally. The index listens for the
+    'text_changed', 'vnode_created' and 'tree_changed' signals of c and
+    reindexes only the nodes they report. Queries check all nodes only after
+    Leo replaces c.fileCommands.gnxDict, that is, after reading the outline.
+
+    c.searchIndex.save() saves the index in the commander cache.
+    The @bool use-search-index setting enables the index.
+    """
+
+    version = 1  # The version of cached indices.
+    word_pattern = re.compile(r'\w+')
+    # IGNORECASE regexes match 'i' and 'I' to the dotted and dotless i,
+    # which case-fold differently, so those letters end ASCII pieces.
+    ascii_pattern = re.compile(r'[\x00-\x48\x4a-\x68\x6a-\x7f]+')
+
+    def __init__(self, c):
+        self.c = c
+        self.changed = False  # True: the index differs from the cached index.
+        self.dirty = set()  # Vnodes that may have changed since the last update.
+        self.gnxDict = None  # c.fileCommands.gnxDict at the last update.
+        self.texts = None  # Keys are vnodes, values are (h, b) as indexed.
+        self.tokens = {}  # Keys are tokens, values are sets of vnodes.
+        self.trigrams = {}  # Keys are trigrams, values are sets of vnodes.
+        sig.connect(c, 'text_changed', self.node_changed)
+        sig.connect(c, 'vnode_created', self.node_changed)
+        sig.connect(c, 'tree_changed', self.tree_changed)
+    #@+others
+    #@+node:ekr.20261018043944.2: *3* index.candidates
+    def literal_candidates(self, literals, ascii_only=False):
+        """
+        Return the set of vnodes whose headline or body might contain all
+        the given strings, ignoring case. Return None if the index can't
+        limit the search.
+
+        ascii_only: consider only the pieces of the strings that an
+        IGNORECASE regex can match only by case-folding.
+        """
+        trigrams = set()
+        for s in literals:
+            for piece in self.ascii_pattern.findall(s) if ascii_only else [s]:
+                piece = piece.casefold()
+                # The index contains only trigrams that end a line.
+                trigrams.update(piece[i : i + 3] for i in range(len(piece) - 2)
+                    if '\n' not in piece[i : i + 2])
+        if not trigrams or not self.enabled():
+            return None
+        self.update()
+        postings = sorted((self.trigrams.get(z, set()) for z in trigrams), key=len)
+        result = set(postings[0])
+        for aSet in postings[1:]:
+            if not result:
+                break
+            result &= aSet
+        return result
+
+    def plain_candidates(self, pattern, whole_word=False):
+        """
+        Return the set of vnodes that might contain the plain search pattern,
+        or None if the index can't limit the search.
+        """
+        fullmatch = self.word_pattern.fullmatch
+        if whole_word and fullmatch(pattern) and fullmatch(pattern.lower()):
+            if not self.enabled():
+                return None
+            self.update()
+            return set(self.tokens.get(pattern.casefold(), ()))
+        return self.literal_candidates([pattern])
+
+    def regex_candidates(self, pattern, flags=0):
+        """
+        Return the set of vnodes that might match the regex pattern,
+        compiled with the given flags, or None if the index can't limit
+        the search.
+        """
+        if not isinstance(pattern, str) or flags & re.VERBOSE:
+            return None
+        return self.literal_candidates(self.regex_literals(pattern),
+            ascii_only=bool(flags & re.IGNORECASE))
+    #@+node:ekr.20261018043944.3: *3* index.enabled
+    def enabled(self):
+        """Return True if the @bool use-search-index setting is in effect."""
+        c = self.c
+        return bool(c.config and c.config.getBool('use-search-index', default=True))
+    #@+node:ekr.20261018043944.4: *3* index.regex_literals
+    def regex_literals(self, pattern):
+        """
+        Return a list of strings that every match of the regex pattern must
+        contain. The list may be empty.
+
+        This is a conservative scan: it ignores everything in groups and
+        character classes, and patterns containing '|' or inline flags.
+        """
+        if '|' in pattern:
+            return []
+        literals, run = [], []
+        i, depth, n = 0, 0, len(pattern)
+        while i < n:
+            ch = pattern[i]
+            if ch == '\\':
+                ch2 = pattern[i + 1 : i + 2]
+                if depth == 0 and ch2 and not ch2.isalnum():
+                    run.append(ch2)  # An escaped special character.
+                elif run:
+                    literals.append(''.join(run))
+                    run = []
+                i += 2
+                continue
+            if ch in '*?{':
+                # The previous item is optional.
+                if run:
+                    run.pop()
+                if ch == '{':
+                    i = pattern.find('}', i)
+                    if i == -1:
+                        break
+            elif ch == '(':
+                if pattern.startswith('(?', i) and pattern[i + 2 : i + 3] not in ':=!<P':
+                    return []  # Inline flags, comments, etc.
+                depth += 1
+            elif ch == ')':
+                depth -= 1
+                if depth < 0:
+                    return []
+            elif ch == '[':
+                # Skip the character class.
+                i += 1
+                if pattern.startswith('^', i):
+                    i += 1
+                if pattern.startswith(']', i):
+                    i += 1
+                while i < n and pattern[i] != ']':
+                    i += 2 if pattern[i] == '\\' else 1
+            elif ch not in '+.^$' and depth == 0:
+                run.append(ch)
+                i += 1
+                continue
+            # All other items end the run.
+            if run:
+                literals.append(''.join(run))
+                run = []
+            i += 1
+        if run:
+            literals.append(''.join(run))
+        return literals
+    #@+node:ekr.20261018063047.4: *3* index.node_changed & tree_changed
+    def node_changed(self, v):
+        """Reindex v at the next update."""
+        if self.gnxDict is not None:
+            self.dirty.add(v)
+
+    def tree_changed(self, v):
+        """Reindex v and all its descendants at the next update."""
+        if self.gnxDict is not None:
+            dirty, todo = self.dirty, [v]
+            while todo:
+                v = todo.pop()
+                if v not in dirty:
+                    dirty.add(v)
+                    todo.extend(v.children)
+    #@+node:ekr.20261018043944.5: *3* index.update & helpers
+    def update(self):
+        """Index all new or changed nodes. Forget deleted nodes."""
+        c = self.c
+        gnxDict = c.fileCommands.gnxDict
+        if self.texts is None:
+            self.texts = {}
+            self.load()
+        if gnxDict is not self.gnxDict:
+            # Check all nodes.
+            self.gnxDict = gnxDict
+            self.dirty = set(self.texts)
+            self.dirty.update(gnxDict.values())
+        dirty, self.dirty = self.dirty, set()
+        texts = self.texts
+        for v in dirty:
+            if gnxDict.get(v.gnx) is v:
+                if texts.get(v) != (v._headString, v._bodyString):
+                    self.index_node(v)
+            elif v in texts:
+                self.unindex_node(v)
+
+    def index_node(self, v):
+        """Add v to the index, replacing any previous entries."""
+        if v in self.texts:
+            self.unindex_node(v)
+        h, b = v._headString, v._bodyString
+        trigrams, tokens = self.scan(h, b)
+        for key in trigrams:
+            self.trigrams.setdefault(key, set()).add(v)
+        for key in tokens:
+            self.tokens.setdefault(key, set()).add(v)
+        self.texts[v] = h, b
+        self.changed = True
+
+    def unindex_node(self, v):
+        """Remove v from the index."""
+        h, b = self.texts.pop(v)
+        trigrams, tokens = self.scan(h, b)
+        for d, keys in ((self.trigrams, trigrams), (self.tokens, tokens)):
+            for key in keys:
+                aSet = d.get(key)
+                if aSet:
+                    aSet.discard(v)
+                    if not aSet:
+                        del d[key]
+        self.changed = True
+
+    def scan(self, h, b):
+        """Return (trigrams, tokens), the sets of keys for a node's text."""
+        s = f"{h}\n{b}"
+        trigrams = set()
+        # Don't rescan duplicate lines.
+        for line in set(s.casefold().split('\n')):
+            line += '\n'
+            trigrams.update(line[i : i + 3] for i in range(len(line) - 2))
+        # Case-folding can split words, so fold each word.
+        words = set(self.word_pattern.findall(s))
+        if '\u0130' in s:
+            # Whole-word searches ignoring case search s.lower(), and
+            # U+0130 is the only word character that lowers to a non-word.
+            words.update(self.word_pattern.findall(s.lower()))
+        return trigrams, {z.casefold() for z in words}
+    #@+node:ekr.20261018043944.6: *3* index.load & save
+    def fingerprint(self, h, b):
+        """Return the fingerprint of a node's text."""
+        return hashlib.md5(f"{h}\n{b}".encode('utf-8', 'replace')).hexdigest()
+
+    def load(self):
+        """
+        Load the index of nodes whose text has not changed from the commander
+        cache.
+        """
+        c = self.c
+        fn = c.mFileName
+        data = g.app.commander_cacher.get_search_index(fn) if fn else None
+        if not isinstance(data, tuple) or len(data) != 4 or data[0] != self.version:
+            return
+        junk, fingerprints, trigrams, tokens = data
+        gnxDict = c.fileCommands.gnxDict
+        vnodes = []  # Cached node numbers to vnodes, or None.
+        for gnx, fingerprint in fingerprints:
+            v = gnxDict.get(gnx)
+            if v and v not in self.texts and fingerprint == self.fingerprint(v.h, v.b):
+                self.texts[v] = v._headString, v._bodyString
+                vnodes.append(v)
+            else:
+                vnodes.append(None)
+        for d, cached in ((self.trigrams, trigrams), (self.tokens, tokens)):
+            for key, numbers in cached.items():
+                aSet = set(map(vnodes.__getitem__, numbers))
+                aSet.discard(None)
+                if aSet:
+                    d[key] = aSet
+        self.changed = len(self.texts) != len(fingerprints)
+
+    def save(self):
+        """Save the index in the commander cache, if it has changed."""
+        c = self.c
+        fn = c.mFileName
+        if self.texts is None or not self.changed or not fn:
+            return
+        # Postings are lists of node numbers.
+        numbers = {v: i for i, v in enumerate(self.texts)}
+        fingerprints = [(v.gnx, self.fingerprint(h, b)) for v, (h, b) in self.texts.items()]
+        trigrams = {key: list(map(numbers.__getitem__, aSet))
+            for key, aSet in self.trigrams.items()}
+        tokens = {key: list(map(numbers.__getitem__, aSet))
+            for key, aSet in self.tokens.items()}
+        g.app.commander_cacher.put_search_index(fn,
+            (self.version, fingerprints, trigrams, tokens))
+        self.changed = False
+    #@-others
 #@+node:ekr.20061212084717: ** class LeoFind (LeoFind.py)
 class LeoFind:
     """The base class for Leo's Find commands."""
@@ -949,6 +1327,45 @@ class LeoFind:
         """
         self.ftm.clear_focus()
         self.searchWithPresentOptions(event, findAllFlag=True)
+    #@+node:ekr.20261018044930.8: *4* find.findAllOpenOutlines
+    @cmd('find-all-open-outlines')
+    def findAllOpenOutlines(self, event=None):
+        """
+        Search all open outlines for the find text, using the present find
+        options, without blocking Leo. Write clickable links to all matches
+        to the log pane.
+        """
+        c = self.c
+        service = g.app.searchService
+        self.setup_command()
+        if not service or not self.checkArgs():
+            return
+        regex = self.pattern_match
+        pattern = self.find_text if regex else self.replaceBackSlashes(self.find_text)
+
+        def callback(hits):
+            for hit in hits:
+                v = hit.c.fileCommands.gnxDict.get(hit.gnx)
+                p = v and hit.c.outlineIndex.position(v)
+                if not p:
+                    continue  # The node has been deleted.
+                if hit.head_spans:
+                    g.es_clickable_link(c, p, 1, f"{hit.c.shortFileName()}: {p.h}\n")
+                for i, j in hit.body_spans:
+                    start, end = g.getLine(hit.b, i)
+                    line_number = hit.b.count('\n', 0, i) + 1
+                    g.es_clickable_link(c, p, line_number,
+                        f"{p.h}:{line_number}: {hit.b[start : end].rstrip()}\n")
+
+        def done(n):
+            g.es(f"found {n} node{g.plural(n)} in open outlines")
+
+        service.search(g.app.commanders(), pattern, callback, done,
+            ignore_case=self.ignore_case,
+            whole_word=self.whole_word,
+            regex=regex,
+            search_headline=self.search_headline,
+            search_body=self.search_body)
     #@+node:ekr.20171226140643.1: *4* find.minibufferFindAllUnique
     @cmd('find-all-unique-regex')
     def minibufferFindAllUniqueRegex(self, event=None):
@@ -1405,6 +1822,52 @@ class LeoFind:
             self.changeSelection()
 
     replace = change
+    #@+node:ekr.20261018042659.5: *4* find.batchFrames & makeBatchSearcher
+    def batchFrames(self):
+        """
+        Return an iterable of frames for all unique nodes searched by the
+        find-all and replace-all commands, omitting nodes that c.searchIndex
+        shows can not match.
+        """
+        c = self.c
+        if self.node_only:
+            return [c.p.frame()]
+        if self.suboutline_only:
+            frames = c.p.self_and_subtree_frames(unique=True)
+        else:
+            frames = c.all_unique_frames()
+        candidates = self.batchCandidates()
+        if candidates is None:
+            return frames
+        return (z for z in frames if z.v in candidates)
+
+    def batchCandidates(self):
+        """
+        Return the set of vnodes that might match the present find options,
+        or None if all nodes must be searched.
+        """
+        index = getattr(self.c, 'searchIndex', None)
+        if not index:
+            return None
+        if self.pattern_match or self.findAllUniqueFlag:
+            return index.regex_candidates(self.find_text,
+                re.IGNORECASE if self.ignore_case else 0)
+        return index.plain_candidates(
+            self.replaceBackSlashes(self.find_text), self.whole_word)
+
+    def makeBatchSearcher(self):
+        """Return a BatchSearcher for the present find options, or None."""
+        regex = self.pattern_match or self.findAllUniqueFlag
+        try:
+            return BatchSearcher(
+                self.find_text if regex else self.replaceBackSlashes(self.find_text),
+                ignore_case=self.ignore_case,
+                whole_word=self.whole_word,
+                regex=regex)
+        except re.error:
+            g.warning('invalid regular expression:', self.find_text)
+            self.errors += 1  # Abort the search.
+            return None
     #@+node:ekr.20031218072017.3069: *4* find.changeAll & helpers
     def changeAll(self):
 
@@ -1430,27 +1893,24 @@ class LeoFind:
         if not self.search_headline and not self.search_body:
             return
         # #1428: Honor limiters in replace-all.
-        if self.node_only:
-            positions = [c.p]
-        elif self.suboutline_only:
-            positions = c.p.self_and_subtree()
-        else:
-            positions = c.all_unique_positions()
         count = 0
-        for p in positions:
+        for frame in self.batchFrames():
+            v = frame.v
             count_h, count_b = 0, 0
-            undoData = u.beforeChangeNodeContents(p)
             if self.search_headline:
-                count_h, new_h = self.batchSearchAndReplace(p.h)
+                count_h, new_h = self.batchSearchAndReplace(v.h)
+            if self.search_body:
+                count_b, new_b = self.batchSearchAndReplace(v.b)
+            if count_h or count_b:
+                # Create positions and undo data only for changed nodes.
+                p = frame.position()
+                undoData = u.beforeChangeNodeContents(p)
                 if count_h:
                     count += count_h
                     p.h = new_h
-            if self.search_body:
-                count_b, new_b = self.batchSearchAndReplace(p.b)
                 if count_b:
                     count += count_b
                     p.b = new_b
-            if count_h or count_b:
                 u.afterChangeNodeContents(p, 'Replace All', undoData)
         p = c.p
         u.afterChangeGroup(p, undoType, reportFlag=True)
@@ -1715,8 +2175,7 @@ class LeoFind:
             if clone_find:
                 count = self.doCloneFindAll(after, data, flatten, p, undoType)
             else:
-                self.p = p
-                count = self.doFindAll(after, data, p, undoType)
+                count = self.doFindAll(data, undoType)
             # c.contractAllHeadlines()
         finally:
             c.sparse_find = old_sparse_find
@@ -1731,12 +2190,13 @@ class LeoFind:
         count, found = 0, None
         # 535: positions are not hashable, but vnodes are.
         clones, skip = [], set()
+        candidates = self.batchCandidates()
         while p and p != after:
             progress = p.copy()
             if p.v in skip:
                 p.moveToThreadNext()
             else:
-                count = self.doCloneFindAllHelper(clones, count, flatten, p, skip)
+                count = self.doCloneFindAllHelper(clones, count, flatten, p, skip, candidates)
             assert p != progress
         if clones:
             undoData = u.beforeInsertNode(c.p)
@@ -1775,12 +2235,15 @@ class LeoFind:
         found.v.children.sort(key=lambda v: v.h.lower())
         return found
     #@+node:ekr.20160422071747.1: *6* find.doCloneFindAllHelper
-    def doCloneFindAllHelper(self, clones, count, flatten, p, skip):
-        """Handle the cff or cfa at node p."""
+    def doCloneFindAllHelper(self, clones, count, flatten, p, skip, candidates=None):
+        """
+        Handle the cff or cfa at node p.
+        candidates is None or a set of the only vnodes that might match.
+        """
         if p.is_at_ignore() or re.search(r'(^@|\n@)nosearch\b', p.b):
             p.moveToNodeAfterTree()
             return count
-        found = self.findNextBatchMatch(p)
+        found = (candidates is None or p.v in candidates) and self.findNextBatchMatch(p)
         if found:
             if not p in clones:
                 clones.append(p.copy())
@@ -1797,33 +2260,54 @@ class LeoFind:
             p.moveToThreadNext()
         return count
     #@+node:ekr.20160422073500.1: *5* find.doFindAll & helpers
-    def doFindAll(self, after, data, p, undoType):
-        """Handle the find-all command from p to after."""
-        c, u, w = self.c, self.c.undoer, self.s_ctrl
+    def doFindAll(self, data, undoType):
+        """
+        Handle the find-all command, scanning all nodes with a BatchSearcher.
+        Each clone is searched only once.
+        """
+        c, u = self.c, self.c.undoer
+        searcher = self.makeBatchSearcher()
+        if not searcher:
+            return 0
         both = self.search_body and self.search_headline
+        panes = [z for z, flag in ((True, self.search_headline), (False, self.search_body)) if flag]
+        strip_cr = sys.platform.lower().startswith('win')
         count, found, result = 0, None, []
-        while 1:
-            pos, newpos = self.findNextMatch()
-            if not self.p: self.p = c.p
-            if pos is None: break
-            count += 1
-            s = w.getAllText()
-            i, j = g.getLine(s, pos)
-            line = s[i:j]
-            if self.findAllUniqueFlag:
-                m = self.match_obj
-                if m:
-                    self.unique_matches.add(m.group(0).strip())
-            elif both:
-                result.append('%s%s\n%s%s\n' % (
-                    '-' * 20, self.p.h,
-                    "head: " if self.in_headline else "body: ",
-                    line.rstrip() + '\n'))
-            elif self.p.isVisited():
-                result.append(line.rstrip() + '\n')
-            else:
-                result.append('%s%s\n%s' % ('-' * 20, self.p.h, line.rstrip() + '\n'))
-                self.p.setVisited()
+        for frame in self.batchFrames():
+            v = frame.v
+            if self.ignore_dups and v in self.find_seen:
+                continue
+            old_count = count
+            for in_headline in panes:
+                s = v.h if in_headline else v.b
+                if strip_cr:
+                    s = s.replace('\r', '')
+                        # Ignore '\r' characters, as in find.search.
+                for line, m in searcher.find_lines(s):
+                    count += 1
+                    if self.findAllUniqueFlag:
+                        if m:
+                            self.unique_matches.add(m.group(0).strip())
+                    elif both:
+                        result.append('%s%s\n%s%s\n' % (
+                            '-' * 20, v.h,
+                            "head: " if in_headline else "body: ",
+                            line.rstrip() + '\n'))
+                    elif count > old_count + 1:
+                        result.append(line.rstrip() + '\n')
+                    else:
+                        result.append('%s%s\n%s' % ('-' * 20, v.h, line.rstrip() + '\n'))
+                    if self.ignore_dups:
+                        break  # Find each node at most once.
+                if self.ignore_dups and count > old_count:
+                    break
+            if count > old_count:
+                if self.ignore_dups:
+                    self.find_seen.add(v)
+                if self.mark_finds:
+                    p = frame.position()
+                    p.setMarked()
+                    p.setDirty()
         if result or self.unique_matches:
             undoData = u.beforeInsertNode(c.p)
             if self.findAllUniqueFlag:
@@ -2655,6 +3139,74 @@ class TestFind(unittest.TestCase):
         expected = r"""f' AA line\\n BB \3'"""
         result = x.makeRegexSubs(change_text, groups)
         assert result == expected, (expected, result)
+    #@+node:ekr.20261018042659.6: *3* test_batch_searcher
+    def test_batch_searcher(self):
+        s = 'Alpha alpha alphabet beta_alpha\nx.alpha(\n'
+        table = (
+            (dict(), [(6, 11), (12, 17), (26, 31), (34, 39)]),
+            (dict(ignore_case=True), [(0, 5), (6, 11), (12, 17), (26, 31), (34, 39)]),
+            (dict(whole_word=True), [(6, 11), (34, 39)]),
+            (dict(regex=True), [(6, 11), (12, 17), (26, 31), (34, 39)]),
+        )
+        for kwargs, expected in table:
+            searcher = BatchSearcher('alpha', **kwargs)
+            result = [(i, j) for i, j, m in searcher.find_spans(s)]
+            assert result == expected, (kwargs, expected, result)
+        # Regex searches skip empty matches.
+        searcher = BatchSearcher('x*', regex=True)
+        result = [(i, j) for i, j, m in searcher.find_spans(s)]
+        assert result == [(32, 33)], result
+        # Lines contain the start of each match.
+        searcher = BatchSearcher('alpha\nx', regex=True)
+        result = [line for line, m in searcher.find_lines(s)]
+        assert result == ['Alpha alpha alphabet beta_alpha\n'], result
+    #@+node:ekr.20261018043944.11: *3* test_search_index
+    def test_search_index(self):
+        import leo.core.leoBridge as leoBridge
+        bridge = leoBridge.controller(gui='nullGui',
+            loadPlugins=False, readSettings=False, silent=True, verbose=False)
+        c = bridge.openLeoFile('')
+        index = c.searchIndex
+        table = (
+            (r'def spam\(x', ['def spam(x']),
+            (r'ab*c+d.e\bf[gh]ij(k)lm?n{2}o', ['a', 'c', 'd', 'e', 'f', 'ij', 'l', 'o']),
+            (r'a|b', []),
+            (r'(?i)spam', []),
+        )
+        for pattern, expected in table:
+            result = index.regex_literals(pattern)
+            assert result == expected, (pattern, expected, result)
+        p1 = c.rootPosition()
+        p1.h, p1.b = 'alpha', 'def spam(x):\n    return x\n'
+        p2 = p1.insertAfter()
+        p2.h, p2.b = 'beta', 'eggs = spam\n'
+        assert index.plain_candidates('SPAM') == {p1.v, p2.v}
+        assert index.plain_candidates('def spam') == {p1.v}
+        assert index.plain_candidates('EGGS', whole_word=True) == {p2.v}
+        assert index.plain_candidates('sp') is None
+        assert index.regex_candidates(r'^def sp(a)m\b', re.MULTILINE) == {p1.v}
+        assert index.regex_candidates(r'spam|eggs') is None
+        # Queries see all changes.
+        p2.b = 'ham = spam\n'
+        assert index.plain_candidates('eggs', whole_word=True) == set()
+        assert index.plain_candidates('ham =') == {p2.v}
+        p1.h = 'gamma'
+        assert index.plain_candidates('gamma') == {p1.v}
+        p3 = p2.insertAsLastChild()
+        p3.b = 'ham = eggs\n'
+        assert index.plain_candidates('ham =') == {p2.v, p3.v}
+        # Queries reindex only changed nodes.
+        p2.v._bodyString = 'not indexed\n'
+        assert index.plain_candidates('not indexed') == set()
+        c.fileCommands.gnxDict = dict(c.fileCommands.gnxDict)
+        assert index.plain_candidates('not indexed') == {p2.v}
+        # Reading external files reindexes the files' trees.
+        p4 = p1.insertAfter()
+        p4.h = '@file index_test.py'
+        assert index.plain_candidates('eggs = 2') == set()
+        s = f"#@+leo-ver=5-thin\n#@+node:{p4.gnx}: * {p4.h}\neggs = 2\n#@-leo\n"
+        c.atFileCommands.fast_read_into_root(c, s, {}, 'index_test.py', p4)
+        assert index.plain_candidates('eggs = 2') == {p4.v}
     #@-others
 #@-others
 if __name__ == '__main__':
@@ -2455,6 +2455,21 @@ class TestLeoGlobals(unittest.TestCase):
         html_delims = leo_g.comment_delims_from_extension('.html')
         assert leo_g.is_sentinel("<!--@+node-->", html_delims)
         assert not leo_g.is_sentinel("<!--comment-->", html_delims)
+    #@+node:ekr.20261018061019.3: *4* test_write_file_atomically
+    def test_write_file_atomically(self):
+
+        # pylint: disable=import-self
+        import leo.core.leoGlobals as leo_g
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'db', 'cache.json')
+            assert leo_g.write_file_atomically(path, b'old')
+            assert leo_g.write_file_atomically(path, b'new')
+            with open(path, 'rb') as f:
+                assert f.read() == b'new'
+            assert os.listdir(os.path.dirname(path)) == ['cache.json']
+            # A directory can't be replaced by a file.
+            assert not leo_g.write_file_atomically(os.path.dirname(path), b'data')
+            assert sorted(os.listdir(directory)) == ['db']
     #@-others
 #@+node:ekr.20140904112935.18526: *3* g.isTextWrapper & isTextWidget
 def isTextWidget(w):
@@ -4134,6 +4149,29 @@ def writeFile(contents, encoding, fileName):
         # g.trace(g.callers())
         # g.es_exception()
         return False
+#@+node:ekr.20261018061019.1: *3* g.write_file_atomically
+def write_file_atomically(path, data):
+    """
+    Write data, a bytes object, to the file at path, creating the file's
+    directory if necessary. Other processes see either the old file or the
+    new file, never a partially written file.
+
+    Return True if the file was written. This function reports no errors:
+    Leo's caches use it, and caches are an optimization.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return True
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
 #@+node:ekr.20031218072017.3151: ** g.Finding & Scanning
 #@+node:ekr.20140602083643.17659: *3* g.find_word
 def find_word(s, word, i=0):
@@ -6795,6 +6833,24 @@ def plural(obj):
     else:
         n = obj
     return '' if n == 1 else 's'
+#@+node:ekr.20261018061019.2: *3* g.process_pool
+def process_pool(max_workers):
+    """
+    Return a concurrent.futures.ProcessPoolExecutor with at most
+    max_workers worker processes, or None if it can not be created.
+
+    Workers are spawned, not forked: Leo's gui may be running other threads.
+    """
+    import concurrent.futures
+    import multiprocessing
+    kwargs = {}
+    if sys.version_info >= (3, 7):
+        kwargs['mp_context'] = multiprocessing.get_context('spawn')
+    try:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, **kwargs)
+    except (ImportError, NotImplementedError, OSError):
+        g.es_exception()
+        return None
 #@+node:ekr.20160331194701.1: *3* g.truncate
 def truncate(s, n):
     """Return s truncated to n characters."""
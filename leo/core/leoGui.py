@@ -429,6 +429,9 @@ class NullGui(LeoGui):
     def runMainLoop(self):
         """Run the null gui's main loop."""
         if self.script:
+            if not self.lastFrame:
+                # All settings came from the cache: create an empty outline.
+                g.app.newCommander(fileName=None, gui=self)
             frame = self.lastFrame
             g.app.log = frame.log
             self.lastFrame.c.executeScript(script=self.script)
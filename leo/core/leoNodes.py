@@ -386,6 +386,28 @@ class Position:
     # Compatibility with old code...
 
     children_iter = children
+    #@+node:ekr.20261018042245.5: *4* p.frame & frame generators
+    def frame(self):
+        """Return a Frame corresponding to p."""
+        p = self
+        frame = Frame(p.v.context.hiddenRootNode, 0, None)
+        for v, childIndex in p.stack:
+            frame = Frame(v, childIndex, frame)
+        return Frame(p.v, p._childIndex, frame)
+
+    def children_frames(self):
+        """Yield frames for all the children of p."""
+        parent = self.frame()
+        for i, v in enumerate(self.v.children):
+            yield Frame(v, i, parent)
+
+    def self_and_subtree_frames(self, unique=False):
+        """Return a FrameIterator for p and all nodes in p's subtree."""
+        return FrameIterator(self.frame(), include_self=True, unique=unique)
+
+    def subtree_frames(self, unique=False):
+        """Return a FrameIterator for all nodes in p's subtree, but not p."""
+        return FrameIterator(self.frame(), unique=unique)
     #@+node:ekr.20091002083910.6102: *4* p.following_siblings
     def following_siblings(self, copy=True):
         """Yield all siblings positions that follow p, not including p."""
@@ -1886,10 +1908,246 @@ class PosList(list):
         return res
     #@-others
 Poslist = PosList  # compatibility.
+#@+node:ekr.20261018041614.1: ** class OutlineIndex
+class OutlineIndex:
+    """
+    An index of a commander's outline, c.outlineIndex.
+
+    fc.gnxDict maps gnxs to vnodes. This class maps vnodes to their
+    parent edges: pairs (parent_v, childIndex) such that
+    parent_v.children[childIndex] is v. Following these edges up to the
+    hidden root node creates positions in O(depth) time, without
+    scanning the outline.
+
+    v._addLink and v._cutLink update the edges. The read code changes
+    links directly, so cached edges are verified before use.
+    """
+
+    def __init__(self, c):
+        self.c = c
+        self.edges = {}
+            # Keys are vnodes, values are lists of (parent_v, childIndex).
+    #@+others
+    #@+node:ekr.20261018041614.2: *3* index.add_link & cut_link
+    def add_link(self, v, parent_v, childIndex):
+        """Called by v._addLink after inserting v in parent_v.children."""
+        # Edges to v's later siblings are stale. get_edges updates them.
+        if len(v.parents) == 1:
+            self.edges[v] = [(parent_v, childIndex)]
+        else:
+            self.edges.pop(v, None)
+
+    def cut_link(self, v, parent_v):
+        """Called by v._cutLink after removing v from parent_v.children."""
+        self.edges.pop(v, None)
+    #@+node:ekr.20261018041614.3: *3* index.get_edges
+    def get_edges(self, v):
+        """Return the list of v's parent edges."""
+        edges = self.edges.get(v)
+        if edges is not None and len(edges) == len(v.parents) and all(
+            childIndex < len(parent_v.children) and parent_v.children[childIndex] is v
+            for parent_v, childIndex in edges
+        ):
+            return edges
+        edges = []
+        for parent_v in dict.fromkeys(v.parents):  # Unique parents, in order.
+            edges.extend((parent_v, i)
+                for i, child in enumerate(parent_v.children) if child is v)
+        self.edges[v] = edges
+        return edges
+    #@+node:ekr.20261018041614.4: *3* index.position & positions
+    def position(self, v):
+        """
+        Return the first position p such that p.v is v,
+        or None if v is not in the outline.
+        """
+        hidden_v = self.c.hiddenRootNode
+        stack = []
+        while v is not hidden_v:
+            edges = self.get_edges(v)
+            if not edges:
+                return None
+            parent_v, childIndex = edges[0]
+            stack.append((v, childIndex))
+            v = parent_v
+        if not stack:
+            return None
+        stack.reverse()
+        v, childIndex = stack.pop()
+        return Position(v, childIndex, stack)
+
+    def positions(self, v):
+        """
+        Return the list of all positions p such that p.v is v,
+        in outline order.
+        """
+        hidden_v = self.c.hiddenRootNode
+        paths = []  # Lists of (v, childIndex), from the top level down.
+
+        def visit(v, path):
+            if v is hidden_v:
+                paths.append(path[::-1])
+                return
+            for parent_v, childIndex in self.get_edges(v):
+                path.append((v, childIndex))
+                visit(parent_v, path)
+                path.pop()
+
+        if v is not hidden_v:
+            visit(v, [])
+        paths.sort(key=lambda path: [childIndex for v, childIndex in path])
+        return [Position(path[-1][0], path[-1][1], path[:-1]) for path in paths]
+    #@+node:ekr.20261018041614.5: *3* index.vnode & positions_for_gnx
+    def vnode(self, gnx):
+        """Return the vnode in the outline with the given gnx, or None."""
+        v = self.c.fileCommands.gnxDict.get(gnx)
+        return v if v and self.position(v) else None
+
+    def positions_for_gnx(self, gnx):
+        """Return the positions of the vnode with the given gnx, in outline order."""
+        v = self.c.fileCommands.gnxDict.get(gnx)
+        return self.positions(v) if v else []
+    #@-others
+#@+node:ekr.20261018042245.1: ** class Frame
+class Frame:
+    """
+    A lightweight, immutable cursor into an outline.
+
+    frame.v is parent_frame.v.children[frame.childIndex]. frame.level is
+    the same as p.level() for the corresponding position p.
+
+    Frames share their parent frames, so creating a frame allocates one
+    small object, never a copy of a position's stack. The topmost frame
+    represents the hidden root node. Use frame.position() to create a
+    position only when one is actually needed.
+    """
+
+    __slots__ = ('v', 'childIndex', 'level', 'parent')
+
+    def __init__(self, v, childIndex, parent):
+        self.v = v
+        self.childIndex = childIndex
+        self.parent = parent
+        self.level = parent.level + 1 if parent else -1
+
+    def __repr__(self):
+        return f"<Frame {self.level} {self.childIndex} {self.v.h!r}>"
+
+    __str__ = __repr__
+    #@+others
+    #@+node:ekr.20261018042245.2: *3* frame.position
+    def position(self):
+        """Return the position corresponding to this frame."""
+        stack = []
+        frame = self.parent
+        while frame.parent:  # Don't include the hidden root.
+            stack.append((frame.v, frame.childIndex))
+            frame = frame.parent
+        stack.reverse()
+        return Position(self.v, self.childIndex, stack)
+    #@-others
+#@+node:ekr.20261018042245.3: ** class FrameIterator
+class FrameIterator:
+    """
+    An iterable yielding the frames of a tree in outline order.
+
+    Iterating yields the descendants of the given frame, preceded by the
+    frame itself if include_self is True. If unique is True, vnodes that
+    have already been seen are skipped, along with their subtrees.
+
+    it.skip_subtree() prevents the iteration from descending into the
+    subtree of the last yielded frame, like p.moveToNodeAfterTree::
+
+        frames = c.all_frames()
+        for frame in frames:
+            if frame.v.isAnyAtFileNode():
+                frames.skip_subtree()
+
+    Changing the outline during the iteration is not allowed.
+    """
+
+    def __init__(self, frame, include_self=False, unique=False):
+        self.frame = frame
+        self.include_self = include_self
+        self.unique = unique
+        self.skipping = False
+
+    def skip_subtree(self):
+        """Don't visit the descendants of the last yielded frame."""
+        self.skipping = True
+    #@+others
+    #@+node:ekr.20261018042245.4: *3* frames.__iter__
+    def __iter__(self):
+        seen = set() if self.unique else None
+        parent = self.frame
+        if self.include_self:
+            if seen is not None:
+                seen.add(parent.v)
+            self.skipping = False
+            yield parent
+            if self.skipping:
+                return
+        stack = []  # Tuples (parent_frame, children, next childIndex).
+        children, i = parent.v.children, 0
+        while True:
+            if i < len(children):
+                v = children[i]
+                if seen is not None:
+                    if v in seen:
+                        i += 1
+                        continue
+                    seen.add(v)
+                frame = Frame(v, i, parent)
+                i += 1
+                self.skipping = False
+                yield frame
+                if v.children and not self.skipping:
+                    stack.append((parent, children, i))
+                    parent, children, i = frame, v.children, 0
+            elif stack:
+                parent, children, i = stack.pop()
+            else:
+                return
+    #@-others
+#@+node:ekr.20261018035718.1: ** class VNodeEditState
+class VNodeEditState:
+    """
+    The rarely used editor state of a VNode.
+
+    VNodes allocate this record only when some gui sets a non-default
+    value, so most vnodes in a large outline never carry one.
+    """
+
+    __slots__ = (
+        'expandedPositions', 'insertSpot', 'scrollBarSpot',
+        'selectionLength', 'selectionStart',
+    )
+
+    def __init__(self):
+        self.expandedPositions = []
+            # Positions that should be expanded.
+        self.insertSpot = None
+            # Location of previous insert point.
+        self.scrollBarSpot = None
+            # Previous value of scrollbar position.
+        self.selectionLength = 0
+            # The length of the selected body text.
+        self.selectionStart = 0
+            # The start of the selected body text.
 #@+node:ekr.20031218072017.3341: ** class VNode
 #@@nobeautify
 
 class VNode:
+
+    # Slots keep large outlines compact.
+    # The __dict__ slot is allocated only when a plugin or script
+    # sets some other attribute, including v.unknownAttributes.
+    __slots__ = (
+        '_headString', '_bodyString', 'children', 'parents',
+        'fileIndex', 'iconVal', 'statusBits', 'context',
+        '_editState', '__dict__', '__weakref__',
+    )
+
     #@+<< VNode constants >>
     #@+node:ekr.20031218072017.951: *3* << VNode constants >>
     # Define the meaning of status bits in new vnodes.
@@ -1936,16 +2194,8 @@ class VNode:
         self.context = context  # The context containing context.hiddenRootNode.
             # Required so we can compute top-level siblings.
             # It is named .context rather than .c to emphasize its limited usage.
-        self.expandedPositions = []
-            # Positions that should be expanded.
-        self.insertSpot = None
-            # Location of previous insert point.
-        self.scrollBarSpot = None
-            # Previous value of scrollbar position.
-        self.selectionLength = 0
-            # The length of the selected body text.
-        self.selectionStart = 0
-            # The start of the selected body text.
+        self._editState = None
+            # A VNodeEditState, allocated on demand. See v.Properties.
         # To make VNode's independent of Leo's core,
         # wrap all calls to the VNode ctor::
         #
@@ -1954,6 +2204,7 @@ class VNode:
         #       g.app.nodeIndices.new_vnode_helper(c,gnx,v)
         g.app.nodeIndices.new_vnode_helper(context, gnx, self)
         assert self.fileIndex, g.callers()
+        sig.emit(context, 'vnode_created', self)
     #@+node:ekr.20031218072017.3345: *4* v.__repr__ & v.__str__
     def __repr__(self):
         return f"<VNode {self.gnx} {self.headString()}>"
@@ -2104,6 +2355,8 @@ class VNode:
         # v = self
         if g.match_word(self._headString, 0, '@ignore'):
             return True
+        if '@ignore' not in self._bodyString:
+            return False  # A fast path: fc.putVnode calls this for every node.
         flag, i = g.is_special(self._bodyString, "@ignore")
         return flag
     #@+node:ekr.20031218072017.3352: *4* v.isAtOthersNode
@@ -2388,10 +2641,15 @@ class VNode:
     #@+node:ekr.20040315032144: *4* v.setBodyString & v.setHeadString
     unicode_warning_given = False
 
+    # Both setters emit the 'text_changed' signal. Code that sets
+    # v._headString or v._bodyString directly in existing vnodes should
+    # emit 'tree_changed', as FastAtRead.read_into_root does.
+
     def setBodyString(self, s):
         v = self
         if isinstance(s, str):
             v._bodyString = s
+            sig.emit(v.context, 'text_changed', v)
             return
         try:
             v._bodyString = g.toUnicode(s, reportErrors=True)
@@ -2400,6 +2658,7 @@ class VNode:
                 self.unicode_warning_given = True
                 g.internalError(s)
                 g.es_exception()
+        sig.emit(self.context, 'text_changed', self)
         sig.emit(self.context, 'body_changed', self)
 
     def setHeadString(self, s):
@@ -2408,9 +2667,11 @@ class VNode:
         v = self
         if g.isUnicode(s):
             v._headString = s.replace('\n', '')
+            sig.emit(v.context, 'text_changed', v)
             return
         s = g.toUnicode(s, reportErrors=True)
         v._headString = s.replace('\n', '')
+        sig.emit(v.context, 'text_changed', v)
 
     initBodyString = setBodyString
     initHeadString = setHeadString
@@ -2475,6 +2736,7 @@ class VNode:
         # Update parent_v.children & v.parents.
         parent_v.children.insert(childIndex, v)
         v.parents.append(parent_v)
+        v.context.outlineIndex.add_link(v, parent_v, childIndex)
         # Set zodb changed flags.
         v._p_changed = 1
         parent_v._p_changed = 1
@@ -2488,6 +2750,7 @@ class VNode:
         # Update parent_v.children & v.parents.
         parent_v.children.insert(childIndex, v)
         v.parents.append(parent_v)
+        v.context.outlineIndex.add_link(v, parent_v, childIndex)
         # Set zodb changed flags.
         v._p_changed = 1
         parent_v._p_changed = 1
@@ -2520,6 +2783,7 @@ class VNode:
                 g.internalError(f"{parent_v} not in parents of {v}")
                 g.trace('v.parents:')
                 g.printObj(v.parents)
+        v.context.outlineIndex.cut_link(v, parent_v)
         v._p_changed = 1
         parent_v._p_changed = 1
         # If v has no more parents, we adjust all
@@ -2605,6 +2869,49 @@ class VNode:
     u = property(
         __get_u, __set_u,
         doc="VNode u property")
+    #@+node:ekr.20261018035718.2: *4* v.editor state properties
+    # These properties delegate to a VNodeEditState, allocated only
+    # when a non-default value is set.
+
+    def __edit_state_property(name, default):
+
+        def getter(self):
+            state = self._editState
+            return default if state is None else getattr(state, name)
+
+        def setter(self, val):
+            state = self._editState
+            if state is None:
+                if val == default:
+                    return
+                state = self._editState = VNodeEditState()
+            setattr(state, name, val)
+
+        return property(getter, setter, doc=f"VNode {name} property")
+
+    insertSpot = __edit_state_property('insertSpot', None)
+    scrollBarSpot = __edit_state_property('scrollBarSpot', None)
+    selectionLength = __edit_state_property('selectionLength', 0)
+    selectionStart = __edit_state_property('selectionStart', 0)
+
+    def __get_expandedPositions(self):
+        # Allocate the state so that v.expandedPositions.append works.
+        state = self._editState
+        if state is None:
+            state = self._editState = VNodeEditState()
+        return state.expandedPositions
+
+    def __set_expandedPositions(self, val):
+        state = self._editState
+        if state is None:
+            if not val:
+                return
+            state = self._editState = VNodeEditState()
+        state.expandedPositions = val
+
+    expandedPositions = property(
+        __get_expandedPositions, __set_expandedPositions,
+        doc="VNode expandedPositions property")
     #@+node:ekr.20090215165030.1: *4* v.gnx Property
     def __get_gnx(self):
         v = self
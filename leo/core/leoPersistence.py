@@ -363,28 +363,21 @@ class PersistenceDataController:
         """
         assert target
         assert root
+        positions = self.c.outlineIndex.positions(target.v)
+            # All clones of target, in outline order.
+
+        def outside(p, predicate):
+            """Return True if predicate is False for p and all its ancestors."""
+            return not any(predicate(z) for z in p.self_and_parents(copy=False))
+
         # Pass 1: accept only nodes outside any @file tree.
-        p = self.c.rootPosition()
-        while p:
-            if p.h.startswith('@persistence'):
-                p.moveToNodeAfterTree()
-            elif p.isAnyAtFileNode():
-                p.moveToNodeAfterTree()
-            elif p.v == target.v:
+        for p in positions:
+            if outside(p, lambda z: z.h.startswith('@persistence') or z.isAnyAtFileNode()):
                 return p
-            else:
-                p.moveToThreadNext()
         # Pass 2: accept any node outside the root tree.
-        p = self.c.rootPosition()
-        while p:
-            if p.h.startswith('@persistence'):
-                p.moveToNodeAfterTree()
-            elif p == root:
-                p.moveToNodeAfterTree()
-            elif p.v == target.v:
+        for p in positions:
+            if outside(p, lambda z: z.h.startswith('@persistence') or z == root):
                 return p
-            else:
-                p.moveToThreadNext()
         g.trace('no representative node for:', target, 'parent:', target.parent())
         return None
     #@+node:ekr.20140712105818.16751: *4* pd.foreign_file_name
@@ -2,6 +2,7 @@
 #@+node:ekr.20031218072017.3439: * @file leoPlugins.py
 """Classes relating to Leo's plugin architecture."""
 import leo.core.leoGlobals as g
+import leo.core.leoStartupTracer as leoStartupTracer
 import sys
 # Define modules that may be enabled by default
 # but that mignt not load because imports may fail.
@@ -554,24 +555,25 @@ class LeoPluginsController:
             return module
         assert g.app.loadDir
         moduleName = g.toUnicode(moduleName)
-        #
-        # Try to load the plugin.
-        try:
-            self.loadingModuleNameStack.append(moduleName)
-            result = loadOnePluginHelper(moduleName)
-        finally:
-            self.loadingModuleNameStack.pop()
-        if not result:
-            if trace:
-                reportFailedImport()
-            return None
-        #
-        # Last-minute checks.
-        try:
-            self.loadingModuleNameStack.append(moduleName)
-            result = finishImport(result)
-        finally:
-            self.loadingModuleNameStack.pop()
+        with leoStartupTracer.phase(f"plugin {moduleName}"):
+            #
+            # Try to load the plugin.
+            try:
+                self.loadingModuleNameStack.append(moduleName)
+                result = loadOnePluginHelper(moduleName)
+            finally:
+                self.loadingModuleNameStack.pop()
+            if not result:
+                if trace:
+                    reportFailedImport()
+                return None
+            #
+            # Last-minute checks.
+            try:
+                self.loadingModuleNameStack.append(moduleName)
+                result = finishImport(result)
+            finally:
+                self.loadingModuleNameStack.pop()
         if result:
             report(f"loaded: {moduleName}")
         self.signonModule = result  # for self.plugin_signon.
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#@+leo-ver=5-thin
+#@+node:ekr.20261018044930.1: * @file leoSearch.py
+#@@first
+"""Searching many outlines in worker processes."""
+import concurrent.futures
+import os
+import re
+import leo.core.leoGlobals as g
+import leo.core.leoFind as leoFind
+#@+others
+#@+node:ekr.20261018044930.2: ** class SearchService
+class SearchService:
+    """
+    The SearchService class searches the headlines and bodies of many
+    outlines *without blocking Leo*.
+
+    g.app.searchService is the singleton SearchService.
+
+    search(commanders, pattern, callback, ...) takes a snapshot of the
+    (gnx, h, b) tuples of all nodes that might match, splits the snapshot
+    into shards and searches the shards in a pool of worker processes. An
+    IdleTime handler passes the hits of each shard to the callback, in the
+    main thread and in outline order, as soon as the shard is complete.
+
+    Each search cancels the previous search, so callers should simply start
+    a new search whenever the query changes. cancel() cancels the present
+    search.
+    """
+
+    def __init__(self, max_workers=None, shard_size=2000):
+        """Ctor for the SearchService class."""
+        self.callback = None
+            # Called with a list of hits for each shard.
+        self.done = None
+            # Called with the total number of hits at the end of the search.
+        self.executor = None
+            # The process pool, created on first use.
+        self.hits = 0
+            # The number of hits delivered so far.
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+            # Leave one core for Leo's gui.
+        self.search_n = 0
+            # Incremented by cancel.
+        self.shard_size = shard_size
+            # The maximum number of nodes in a shard.
+            # Smaller snapshots are searched in Leo's own process.
+        self.shards = []
+            # List of (c, shard, future), in outline order.
+        self.timer = None
+            # The IdleTime instance for the present search.
+    #@+others
+    #@+node:ekr.20261018044930.3: *3* service.search
+    def search(self, commanders, pattern, callback, done=None,
+        ignore_case=False, whole_word=False, regex=False,
+        search_headline=True, search_body=True,
+    ):
+        """
+        Start searching all nodes of the given commanders for pattern, as
+        described for leoFind.BatchSearcher.
+
+        callback(hits) receives a list of g.Bunches, one for each matching
+        node, with the following ivars:
+
+        c, gnx, h, b:   the commander and the snapshot of the node.
+        head_spans:     a list of tuples (i, j) for all matches h[i:j].
+        body_spans:     a list of tuples (i, j) for all matches b[i:j].
+
+        done(n), if given, receives the total number of matching nodes when
+        the search is complete. Neither function is called after the search
+        has been cancelled.
+
+        Return False if pattern is not a valid regex.
+        """
+        self.cancel()
+        try:
+            leoFind.BatchSearcher(pattern, ignore_case, whole_word, regex)
+        except re.error:
+            g.warning('invalid regular expression:', pattern)
+            return False
+        self.callback, self.done, self.hits = callback, done, 0
+        args = (pattern, ignore_case, whole_word, regex, search_headline, search_body)
+        snapshots = [(c, self.snapshot(c, pattern, ignore_case, whole_word, regex))
+            for c in commanders]
+        in_process = sum(len(z) for c, z in snapshots) <= self.shard_size
+        executor = None if in_process else self.get_executor()
+        for c, snapshot in snapshots:
+            for i in range(0, len(snapshot), self.shard_size):
+                shard = snapshot[i : i + self.shard_size]
+                if executor:
+                    future = executor.submit(search_shard, shard, *args)
+                else:
+                    future = concurrent.futures.Future()
+                    future.set_result(search_shard(shard, *args))
+                self.shards.append((c, shard, future))
+        timer = g.IdleTime(self.on_idle, delay=50, tag='SearchService.on_idle')
+        if timer and not isinstance(timer, g.NullObject):
+            self.timer = timer
+            timer.start()
+        else:
+            # There is no idle-time handling. Deliver all hits now.
+            self.wait()
+        return True
+    #@+node:ekr.20261018044930.4: *3* service.cancel, shutdown & wait
+    def cancel(self):
+        """Cancel the present search, if any."""
+        self.search_n += 1
+        self.callback = self.done = None
+        for c, shard, future in self.shards:
+            future.cancel()
+        self.shards = []
+        if self.timer:
+            self.timer.stop()
+            self.timer = None
+
+    def shutdown(self):
+        """Cancel the present search and stop all worker processes."""
+        self.cancel()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def wait(self):
+        """Deliver all hits of the present search, waiting for all shards."""
+        self.deliver(block=True)
+    #@+node:ekr.20261018044930.5: *3* service.deliver & on_idle
+    def deliver(self, block):
+        """
+        Pass the hits of completed shards to the callback, in outline order.
+        Wait for each shard if block is True.
+        """
+        search_n = self.search_n
+        while self.shards and search_n == self.search_n:
+            c, shard, future = self.shards[0]
+            if not block and not future.done():
+                return
+            del self.shards[0]
+            try:
+                results = future.result()
+            except Exception:
+                g.es_exception()
+                continue
+            hits = []
+            for i, head_spans, body_spans in results:
+                gnx, h, b = shard[i]
+                hits.append(g.Bunch(c=c, gnx=gnx, h=h, b=b,
+                    head_spans=head_spans, body_spans=body_spans))
+            self.hits += len(hits)
+            if hits:
+                self.callback(hits)
+        if search_n == self.search_n:
+            if self.timer:
+                self.timer.stop()
+                self.timer = None
+            done, self.callback, self.done = self.done, None, None
+            if done:
+                done(self.hits)
+
+    def on_idle(self, timer):
+        """IdleTime handler: deliver the hits of all completed shards."""
+        if g.app.killed:
+            timer.stop()
+        else:
+            self.deliver(block=False)
+    #@+node:ekr.20261018044930.6: *3* service.get_executor & snapshot
+    def get_executor(self):
+        """Return the process pool, or None if it can not be created."""
+        if not self.executor:
+            self.executor = g.process_pool(self.max_workers)
+        return self.executor
+
+    def snapshot(self, c, pattern, ignore_case, whole_word, regex):
+        """
+        Return a list of (gnx, h, b) tuples for all vnodes of c that might
+        match pattern, in outline order.
+        """
+        index = getattr(c, 'searchIndex', None)
+        if not index:
+            candidates = None
+        elif regex:
+            candidates = index.regex_candidates(pattern,
+                re.IGNORECASE if ignore_case else 0)
+        else:
+            candidates = index.plain_candidates(pattern, whole_word)
+        return [(v.gnx, v.h, v.b) for v in (z.v for z in c.all_unique_frames())
+            if candidates is None or v in candidates]
+    #@-others
+#@+node:ekr.20261018044930.7: ** search_shard
+def search_shard(shard, pattern, ignore_case, whole_word, regex,
+    search_headline, search_body,
+):
+    """
+    Search one shard of a SearchService snapshot in a worker process.
+
+    Return a list of tuples (i, head_spans, body_spans),
+    one for each matching node shard[i].
+    """
+    find_spans = leoFind.BatchSearcher(pattern, ignore_case, whole_word, regex).find_spans
+    result = []
+    for n, (gnx, h, b) in enumerate(shard):
+        head_spans = [(i, j) for i, j, m in find_spans(h)] if search_headline else []
+        body_spans = [(i, j) for i, j, m in find_spans(b)] if search_body else []
+        if head_spans or body_spans:
+            result.append((n, head_spans, body_spans))
+    return result
+#@-others
+#@@language python
+#@@tabwidth -4
+#@@pagewidth 70
+#@-leo
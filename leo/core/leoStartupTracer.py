@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+#@+leo-ver=5-thin
+#@+node:ekr.20261018054728.1: * @file leoStartupTracer.py
+#@@first
+"""
+Tracing the cost of Leo's startup, enabled by --trace-startup=PATH::
+
+    python launchLeo.py --trace-startup=startup.json
+
+Leo writes a JSON report to PATH and prints a summary.
+
+This module imports only the standard library, so that runLeo.py can start
+tracing before importing any of Leo's own modules.
+"""
+import importlib
+import json
+import sys
+import time
+import tracemalloc
+import unittest
+tracer = None  # The singleton StartupTracer, if tracing.
+#@+others
+#@+node:ekr.20261018054728.2: ** class StartupTracer
+class StartupTracer:
+    """
+    The StartupTracer class records the wall-clock time and the memory
+    allocated by each phase of Leo's startup and by each imported module.
+
+    Phases are named blocks of code. They may be nested::
+
+        with leoStartupTracer.phase('readGlobalSettingsFiles'):
+            lm.readGlobalSettingsFiles()
+
+    Allocations are the net number of bytes allocated, as measured by
+    tracemalloc. Tracing allocations slows down startup, so compare only
+    traces made with the same options.
+
+    Modules are timed while they execute, so builtin and frozen modules
+    are omitted. Both the cumulative cost of each module, including the
+    modules it imports, and its own cost are recorded.
+    """
+
+    format = 1  # The version of the JSON report.
+
+    def __init__(self, trace_memory=True):
+        """Ctor for the StartupTracer class."""
+        self.finder = None
+            # The ImportTimer in sys.meta_path.
+        self.modules = []
+            # One dict per module, in the order the modules finished executing.
+        self.phases = []
+            # One dict per phase, in the order the phases started.
+        self.stack = []
+            # The active phases and imports: lists [record, t, memory, child_t, child_memory].
+        self.start_time = None
+            # (time, memory) when tracing started.
+        self.started_tracemalloc = False
+            # True: stop tracemalloc when tracing stops.
+        self.trace_memory = trace_memory
+    #@+others
+    #@+node:ekr.20261018054728.3: *3* tracer.start & stop
+    def start(self):
+        """Start tracing."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        self.start_time = self.stamp()
+        self.finder = ImportTimer(self)
+        sys.meta_path.insert(0, self.finder)
+
+    def stop(self):
+        """Stop tracing. Return the report, a dict."""
+        if self.finder in sys.meta_path:
+            sys.meta_path.remove(self.finder)
+        t, memory = self.stamp()
+        report = {
+            'format': self.format,
+            'python': sys.version.split()[0],
+            'argv': sys.argv,
+            'seconds': t - self.start_time[0],
+            'allocated': memory - self.start_time[1],
+            'phases': self.phases,
+            'modules': self.modules,
+        }
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+        return report
+    #@+node:ekr.20261018054728.4: *3* tracer.begin & end
+    def begin(self, record):
+        """Start measuring the phase or import described by record."""
+        t, memory = self.stamp()
+        record['start'] = t - self.start_time[0]
+        record['depth'] = len(self.stack)
+        self.stack.append([record, t, memory, 0.0, 0])
+
+    def end(self):
+        """Finish measuring the innermost phase or import."""
+        t, memory = self.stamp()
+        record, t1, memory1, child_t, child_memory = self.stack.pop()
+        record['seconds'] = t - t1
+        record['allocated'] = memory - memory1
+        if 'self_seconds' in record:
+            record['self_seconds'] = record['seconds'] - child_t
+            record['self_allocated'] = record['allocated'] - child_memory
+        if self.stack:
+            parent = self.stack[-1]
+            parent[3] += record['seconds']
+            parent[4] += record['allocated']
+
+    def stamp(self):
+        """Return (wall-clock time, traced memory)."""
+        memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        return time.perf_counter(), memory
+    #@+node:ekr.20261018054728.5: *3* tracer.phase
+    def phase(self, name):
+        """Return a context manager that measures the named phase."""
+        record = {'name': name}
+        self.phases.append(record)
+        return Measurement(self, record)
+    #@+node:ekr.20261018054728.6: *3* tracer.summary
+    def summary(self, report, n=20):
+        """Return a summary of the report: all phases and the n costliest modules."""
+        mb = 1024 * 1024
+        lines = [
+            f"startup: {report['seconds']:.3f} sec, "
+            f"{report['allocated'] / mb:.1f} MB allocated, "
+            f"{len(report['modules'])} modules imported",
+            '',
+            f"{'phase':50} {'sec':>8} {'MB':>8}",
+        ]
+        for z in report['phases']:
+            if 'seconds' in z:
+                name = '  ' * z['depth'] + z['name']
+                lines.append(f"{name[:50]:50} {z['seconds']:8.3f} {z['allocated'] / mb:8.2f}")
+        lines.extend([
+            '',
+            f"{'module':50} {'self sec':>8} {'sec':>8} {'self MB':>8}",
+        ])
+        modules = sorted(report['modules'], key=lambda z: z['self_seconds'], reverse=True)
+        for z in modules[:n]:
+            lines.append(
+                f"{z['name'][:50]:50} {z['self_seconds']:8.3f} "
+                f"{z['seconds']:8.3f} {z['self_allocated'] / mb:8.2f}")
+        return '\n'.join(lines)
+    #@-others
+#@+node:ekr.20261018054728.7: ** class ImportTimer
+class ImportTimer:
+    """
+    A meta path finder that measures the execution of each module found by
+    the other finders in sys.meta_path.
+    """
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def find_spec(self, fullname, path=None, target=None):
+        """Find the module's spec with the other finders and time its loader."""
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, 'find_spec', None)
+            if finder is self or not find_spec:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec:
+                break
+        else:
+            return None  # Let the import system try legacy finders.
+        loader = spec.loader
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, 'exec_module'):
+            # Patch only this instance: builtin and frozen loaders are classes.
+            try:
+                loader.exec_module = self.make_exec_module(fullname, loader)
+            except AttributeError:
+                pass
+        return spec
+
+    def make_exec_module(self, fullname, loader):
+        """Return a function that times loader.exec_module."""
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module):
+            try:
+                del loader.exec_module  # Restore the loader's own method.
+            except AttributeError:
+                pass
+            record = {'name': fullname, 'self_seconds': 0.0, 'self_allocated': 0}
+            with Measurement(self.tracer, record):
+                exec_module(module)
+            self.tracer.modules.append(record)
+
+        return timed_exec_module
+#@+node:ekr.20261018054728.8: ** class Measurement
+class Measurement:
+    """A context manager that measures one phase or import."""
+
+    def __init__(self, tracer, record):
+        self.record = record
+        self.tracer = tracer
+
+    def __enter__(self):
+        self.tracer.begin(self.record)
+        return self.record
+
+    def __exit__(self, *args):
+        self.tracer.end()
+        return False
+#@+node:ekr.20261018054728.9: ** class NullMeasurement
+class NullMeasurement:
+    """A context manager that does nothing, used when not tracing."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *args):
+        return False
+
+null_measurement = NullMeasurement()
+#@+node:ekr.20261018054728.10: ** top-level functions
+def start_from_argv(argv=None):
+    """Start tracing if argv (default: sys.argv) contains --trace-startup."""
+    argv = sys.argv if argv is None else argv
+    if not tracer and any(z.startswith('--trace-startup') for z in argv):
+        start()
+
+def start(trace_memory=True):
+    """Start tracing, if not already started. Return the tracer."""
+    global tracer
+    if not tracer:
+        tracer = StartupTracer(trace_memory)
+        tracer.start()
+    return tracer
+
+def phase(name):
+    """
+    Return a context manager that measures the named phase of Leo's
+    startup, or does nothing if not tracing.
+    """
+    return tracer.phase(name) if tracer else null_measurement
+
+def finish(path):
+    """
+    Stop tracing, write the JSON report to path and print a summary.
+    Do nothing if not tracing.
+    """
+    global tracer
+    if not tracer:
+        return
+    report = tracer.stop()
+    print(tracer.summary(report))
+    tracer = None
+    if path:
+        try:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=1)
+            print(f"\nwrote startup trace: {path}")
+        except OSError as e:
+            print(f"can not write startup trace: {path}: {e}")
+#@+node:ekr.20261018054728.11: ** class TestStartupTracer
+class TestStartupTracer(unittest.TestCase):
+    """Test cases for leoStartupTracer.py"""
+    #@+others
+    #@+node:ekr.20261018054728.12: *3* test_trace
+    def test_trace(self):
+        import os
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'traced_inner.py'), 'w') as f:
+                f.write('data = [str(i) for i in range(10000)]\n')
+            with open(os.path.join(directory, 'traced_outer.py'), 'w') as f:
+                f.write('import traced_inner\n')
+            sys.path.insert(0, directory)
+            importlib.invalidate_caches()
+            test_tracer = StartupTracer()
+            test_tracer.start()
+            try:
+                with test_tracer.phase('outer phase'):
+                    with test_tracer.phase('inner phase'):
+                        import traced_outer
+                        assert traced_outer.traced_inner.data
+            finally:
+                report = test_tracer.stop()
+                sys.path.remove(directory)
+                for name in ('traced_inner', 'traced_outer'):
+                    sys.modules.pop(name, None)
+        assert test_tracer.finder not in sys.meta_path
+        outer, inner = report['phases']
+        assert (outer['name'], outer['depth'], inner['depth']) == ('outer phase', 0, 1)
+        assert outer['seconds'] >= inner['seconds'] > 0
+        modules = {z['name']: z for z in report['modules']}
+        assert list(modules) == ['traced_inner', 'traced_outer'], list(modules)
+        inner_m, outer_m = modules['traced_inner'], modules['traced_outer']
+        assert inner_m['allocated'] > 100000, inner_m
+        assert outer_m['seconds'] >= inner_m['seconds']
+        assert outer_m['self_allocated'] < inner_m['allocated'], outer_m
+        assert json.loads(json.dumps(report)) == report
+        assert 'traced_inner' in test_tracer.summary(report)
+    #@-others
+#@-others
+#@@language python
+#@@tabwidth -4
+#@@pagewidth 70
+#@-leo
@@ -40,6 +40,7 @@
 #
 # I first saw this model of unlimited undo in the documentation for Apple's Yellow Box classes.
 #@-<< How Leo implements unlimited undo >>
+import unittest
 import leo.core.leoGlobals as g
 # pylint: disable=unpacking-non-sequence
 #@+others
@@ -56,6 +57,7 @@ class Undoer:
         self.c = c
         self.granularity = None  # Set in reloadSettings.
         self.max_undo_stack_size = c.config.getInt('max-undo-stack-size') or 0
+        self.max_undo_stack_bytes = c.config.getInt('max-undo-stack-bytes') or 0
         # State ivars...
         self.beads = []  # List of undo nodes.
         self.bead = -1  # Index of the present bead: -1:len(beads)
@@ -67,19 +69,20 @@ class Undoer:
         self.realUndoMenuLabel = "Can't Undo"
         self.undoing = False  # True if executing an Undo command.
         self.redoing = False  # True if executing a Redo command.
+        self.refused = False  # True: a helper found text changed outside the undoer.
         self.per_node_undo = False  # True: v may contain undo_info ivar.
         # New in 4.2...
         self.optionalIvars = []
         # Set the following ivars to keep pylint happy.
         self.afterTree = None
         self.beforeTree = None
+        self.bodyDelta = None
         self.children = None
         self.deleteMarkedNodesData = None
         self.followingSibs = None
         self.inHead = None
         self.kind = None
         self.newBack = None
-        self.newBody = None
         self.newChildren = None
         self.newHead = None
         self.newMarked = None
@@ -89,7 +92,6 @@ class Undoer:
         self.newParent_v = None
         self.newRecentFiles = None
         self.newSel = None
-        self.newTree = None
         self.newYScroll = None
         self.oldBack = None
         self.oldBody = None
@@ -106,6 +108,7 @@ class Undoer:
         self.pasteAsClone = None
         self.prevSel = None
         self.sortChildren = None
+        self.treeDelta = None
         self.verboseUndoGroup = None
         self.reloadSettings()
     #@+node:ekr.20191213085126.1: *4* u.reloadSettings
@@ -131,19 +134,102 @@ class Undoer:
             setattr(u, ivar, None)
     #@+node:ekr.20060127052111.1: *4* u.cutStack
     def cutStack(self):
-        u = self; n = u.max_undo_stack_size
-        if u.bead >= n > 0 and not g.app.unitTesting:
-            # Do nothing if we are in the middle of creating a group.
-            i = len(u.beads) - 1
-            while i >= 0:
-                bunch = u.beads[i]
-                if hasattr(bunch, 'kind') and bunch.kind == 'beforeGroup':
-                    return
+        """
+        Remove the oldest beads if the undo stack contains more than
+        @int max-undo-stack-size beads, or if the beads use more than
+        @int max-undo-stack-bytes bytes.
+        """
+        u = self; n = u.max_undo_stack_size; max_bytes = u.max_undo_stack_bytes
+        if g.app.unitTesting:
+            return
+        if not (u.bead >= n > 0 or max_bytes > 0):
+            return
+        # Do nothing if we are in the middle of creating a group.
+        i = len(u.beads) - 1
+        while i >= 0:
+            bunch = u.beads[i]
+            if hasattr(bunch, 'kind') and bunch.kind == 'beforeGroup':
+                return
+            i -= 1
+        if u.bead >= n > 0:
+            # Keep the present bead, the n - 1 beads before it and all redo beads.
+            i = u.bead - n + 1
+            del u.beads[:i]
+            u.bead -= i
+        if max_bytes > 0:
+            # Keep the newest beads that fit, but never cut the present bead.
+            total, i = 0, len(u.beads)
+            while i > 0:
+                total += u.getBeadSize(i - 1)
+                if total > max_bytes and i - 1 < u.bead:
+                    break
                 i -= 1
-            # This work regardless of how many items appear after bead n.
-                # g.trace('Cutting undo stack to %d entries' % (n))
-            u.beads = u.beads[-n :]
-            u.bead = n - 1
+            if i > 0:
+                del u.beads[:i]
+                u.bead -= i
+    #@+node:ekr.20261018050450.1: *4* u.createTextDelta & applyTextDelta
+    def createTextDelta(self, oldText, newText):
+        """
+        Return a tuple (leading, trailing, oldMiddle, newMiddle, oldKey, newKey)
+        describing the change from oldText to newText, where leading and
+        trailing are the numbers of matching leading and trailing characters.
+        oldKey and newKey identify the two texts. See u.textKey.
+
+        Undo beads store such deltas instead of both texts.
+        """
+        n = min(len(oldText), len(newText))
+        # Binary searches: each comparison copies only half the remaining slice.
+        i, j = 0, n
+        while i < j:
+            k = (i + j + 1) // 2
+            if oldText.startswith(newText[i:k], i):
+                i = k
+            else:
+                j = k - 1
+        leading = i
+        old_len, new_len = len(oldText), len(newText)
+        i, j = 0, n - leading
+        while i < j:
+            k = (i + j + 1) // 2
+            if oldText.startswith(newText[new_len - k : new_len - i], old_len - k):
+                i = k
+            else:
+                j = k - 1
+        trailing = i
+        return (leading, trailing,
+            oldText[leading : old_len - trailing], newText[leading : new_len - trailing],
+            self.textKey(oldText), self.textKey(newText))
+
+    def applyTextDelta(self, s, delta, tag):
+        """
+        Apply a delta created by createTextDelta to s.
+
+        tag == 'undo': s should be the new text. Return the old text.
+        tag == 'redo': s should be the old text. Return the new text.
+
+        Return None if s is not the expected text, that is, if something
+        has changed the text outside the undoer.
+        """
+        leading, trailing, oldMiddle, newMiddle, oldKey, newKey = delta
+        if self.textKey(s) != (newKey if tag == 'undo' else oldKey):
+            return None
+        middle = oldMiddle if tag == 'undo' else newMiddle
+        return s[:leading] + middle + s[len(s) - trailing :]
+
+    def textKey(self, s):
+        """Return a key identifying s. Strings cache their hashes."""
+        return len(s), hash(s)
+
+    def refuseTextDelta(self, p):
+        """
+        Report that p's body changed outside the undoer, so the present
+        bead can't be undone or redone. u.undo and u.redo then clear the
+        undo state.
+        """
+        u = self
+        g.error(f"can not {'undo' if u.undoing else 'redo'} {u.undoType}: "
+            f"{p.h} has changed outside the undoer")
+        u.refused = True
     #@+node:ekr.20080623083646.10: *4* u.dumpBead
     def dumpBead(self, n):
         u = self
@@ -163,6 +249,37 @@ class Undoer:
         if n > 0:
             return self.dumpBead(n - 1)
         return '<no top bead>'
+    #@+node:ekr.20261018050450.2: *4* u.getBeadSize & estimateSize
+    def getBeadSize(self, n):
+        """
+        Return the estimated number of bytes used by bead n, excluding
+        positions and vnodes.
+
+        Only the present bead can still change, so only its size is
+        recomputed.
+        """
+        u = self
+        bunch = u.beads[n]
+        size = None if n == u.bead else bunch.get('undoSize')
+        if size is None:
+            size = bunch.undoSize = u.estimateSize(bunch)
+        return size
+
+    def estimateSize(self, obj, level=0):
+        """Return the estimated number of bytes used by obj's strings and containers."""
+        if isinstance(obj, str):
+            return len(obj)
+        if level > 10:
+            return 0
+        if isinstance(obj, g.Bunch):
+            obj = obj.__dict__
+        if isinstance(obj, dict):
+            return 8 * len(obj) + sum(
+                self.estimateSize(z, level + 1) for z in obj.values())
+        if isinstance(obj, (list, tuple)):
+            return 8 * len(obj) + sum(
+                self.estimateSize(z, level + 1) for z in obj)
+        return 0
     #@+node:EKR.20040526150818: *4* u.getBead
     def getBead(self, n):
         """Set Undoer ivars from the bunch at the top of the undo stack."""
@@ -308,36 +425,99 @@ class Undoer:
         else:
             u.setRedoType("Can't Redo")
         u.cutStack()
-    #@+node:EKR.20040530121329: *4* u.restoreTree & helpers
-    def restoreTree(self, treeInfo):
-        """Use the tree info to restore all VNode data,
-        including all links."""
+    #@+node:ekr.20261018050450.3: *4* u.createTreeDelta & restoreTreeDelta
+    def createTreeDelta(self, oldTree, p):
+        """
+        Return a list of g.Bunches describing all changes between oldTree,
+        created by u.saveTree, and the present tree at position p.
+
+        Each bunch contains the VNode v and, for each changed ivar of v, a
+        tuple (old, new). None means that the ivar must not be restored.
+        Changed bodies are text deltas (bunch.bodyDelta).
+        """
         u = self
-        # This effectively relinks all vnodes.
-        for v, vInfo, tInfo in treeInfo:
-            u.restoreVnodeUndoInfo(vInfo)
-            u.restoreTnodeUndoInfo(tInfo)
-    #@+node:ekr.20050415170737.2: *5* u.restoreVnodeUndoInfo
-    def restoreVnodeUndoInfo(self, bunch):
-        """Restore all ivars saved in the bunch."""
-        v = bunch.v
-        v.statusBits = bunch.statusBits
-        v.children = bunch.children
-        v.parents = bunch.parents
-        uA = bunch.get('unknownAttributes')
-        if uA is not None:
-            v.unknownAttributes = uA
-            v._p_changed = 1
-    #@+node:ekr.20050415170812.2: *5* u.restoreTnodeUndoInfo
-    def restoreTnodeUndoInfo(self, bunch):
-        v = bunch.v
-        v.h = bunch.headString
-        v.b = bunch.bodyString
-        v.statusBits = bunch.statusBits
-        uA = bunch.get('unknownAttributes')
-        if uA is not None:
-            v.unknownAttributes = uA
-            v._p_changed = 1
+        oldInfo = {}
+        for v, vInfo, tInfo in oldTree:
+            # Ignore duplicate info for clones.
+            if v not in oldInfo:
+                oldInfo[v] = (vInfo, tInfo)
+        newNodes = {}  # An ordered set.
+        stack = [p.v]
+        while stack:
+            v = stack.pop()
+            if v not in newNodes:
+                newNodes[v] = True
+                stack.extend(reversed(v.children))
+        result = []
+        for v in list(oldInfo) + [z for z in newNodes if z not in oldInfo]:
+            vInfo, tInfo = oldInfo.get(v, (None, None))
+            if tInfo:
+                old = (vInfo.statusBits, vInfo.children, vInfo.parents,
+                    tInfo.headString, tInfo.get('unknownAttributes'))
+            else:
+                old = (None,) * 5
+            if v in newNodes:
+                new = (v.statusBits, v.children, v.parents,
+                    v.h, getattr(v, 'unknownAttributes', None))
+            else:
+                new = (None,) * 5
+            bunch = g.Bunch(v=v)
+            for i, ivar in enumerate(
+                ('statusBits', 'children', 'parents', 'headString', 'unknownAttributes')
+            ):
+                if old[i] is not new[i] and old[i] != new[i]:
+                    if isinstance(new[i], list):
+                        bunch[ivar] = (old[i], new[i][:])
+                    else:
+                        bunch[ivar] = (old[i], new[i])
+            if tInfo and v in newNodes:
+                if tInfo.bodyString != v.b:
+                    bunch.bodyDelta = u.createTextDelta(tInfo.bodyString, v.b)
+            else:
+                bunch.bodyString = (tInfo and tInfo.bodyString, v.b if v in newNodes else None)
+            if len(bunch.__dict__) > 1:
+                result.append(bunch)
+        return result
+
+    def restoreTreeDelta(self, treeDelta, tag):
+        """
+        Restore the VNodes in a tree delta created by createTreeDelta,
+        including all links.
+
+        tag == 'undo': restore the old values. tag == 'redo': restore the new values.
+
+        Return False and change nothing if the body of any vnode has changed
+        outside the undoer.
+        """
+        u = self
+        n = 0 if tag == 'undo' else 1
+        bodies = {}
+        for bunch in treeDelta:
+            if bunch.get('bodyDelta'):
+                v = bunch.v
+                bodies[v] = u.applyTextDelta(v.b, bunch.bodyDelta, tag)
+                if bodies[v] is None:
+                    return False
+        for bunch in treeDelta:
+            v = bunch.v
+            for ivar in ('statusBits', 'children', 'parents'):
+                pair = bunch.get(ivar)
+                if pair and pair[n] is not None:
+                    val = pair[n]
+                    setattr(v, ivar, val if ivar == 'statusBits' else val[:])
+            pair = bunch.get('headString')
+            if pair and pair[n] is not None:
+                v.h = pair[n]
+            if v in bodies:
+                v.b = bodies[v]
+            pair = bunch.get('bodyString')
+            if pair and pair[n] is not None:
+                v.b = pair[n]
+            pair = bunch.get('unknownAttributes')
+            if pair and pair[n] is not None:
+                v.unknownAttributes = pair[n]
+                v._p_changed = 1
+        return True
     #@+node:EKR.20040528075307: *4* u.saveTree & helpers
     def saveTree(self, p, treeInfo=None):
         """Return a list of tuples with all info needed to handle a general undo operation."""
@@ -365,16 +545,17 @@ class Undoer:
         # Aside: Prior to 4.2 Leo used a scheme that was equivalent to the
         # createUndoInfoDict info, but quite a bit uglier.
         #@-<< about u.saveTree >>
-        u = self; topLevel = (treeInfo is None)
-        if topLevel: treeInfo = []
-        # Add info for p.v.  Duplicate tnode info is harmless.
-        data = (p.v, u.createVnodeUndoInfo(p.v), u.createTnodeUndoInfo(p.v))
-        treeInfo.append(data)
-        # Recursively add info for the subtree.
-        child = p.firstChild()
-        while child:
-            self.saveTree(child, treeInfo)
-            child = child.next()
+        u = self
+        if treeInfo is None:
+            treeInfo = []
+        # Add info for p.v and all its descendants, in outline order.
+        # Duplicate tnode info is harmless.
+        # Traverse vnodes: copying positions would be much slower.
+        stack = [p.v]
+        while stack:
+            v = stack.pop()
+            treeInfo.append((v, u.createVnodeUndoInfo(v), u.createTnodeUndoInfo(v)))
+            stack.extend(reversed(v.children))
         return treeInfo
     #@+node:ekr.20050415170737.1: *5* u.createVnodeUndoInfo
     def createVnodeUndoInfo(self, v):
@@ -466,7 +647,9 @@ class Undoer:
         bunch.undoHelper = u.undoNodeContents
         bunch.redoHelper = u.redoNodeContents
         bunch.inHead = inHead  # 2013/08/26
-        bunch.newBody = p.b
+        # Keep only the changed part of the body.
+        bunch.bodyDelta = u.createTextDelta(bunch.oldBody, p.b)
+        bunch.oldBody = None
         bunch.newHead = p.h
         bunch.newMarked = p.isMarked()
         # Bug fix 2017/11/12: don't use ternary operator.
@@ -486,10 +669,11 @@ class Undoer:
         bunch.undoType = command
         bunch.undoHelper = u.undoTree
         bunch.redoHelper = u.redoTree
-        # Set by beforeChangeTree: changed, oldSel, oldText, oldTree, p
+        # Set by beforeChangeTree: changed, oldSel, oldTree, p
         bunch.newSel = w.getSelectionRange()
-        bunch.newText = w.getAllText()
-        bunch.newTree = u.saveTree(p)
+        # Keep only the changes, not snapshots of the entire tree.
+        bunch.treeDelta = u.createTreeDelta(bunch.oldTree, p)
+        bunch.oldTree = None
         u.pushBead(bunch)
     #@+node:ekr.20050424161505: *5* u.afterClearRecentFiles
     def afterClearRecentFiles(self, bunch):
@@ -733,7 +917,6 @@ class Undoer:
         w = c.frame.body.wrapper
         bunch = u.createCommonBunch(p)
         bunch.oldSel = w.getSelectionRange()
-        bunch.oldText = w.getAllText()
         bunch.oldTree = u.saveTree(p)
         return bunch
     #@+node:ekr.20050424161505.1: *5* u.beforeClearRecentFiles
@@ -1112,6 +1295,9 @@ class Undoer:
         u.redoing = False
         u.bead += 1
         u.setUndoTypes()
+        if u.refused:
+            u.refused = False
+            u.clearUndoState()
     #@+node:ekr.20110519074734.6092: *3* u.redo helpers
     #@+node:ekr.20191213085226.1: *4*  u.reloadHelper (do nothing)
     def redoHelper(self):
@@ -1276,10 +1462,14 @@ class Undoer:
         # selectPosition causes recoloring, so don't do this unless needed.
         if c.p != u.p:  # #1333.
             c.selectPosition(u.p)
-        u.p.setDirty()
         # Restore the body.
-        u.p.setBodyString(u.newBody)
-        w.setAllText(u.newBody)
+        newBody = u.applyTextDelta(u.p.b, u.bodyDelta, 'redo')
+        if newBody is None:
+            u.refuseTextDelta(u.p)
+            return
+        u.p.setDirty()
+        u.p.setBodyString(newBody)
+        w.setAllText(newBody)
         c.frame.body.recolor(u.p)
         # Restore the headline.
         u.p.initHeadString(u.newHead)
@@ -1326,7 +1516,10 @@ class Undoer:
     def redoTree(self):
         """Redo replacement of an entire tree."""
         u = self; c = u.c
-        u.p = self.undoRedoTree(u.p, u.oldTree, u.newTree)
+        if not u.restoreTreeDelta(u.treeDelta, 'redo'):
+            u.refuseTextDelta(u.p)
+            return
+        c.setBodyString(u.p, u.p.b)
         u.p.setDirty()
         c.selectPosition(u.p)  # Does full recolor.
         if u.newSel:
@@ -1386,6 +1579,9 @@ class Undoer:
         u.undoing = False
         u.bead -= 1
         u.setUndoTypes()
+        if u.refused:
+            u.refused = False
+            u.clearUndoState()
     #@+node:ekr.20110519074734.6093: *3* u.undo helpers
     #@+node:ekr.20191213085246.1: *4*  u.undoHeoper (do-nothing)
     def undoHelper(self):
@@ -1566,9 +1762,13 @@ class Undoer:
         # selectPosition causes recoloring, so don't do this unless needed.
         if c.p != u.p:  # #1333.
             c.selectPosition(u.p)
+        oldBody = u.applyTextDelta(u.p.b, u.bodyDelta, 'undo')
+        if oldBody is None:
+            u.refuseTextDelta(u.p)
+            return
         u.p.setDirty()
-        u.p.b = u.oldBody
-        w.setAllText(u.oldBody)
+        u.p.b = oldBody
+        w.setAllText(oldBody)
         c.frame.body.recolor(u.p)
         u.p.h = u.oldHead
         # This is required.  Otherwise c.redraw will revert the change!
@@ -1644,21 +1844,6 @@ class Undoer:
             w.setSelectionRange(i, j, insert=j)
         c.frame.body.recolor(p)
         w.seeInsertPoint()  # 2009/12/21
-    #@+node:ekr.20050408100042: *4* u.undoRedoTree
-    def undoRedoTree(self, p, new_data, old_data):
-        """Replace p and its subtree using old_data during undo."""
-        # Same as undoReplace except uses g.Bunch.
-        u = self; c = u.c
-        if new_data is None:
-            # This is the first time we have undone the operation.
-            # Put the new data in the bead.
-            bunch = u.beads[u.bead]
-            bunch.newTree = u.saveTree(p.copy())
-            u.beads[u.bead] = bunch
-        # Replace data in tree with old data.
-        u.restoreTree(old_data)
-        c.setBodyString(p, p.b)
-        return p  # Nothing really changes.
     #@+node:ekr.20080425060424.5: *4* u.undoSort
     def undoSort(self):
         u = self; c = u.c
@@ -1671,7 +1856,10 @@ class Undoer:
     def undoTree(self):
         """Redo replacement of an entire tree."""
         u = self; c = u.c
-        u.p = self.undoRedoTree(u.p, u.newTree, u.oldTree)
+        if not u.restoreTreeDelta(u.treeDelta, 'undo'):
+            u.refuseTextDelta(u.p)
+            return
+        c.setBodyString(u.p, u.p.b)
         u.p.setAllAncestorAtFileNodesDirty()
         c.selectPosition(u.p)  # Does full recolor.
         if u.oldSel:
@@ -1729,6 +1917,148 @@ class Undoer:
             w.setSelectionRange(i, j, insert=ins)
             w.seeInsertPoint()
     #@-others
+#@+node:ekr.20261018061931.1: ** class TestUndo
+class TestUndo(unittest.TestCase):
+    """Test cases for leoUndo.py"""
+    #@+others
+    #@+node:ekr.20261018061931.2: *3* TestUndo.setUp & helpers
+    def setUp(self):
+        """Create a commander containing a tree with clones."""
+        import leo.core.leoBridge as leoBridge
+        from unittest import mock
+        # Other tests may replace or kill g.app, so use a new app and a new
+        # bridge, not the singleton bridge. Restore g.app after the test.
+        patcher = mock.patch.object(g, 'app', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        bridge = leoBridge.BridgeController('nullGui',
+            loadPlugins=False,
+            readSettings=False,
+            silent=True,
+            tracePlugins=False,
+            useCaches=False,
+            verbose=False,
+        )
+        self.c = c = bridge.openLeoFile('')
+        assert c is not None, 'leoBridge.BridgeController could not create a commander'
+        self.u = c.undoer
+        root = c.rootPosition()
+        root.h = 'root'
+        for i in range(3):
+            child = root.insertAsLastChild()
+            child.h = f"child {i}"
+            child.b = ''.join(f"line {j} of child {i}\n" for j in range(200))
+            grandChild = child.insertAsLastChild()
+            grandChild.h = f"grandchild {i}"
+        outside = root.insertAfter()
+        outside.h = 'outside'
+        clone = outside.clone()
+        clone.moveToLastChildOf(root.firstChild())
+        c.selectPosition(root)
+
+    def outline(self):
+        """Return a list describing every position in the outline."""
+        return [(p.level(), p.gnx, p.h, p.b, p.isMarked(), len(p.v.parents))
+            for p in self.c.all_positions()]
+    #@+node:ekr.20261018061931.3: *3* TestUndo.test_tree_undo_redo
+    def test_tree_undo_redo(self):
+        c, u = self.c, self.u
+        root = c.rootPosition()
+        before = self.outline()
+        bunch = u.beforeChangeTree(root)
+        # Change headlines, bodies and links, including clones.
+        child0, child1, child2 = list(root.children())
+        child0.h = 'changed'
+        child1.b = child1.b.replace('line 100', 'LINE 100')
+        child1.setMarked()
+        child2.firstChild().doDelete()
+        clone = child1.clone()
+        clone.moveToLastChildOf(child2)
+        inserted = child0.insertAsNthChild(0)
+        inserted.h = 'inserted'
+        inserted.b = 'new body\n'
+        child0.moveToLastChildOf(root)
+        u.afterChangeTree(root, 'test', bunch)
+        c.selectPosition(root)  # As commands do. Sets the headline's revert point.
+        after = self.outline()
+        assert after != before
+        bead = u.beads[u.bead]
+        assert bead.treeDelta and bead.oldTree is None, bead
+        # Only the changed part of child1's body is kept.
+        deltas = [z.bodyDelta for z in bead.treeDelta if z.get('bodyDelta')]
+        assert len(deltas) == 1 and len(repr(deltas[0])) < 100, deltas
+        u.undo()
+        assert self.outline() == before
+        u.redo()
+        assert self.outline() == after
+        u.undo()
+        assert self.outline() == before
+    #@+node:ekr.20261018061931.4: *3* TestUndo.test_cut_stack_keeps_present_bead
+    def test_cut_stack_keeps_present_bead(self):
+        from unittest import mock
+        c, u = self.c, self.u
+        p = c.rootPosition().firstChild()
+        bodies = [p.b]
+        with mock.patch.object(g.app, 'unitTesting', False):
+            u.max_undo_stack_size = 0
+            u.max_undo_stack_bytes = 20000
+            for i in range(10):
+                bunch = u.beforeChangeNodeContents(p)
+                p.b = f"version {i}\n" * 200
+                u.afterChangeNodeContents(p, 'test', bunch)
+                bodies.append(p.b)
+            # The byte limit has cut the oldest beads.
+            assert len(u.beads) == 4, len(u.beads)
+            assert sum(u.getBeadSize(i) for i in range(len(u.beads))) <= 20000
+            u.undo()
+            u.undo()
+            present = u.beads[u.bead]
+            # Cut by count, with redo beads after the present bead.
+            u.max_undo_stack_bytes = 0
+            u.max_undo_stack_size = 1
+            u.cutStack()
+            assert u.beads[u.bead] is present
+            assert len(u.beads) == 3, len(u.beads)
+            # Cut by size.
+            u.max_undo_stack_bytes = 1
+            u.max_undo_stack_size = 0
+            u.cutStack()
+            assert u.beads[u.bead] is present
+            assert len(u.beads) == 3, len(u.beads)
+            u.undo()
+            assert p.b == bodies[-4]
+            assert not u.canUndo()
+            u.redo()
+            u.redo()
+            u.redo()
+            assert p.b == bodies[-1]
+    #@+node:ekr.20261018065127.1: *3* TestUndo.test_refuse_changed_body
+    def test_refuse_changed_body(self):
+        c, u = self.c, self.u
+        p = c.rootPosition().firstChild()
+        bunch = u.beforeChangeNodeContents(p)
+        p.b = p.b.replace('line 100', 'LINE 100')
+        u.afterChangeNodeContents(p, 'test', bunch)
+        # A script changes the body outside the undoer.
+        p.b = 'changed by a script\n'
+        u.undo()
+        assert p.b == 'changed by a script\n', repr(p.b)
+        assert not u.canUndo() and not u.canRedo()
+        # Tree deltas change nothing if any body has changed.
+        root = c.rootPosition()
+        before = self.outline()
+        bunch = u.beforeChangeTree(root)
+        p.b = 'changed by a command\n'
+        p.insertAsLastChild().h = 'inserted'
+        u.afterChangeTree(root, 'test', bunch)
+        c.selectPosition(root)
+        p.b = 'changed by a script\n'
+        after = self.outline()
+        assert after != before
+        u.undo()
+        assert self.outline() == after
+        assert not u.canUndo()
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -19,6 +19,9 @@ path = os.getcwd()
 if path not in sys.path:
     # print('appending %s to sys.path' % path)
     sys.path.append(path)
+# --trace-startup: trace all of Leo's imports.
+import leo.core.leoStartupTracer as leoStartupTracer
+leoStartupTracer.start_from_argv()
 # #1472: bind to g immediately.
 import leo.core.leoGlobals as g
 import leo.core.leoApp as leoApp
@@ -352,24 +352,35 @@ class GlobalSearch:
         if not ss.startswith("s "):
             return
         s = ss[2:]
-        for ndxc,c2 in enumerate(g.app.commanders()):
-            hits = c2.find_b(s)
-            for ndxh, h in enumerate(hits):
-                b = h.b
-                mlines = self.matchlines(b, h.matchiter)
-                key = "c%dh%d" % (ndxc, ndxh)
-                self.anchors[key] = (c2, h.copy())
-                em('<p><a href="%s">%s</a></p>' % (key, h.h))
+
+        def callback(hits):
+            # Called at idle time as the search service finds hits.
+            for hit in hits:
+                v = hit.c.fileCommands.gnxDict.get(hit.gnx)
+                p = v and hit.c.outlineIndex.position(v)
+                if not p:
+                    continue
+                mlines = self.matchlines(hit.b, hit.body_spans)
+                key = "h%d" % len(self.anchors)
+                self.anchors[key] = (hit.c, p)
+                em('<p><a href="%s">%s</a></p>' % (key, p.h))
                 for line, (st, en), (pre, post) in mlines:
                     em("<pre>")
                     em(pre)
                     em("%s<b>%s</b>%s" % (line[:st], line[st:en], line[en:]))
                     em(post)
                     em("</pre>")
-                em("""<p><small><i>%s</i></small></p>""" % h.get_UNL())
-        html = "".join(hitparas)
-        tgt.web.setHtml(html)
+                em("""<p><small><i>%s</i></small></p>""" % p.get_UNL())
+            html = "".join(hitparas)
+            tgt.web.setHtml(html)
+
+        self.anchors = {}
+        tgt.web.setHtml("")
         self.bd.set_link_handler(self.do_link)
+        # Search all outlines without blocking Leo.
+        # This cancels any previous search.
+        g.app.searchService.search(g.app.commanders(), s, callback,
+            ignore_case=True, regex=True, search_headline=False)
     #@+node:ekr.20140919160020.17900: *3* do_stats
     def do_stats(self, tgt, qs):
         '''Show statistics.'''
@@ -379,18 +390,18 @@ class GlobalSearch:
             tgt.web.setHtml("<p>Indexed documents:</p><ul>" +
                 "".join("<li>%s</li>" % doc for doc in docs) + "</ul>" )
     #@+node:ekr.20140919160020.17921: *3* matchlines
-    def matchlines(self,b, miter):
+    def matchlines(self,b, spans):
 
         res = []
-        for m in miter:
-            st, en = g.getLine(b, m.start())
+        for i, j in spans:
+            st, en = g.getLine(b, i)
             li = b[st:en]
             ipre = b.rfind("\n", 0, st-2)
             ipost = b.find("\n", en +1 )
             spre = b[ipre +1 : st-1] + "\n"
             spost = b[en : ipost]
 
-            res.append((li, (m.start()-st, m.end()-st ), (spre, spost)))
+            res.append((li, (i-st, j-st ), (spre, spost)))
         return res
     #@+node:ekr.20140919160020.17919: *3* open_unl
     def open_unl(self,unl):
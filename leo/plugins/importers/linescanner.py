@@ -881,7 +881,7 @@ class Importer:
             if lines:
                 if not lines[-1].endswith('\n'):
                     lines[-1] += '\n'
-            v._bodyString = g.toUnicode(''.join(lines), reportErrors=True)
+            v.setBodyString(g.toUnicode(''.join(lines), reportErrors=True))
                 # Bug fix: 2017/01/24: must convert to unicode!
                 # This was the source of the internal error in the p.b getter.
             delattr(v, '_import_lines')
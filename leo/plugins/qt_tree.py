@@ -11,8 +11,10 @@ import leo.core.leoNodes as leoNodes
 import leo.core.leoPlugins as leoPlugins  # Uses leoPlugins.TryNext.
 import leo.plugins.qt_text as qt_text
 from leo.core.leoQt import QtConst, QtCore, QtGui, QtWidgets
+import os
 import re
 import time
+import unittest
 assert time
 #@-<< imports >>
 #@+others
@@ -47,6 +49,8 @@ class LeoQtTree(leoFrame.LeoTree):
         self.headlineWrapper = qt_text.QHeadlineWrapper  # This is a class.
         self.treeWidget = w = frame.top.treeWidget  # An internal ivar.
             # w is a LeoQTreeWidget, a subclass of QTreeWidget.
+        self.tree_view = None
+            # A LeoQtTreeView replacing w, if @bool qt-tree-view is True.
         #
         # "declutter", node appearance tweaking
         self.declutter_patterns = None  # list of pairs of patterns for decluttering
@@ -103,9 +107,32 @@ class LeoQtTree(leoFrame.LeoTree):
         tw.customContextMenuRequested.connect(self.onContextMenu)
         # tw.onItemChanged.connect(self.onItemChanged)
         g.app.gui.setFilter(c, tw, self, tag='tree')
+        if self.use_tree_view:
+            self.tree_view = self.create_tree_view()
         # 2010/01/24: Do not set this here.
         # The read logic sets c.changed to indicate nodes have changed.
         # c.clearChanged()
+    #@+node:ekr.20261018062438.2: *4* qtree.create_tree_view
+    def create_tree_view(self):
+        """
+        Return a LeoQtTreeView that replaces the QTreeWidget.
+
+        The QTreeWidget remains, hidden and empty, so that code using
+        self.treeWidget continues to work.
+        """
+        c, tw = self.c, self.treeWidget
+        view = LeoQtTreeView(c, tw.parentWidget())
+        view.setObjectName('treeWidget')
+        view.setFont(tw.font())
+        view.setContextMenuPolicy(tw.contextMenuPolicy())
+        view.customContextMenuRequested.connect(self.onContextMenu)
+        layout = tw.parentWidget().layout()
+        if layout:
+            layout.replaceWidget(tw, view)
+        tw.hide()
+        tw.setFocusProxy(view)
+        g.app.gui.setFilter(c, view, self, tag='tree')
+        return view
     #@+node:ekr.20110605121601.17871: *4* qtree.reloadSettings
     def reloadSettings(self):
         """LeoQtTree."""
@@ -117,6 +144,7 @@ class LeoQtTree(leoFrame.LeoTree):
         self.stayInTree = c.config.getBool('stayInTreeAfterSelect')
         self.use_chapters = c.config.getBool('use-chapters')
         self.use_declutter = c.config.getBool('tree-declutter', default=False)
+        self.use_tree_view = c.config.getBool('qt-tree-view', default=False)
     #@+node:ekr.20110605121601.17940: *4* qtree.wrapQLineEdit
     def wrapQLineEdit(self, w):
         """A wretched kludge for MacOs k.masterMenuHandler."""
@@ -300,6 +328,9 @@ class LeoQtTree(leoFrame.LeoTree):
             c.setCurrentPosition(p)
         assert not self.busy, g.callers()
         self.redrawCount += 1
+        if self.tree_view:
+            self.tree_view.redraw(p)
+            return p
         self.initData()
         try:
             self.busy = True
@@ -584,11 +615,16 @@ class LeoQtTree(leoFrame.LeoTree):
 
         if self.busy:
             return
+        if self.tree_view:
+            self.tree_view.redraw_after_contract(p)
+            return
         self.update_expansion(p)
     #@+node:ekr.20110605121601.17881: *4* qtree.redraw_after_expand
     def redraw_after_expand(self, p):
 
-        if 0:  # Does not work. Newly visible nodes do not show children correctly.
+        if self.tree_view:
+            self.tree_view.redraw_after_expand(p)
+        elif 0:  # Does not work. Newly visible nodes do not show children correctly.
             c = self.c
             c.selectPosition(p)
             self.update_expansion(p)
@@ -600,6 +636,9 @@ class LeoQtTree(leoFrame.LeoTree):
 
         if self.busy:
             return
+        if self.tree_view:
+            self.tree_view.viewport().update()
+            return
         p = self.c.p
         if p:
             h = p.h  # 2010/02/09: Fix bug 518823.
@@ -614,6 +653,9 @@ class LeoQtTree(leoFrame.LeoTree):
         if self.busy:
             return
         self.redrawCount += 1  # To keep a unit test happy.
+        if self.tree_view:
+            self.tree_view.viewport().update()
+            return
         c = self.c
         try:
             self.busy = True
@@ -629,6 +671,9 @@ class LeoQtTree(leoFrame.LeoTree):
         """Redraw the entire tree when an invisible node is selected."""
         if self.busy:
             return
+        if self.tree_view:
+            self.tree_view.redraw_after_select(p)
+            return
         self.full_redraw(p)
         # c.redraw_after_select calls tree.select indirectly.
         # Do not call it again here.
@@ -956,7 +1001,7 @@ class LeoQtTree(leoFrame.LeoTree):
     findFocus = getFocus
 
     def setFocus(self):
-        g.app.gui.set_focus(self.c, self.treeWidget)
+        g.app.gui.set_focus(self.c, self.tree_view or self.treeWidget)
     #@+node:ekr.20110605121601.18409: *3* qtree.Icons
     #@+node:ekr.20110605121601.18410: *4* qtree.drawIcon
     def drawIcon(self, p):
@@ -1311,7 +1356,7 @@ class LeoQtTree(leoFrame.LeoTree):
     #@+node:ekr.20110605121601.18434: *4* qtree.getSCroll
     def getScroll(self):
         """Return the hPos,vPos for the tree's scrollbars."""
-        w = self.treeWidget
+        w = self.tree_view or self.treeWidget
         hScroll = w.horizontalScrollBar()
         vScroll = w.verticalScrollBar()
         hPos = hScroll.sliderPosition()
@@ -1323,7 +1368,7 @@ class LeoQtTree(leoFrame.LeoTree):
         Scroll a QTreeWidget up or down or right or left.
         kind is in ('down-line','down-page','up-line','up-page', 'right', 'left')
         """
-        c = self.c; w = self.treeWidget
+        c = self.c; w = self.tree_view or self.treeWidget
         if kind in ('left', 'right'):
             hScroll = w.horizontalScrollBar()
             if kind == 'right':
@@ -1351,13 +1396,13 @@ class LeoQtTree(leoFrame.LeoTree):
     #@+node:ekr.20110605121601.18435: *4* qtree.setH/VScroll
     def setHScroll(self, hPos):
 
-        w = self.treeWidget
+        w = self.tree_view or self.treeWidget
         hScroll = w.horizontalScrollBar()
         hScroll.setValue(hPos)
 
     def setVScroll(self, vPos):
 
-        w = self.treeWidget
+        w = self.tree_view or self.treeWidget
         vScroll = w.verticalScrollBar()
         vScroll.setValue(vPos)
     #@+node:ekr.20110605121601.17905: *3* qtree.Selecting & editing
@@ -1384,6 +1429,10 @@ class LeoQtTree(leoFrame.LeoTree):
         c.outerUpdate()
             # Do any scheduled redraw.
             # This won't do anything in the new redraw scheme.
+        if self.tree_view:
+            # The view's editor changes the headline with model.setData.
+            self.tree_view.edit(self.tree_view.tree_model.position_index(p))
+            return None, None
         item = self.position2item(p)
         if item:
             if self.use_declutter:
@@ -1412,6 +1461,10 @@ class LeoQtTree(leoFrame.LeoTree):
         self.onHeadChanged(p)
     #@+node:ekr.20110605121601.17915: *4* qtree.getSelectedPositions
     def getSelectedPositions(self):
+        if self.tree_view:
+            model = self.tree_view.tree_model
+            return leoNodes.PosList(
+                model.index_position(z) for z in self.tree_view.selectedIndexes())
         items = self.getSelectedItems()
         pl = leoNodes.PosList(self.item2position(it) for it in items)
         return pl
@@ -1438,6 +1491,9 @@ class LeoQtTree(leoFrame.LeoTree):
             return None
         if not p:
             return None
+        if self.tree_view:
+            self.tree_view.select(p)
+            return None
         item = self.position2item(p)
         if not item:
             # This is not necessarily an error.
@@ -1460,6 +1516,413 @@ class LeoQtTree(leoFrame.LeoTree):
         if item:
             item.setSelected(False)
     #@-others
+#@+node:ekr.20261018051306.1: ** class LeoQtTreeModel
+class LeoQtTreeModel(QtCore.QAbstractItemModel):
+    """
+    A virtual model of Leo's outline for QTreeViews.
+
+    The model creates no items. An index refers to the row'th child of the
+    node at its parent's *path*, a tuple of child indices starting at the
+    hidden root node. The model interns only the paths of nodes whose
+    children the view has asked for, so collapsed subtrees cost nothing.
+
+    Like qtree.drawTopTree, the model shows only the hoisted node, or the
+    children of a hoisted @chapter node, when the outline is hoisted.
+    Call refresh() after changing the structure of the outline or hoisting.
+    """
+
+    def __init__(self, c, parent=None):
+        """Ctor for the LeoQtTreeModel class."""
+        super().__init__(parent)
+        self.c = c
+        self.get_icon = None
+            # A function returning the icon for a position, or None.
+        self.root = None
+            # The hoisted position, or None.
+        self.show_root = False
+            # True: the root is the only top-level row.
+            # False: the root's children are the top-level rows.
+        self.paths = {}
+            # Keys and values are the same path: internal pointers of indices.
+        self.vnodes = {}
+            # Keys are paths, values are the vnode at that path.
+    #@+others
+    #@+node:ekr.20261018051306.2: *3* model.index, parent & path helpers
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        """Return the index of the row'th child of parent."""
+        path = self.index_path(parent)
+        children = self.path_children(path)
+        if column != 0 or children is None or not 0 <= row < len(children):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, self.intern_path(path))
+
+    def parent(self, index=None):
+        """Return the parent of the index."""
+        if index is None:
+            return super().parent()  # QObject.parent.
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        path = index.internalPointer()
+        if not path:
+            return QtCore.QModelIndex()
+        return self.createIndex(path[-1], 0, self.intern_path(path[:-1]))
+
+    def index_path(self, index):
+        """Return the path of the node at index."""
+        if not index.isValid():
+            return ()
+        return index.internalPointer() + (index.row(),)
+
+    def intern_path(self, path):
+        """Return the unique copy of path, which outlives all indices."""
+        return self.paths.setdefault(path, path)
+
+    def path_children(self, path):
+        """Return the list of the children of the node at path, or None."""
+        if not path:
+            return self.top_vnodes()
+        v = self.path_vnode(path)
+        return v.children if v else None
+
+    def path_vnode(self, path):
+        """Return the vnode at a non-empty path, or None."""
+        v = self.vnodes.get(path)
+        if v is None:
+            children = self.top_vnodes()
+            try:
+                for n in path:
+                    v = children[n]
+                    children = v.children
+            except IndexError:
+                return None
+            self.vnodes[path] = v
+        return v
+
+    def top_vnodes(self):
+        """Return the list of the vnodes of the top-level rows."""
+        if not self.root:
+            return self.c.hiddenRootNode.children
+        if self.show_root:
+            return [self.root.v]
+        return self.root.v.children
+    #@+node:ekr.20261018051306.3: *3* model.rowCount, columnCount & hasChildren
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        children = self.path_children(self.index_path(parent))
+        return len(children) if children else 0
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        """Show expansion boxes without computing the children's paths."""
+        return bool(self.path_children(self.index_path(parent)))
+    #@+node:ekr.20261018051306.4: *3* model.data, flags & setData
+    def data(self, index, role=QtConst.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (QtConst.DisplayRole, QtConst.EditRole, QtConst.ToolTipRole):
+            v = self.path_vnode(self.index_path(index))
+            return v.h if v else None
+        if role == QtConst.DecorationRole and self.get_icon:
+            return self.get_icon(self.index_position(index))
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtConst.NoItemFlags
+        return QtConst.ItemIsEnabled | QtConst.ItemIsSelectable | QtConst.ItemIsEditable
+
+    def setData(self, index, value, role=QtConst.EditRole):
+        """Change a headline in the view's editor, as qtree.onHeadChanged does."""
+        c, u = self.c, self.c.undoer
+        if role != QtConst.EditRole or not index.isValid():
+            return False
+        p = self.index_position(index)
+        s = g.toUnicode(value).split('\n')[0][:1000]
+        oldHead = p.h
+        changed = s != oldHead
+        if g.doHook("headkey1", c=c, p=p, v=p, s=s, changed=changed):
+            return False
+        if changed:
+            undoData = u.beforeChangeNodeContents(p, oldHead=oldHead)
+            p.initHeadString(s)
+            if not c.changed: c.setChanged()
+            c.frame.body.recolor(p)
+            p.setDirty()
+            u.afterChangeNodeContents(p, 'Change Headline', undoData, inHead=True)
+            self.dataChanged.emit(index, index)
+        g.doHook("headkey2", c=c, p=p, v=p, s=s, changed=changed)
+        return True
+    #@+node:ekr.20261018051306.5: *3* model.index_position, position_index & refresh
+    def index_position(self, index):
+        """Return the position of the node at index."""
+        if not index.isValid():
+            return None
+        path, root = self.index_path(index), self.root
+        if not root:
+            stack, v, childIndex = [], self.c.hiddenRootNode, 0
+        else:
+            stack, v, childIndex = root.stack[:], root.v, root._childIndex
+            if self.show_root:
+                path = path[1:]
+        for n in path:
+            if v is not self.c.hiddenRootNode:
+                stack.append((v, childIndex))
+            v, childIndex = v.children[n], n
+        return leoNodes.Position(v, childIndex, stack)
+
+    def position_index(self, p):
+        """Return the index of position p."""
+        index, root = QtCore.QModelIndex(), self.root
+        if not p:
+            return index
+        rows = [childIndex for v, childIndex in p.stack] + [p._childIndex]
+        if root:
+            # p must be the root or one of its descendants.
+            n = len(root.stack)
+            if len(p.stack) < n or p.stack[:n] != root.stack or (
+                (p.stack + [(p.v, p._childIndex)])[n] != (root.v, root._childIndex)
+            ):
+                return index
+            rows = [0] + rows[n + 1 :] if self.show_root else rows[n + 1 :]
+        for row in rows:
+            index = self.index(row, 0, index)
+        return index
+
+    def top_positions(self):
+        """Return the positions of the top-level rows."""
+        root = self.root
+        if not root:
+            return list(self.c.rootPosition().self_and_siblings())
+        if self.show_root:
+            return [root.copy()]
+        return list(root.children())
+
+    def refresh(self):
+        """
+        Forget all indices and find the root of the hoisted outline.
+        Call this after changing the outline's structure or hoisting.
+        """
+        c = self.c
+        self.beginResetModel()
+        self.root, self.show_root = None, False
+        if c.hoistStack:
+            p = c.hoistStack[-1].p
+            self.root = p.copy()
+            self.show_root = not (
+                len(c.hoistStack) == 1 and p.h.startswith('@chapter') and p.hasChildren())
+        self.paths = {}
+        self.vnodes = {}
+        self.endResetModel()
+    #@-others
+#@+node:ekr.20261018051306.6: ** class LeoQtTreeView
+class LeoQtTreeView(QtWidgets.QTreeView):
+    """
+    A QTreeView showing a LeoQtTreeModel.
+
+    Redraws and selections take time proportional to the number of
+    visible expanded nodes, not to the size of the outline.
+    """
+
+    def __init__(self, c, parent=None):
+        """Ctor for the LeoQtTreeView class."""
+        super().__init__(parent)
+        self.c = c
+        self.busy = False
+            # True: ignore gui events caused by redraws.
+        self.tree_model = model = LeoQtTreeModel(c, self)
+        tree = c.frame.tree
+        if hasattr(tree, 'getCompositeIconImage'):
+            model.get_icon = lambda p: tree.getCompositeIconImage(p, p.v.computeIcon())
+        self.setModel(model)
+        self.setHeaderHidden(True)
+        self.setUniformRowHeights(True)
+            # Essential: the view need not measure every row.
+        self.expanded.connect(self.onExpanded)
+        self.collapsed.connect(self.onCollapsed)
+        self.selectionModel().currentChanged.connect(self.onCurrentChanged)
+    #@+others
+    #@+node:ekr.20261018051306.7: *3* view.event handlers
+    def onCollapsed(self, index):
+        if not self.busy:
+            p = self.tree_model.index_position(index)
+            if p and p.isExpanded():
+                p.contract()
+
+    def onCurrentChanged(self, current, previous):
+        if not self.busy:
+            p = self.tree_model.index_position(current)
+            if p and p != self.c.p:
+                self.c.selectPosition(p)
+
+    def onExpanded(self, index):
+        if not self.busy:
+            p = self.tree_model.index_position(index)
+            if p and not p.isExpanded():
+                p.expand()
+            # Show the expanded descendants of p, as Leo does.
+            self.expand_visible(index, p)
+    #@+node:ekr.20261018051306.8: *3* view.redraw & helpers
+    def redraw(self, p=None):
+        """Redraw the outline and select p or c.p."""
+        c = self.c
+        self.tree_model.refresh()
+        self.expand_visible(QtCore.QModelIndex(), None)
+        self.select(p or c.p)
+
+    def redraw_after_contract(self, p):
+        self.set_expanded(self.tree_model.position_index(p), False)
+
+    def redraw_after_expand(self, p):
+        index = self.tree_model.position_index(p)
+        self.set_expanded(index, True)
+        self.expand_visible(index, p)
+
+    def redraw_after_select(self, p=None):
+        self.select(p or self.c.p)
+
+    def expand_visible(self, index, p):
+        """Expand the view of all visible expanded descendants of p."""
+        model = self.tree_model
+        children = p.children() if p else model.top_positions()
+        for n, child in enumerate(children):
+            if child.hasChildren() and child.isExpanded():
+                child_index = model.index(n, 0, index)
+                self.set_expanded(child_index, True)
+                self.expand_visible(child_index, child)
+
+    def select(self, p):
+        """Select p, expanding the view of all p's ancestors."""
+        model = self.tree_model
+        index = model.position_index(p)
+        if index.isValid():
+            parent = index.parent()
+            while parent.isValid():
+                self.set_expanded(parent, True)
+                parent = parent.parent()
+            try:
+                self.busy = True
+                self.setCurrentIndex(index)
+            finally:
+                self.busy = False
+            self.scrollTo(index)
+
+    def set_expanded(self, index, flag):
+        """Expand or contract the view of index without changing the outline."""
+        if index.isValid() and self.isExpanded(index) != flag:
+            try:
+                self.busy = True
+                self.setExpanded(index, flag)
+            finally:
+                self.busy = False
+    #@-others
+#@+node:ekr.20261018062438.3: ** class TestLeoQtTreeModel
+@unittest.skipUnless(os.environ.get('QT_QPA_PLATFORM', 'offscreen') == 'offscreen',
+    "requires Qt's offscreen platform")
+class TestLeoQtTreeModel(unittest.TestCase):
+    """Test cases for LeoQtTreeModel and LeoQtTreeView, using Qt's offscreen platform."""
+    #@+others
+    #@+node:ekr.20261018062438.4: *3* TestLeoQtTreeModel.setUp
+    def setUp(self):
+        """Create a view of an outline containing clones."""
+        import leo.core.leoBridge as leoBridge
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+        if app.platformName() != 'offscreen':
+            self.skipTest("requires Qt's offscreen platform")
+        self.app = app
+        bridge = leoBridge.controller(gui='nullGui',
+            loadPlugins=False, readSettings=False, silent=True, verbose=False)
+        self.c = c = bridge.openLeoFile('')
+        root = c.rootPosition()
+        root.h = 'root'
+        for i in range(100):
+            child = root.insertAsLastChild()
+            child.h = f"child {i}"
+            for j in range(10):
+                child.insertAsLastChild().h = f"grandchild {i}.{j}"
+        clone = root.firstChild().clone()
+        clone.moveToLastChildOf(root.lastChild())
+        self.view = LeoQtTreeView(c)
+        self.view.resize(300, 400)
+
+    def tearDown(self):
+        self.view.close()
+    #@+node:ekr.20261018062438.5: *3* TestLeoQtTreeModel.test_view
+    def test_view(self):
+        c, view = self.c, self.view
+        model = view.tree_model
+        root = c.rootPosition()
+        root.expand()
+        view.redraw(root)
+        self.app.processEvents()
+        # Only the expanded root's children have been fetched.
+        assert model.rowCount() == 1
+        assert model.rowCount(model.position_index(root)) == 100
+        assert len(model.paths) == 2, sorted(model.paths)
+        assert model.index_position(view.currentIndex()) == root
+        # Positions and indices round-trip, including clones.
+        for p in c.all_positions():
+            index = model.position_index(p)
+            assert model.index_position(index) == p, p
+            assert model.data(index) == p.h
+        # Selecting a node within a clone expands its ancestors in the view.
+        p = root.lastChild().lastChild().lastChild()
+        assert p.h == 'grandchild 0.9', p.h
+        c.selectPosition(p)
+        view.redraw_after_select(p)
+        self.app.processEvents()
+        assert model.index_position(view.currentIndex()) == p
+        assert view.isExpanded(model.position_index(p.parent()))
+        # Changing a headline in the view is undoable.
+        index = model.position_index(p)
+        assert model.setData(index, 'changed\nsecond line')
+        assert p.h == 'changed' and root.firstChild().lastChild().h == 'changed'
+        c.undoer.undo()
+        assert p.h == 'grandchild 0.9', p.h
+        # Collapsing a node in the view contracts the node.
+        view.collapse(model.position_index(root))
+        assert not root.isExpanded()
+        view.expand(model.position_index(root))
+        assert root.isExpanded()
+    #@+node:ekr.20261018065409.1: *3* TestLeoQtTreeModel.test_hoist
+    def test_hoist(self):
+        c, view = self.c, self.view
+        model = view.tree_model
+        root = c.rootPosition()
+        child = root.lastChild()
+        # The hoisted node is the only top-level row.
+        c.hoistStack.append(g.Bunch(p=child.copy(), expanded=True))
+        child.expand()
+        view.redraw(child)
+        assert model.rowCount() == 1
+        assert model.index_position(model.index(0, 0)) == child
+        for p in child.self_and_subtree():
+            index = model.position_index(p)
+            assert model.index_position(index) == p, p
+            assert model.data(index) == p.h
+        assert not model.position_index(root).isValid()
+        assert not model.position_index(root.firstChild()).isValid()
+        assert model.index_position(view.currentIndex()) == child
+        # The children of a hoisted @chapter node are the top-level rows.
+        c.hoistStack = []
+        child.h = '@chapter test'
+        c.hoistStack.append(g.Bunch(p=child.copy(), expanded=True))
+        view.redraw(child.firstChild())
+        assert model.rowCount() == child.numberOfChildren()
+        assert not model.position_index(child).isValid()
+        for n, p in enumerate(child.children()):
+            assert model.position_index(p).row() == n
+            assert model.index_position(model.index(n, 0)) == p
+        assert model.index_position(view.currentIndex()) == child.firstChild()
+        # Unhoisting shows the entire outline again.
+        c.hoistStack = []
+        view.redraw(root)
+        assert model.rowCount() == 1
+        assert model.index_position(model.index(0, 0)) == root
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
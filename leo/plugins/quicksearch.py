@@ -607,8 +607,9 @@ class QuickSearchController:
             bNodes = [self.c.p]
 
         if not hitBase:
-            hm = self.find_h(hpat, hNodes, flags)
-            bm = self.find_b(bpat, bNodes, flags)
+            candidates = self.candidates(pat)
+            hm = self.find_h(hpat, self.filterNodes(hNodes, candidates), flags)
+            bm = self.find_b(bpat, self.filterNodes(bNodes, candidates), flags)
             bm_keys = [match.key() for match in bm]
             numOfHm = len(hm) #do this before trim to get accurate count
             hm = [match for match in hm if match.key() not in bm_keys]
@@ -654,12 +655,33 @@ class QuickSearchController:
             hNodes = self.c.p.self_and_subtree()
         else:
             hNodes = [self.c.p]
-        hm = self.find_h(hpat, hNodes, flags)
+        hm = self.find_h(hpat, self.filterNodes(hNodes, self.candidates(pat)), flags)
         # self.addHeadlineMatches(hm)
         # bm = self.c.find_b(bpat, flags)
         # self.addBodyMatches(bm)
         return hm, []
         # self.lw.insertItem(0, "%d hits"%self.lw.count())
+    #@+node:ekr.20261018043944.8: *3* candidates & filterNodes
+    def candidates(self, pat):
+        """
+        Return the set of vnodes that might match pat, using c.searchIndex,
+        or None if all nodes must be searched.
+        """
+        index = getattr(self.c, 'searchIndex', None)
+        if not index:
+            return None
+        if pat.startswith('r:'):
+            return index.regex_candidates(pat[2:])
+        # Glob patterns match case-insensitive regexes.
+        # Use only the literal text before any character class.
+        literals = re.split(r'[*?]', pat.split('[')[0])
+        return index.literal_candidates(literals, ascii_only=True)
+
+    def filterNodes(self, nodes, candidates):
+        """Yield the positions in nodes whose vnodes are candidates."""
+        for p in nodes:
+            if candidates is None or p.v in candidates:
+                yield p
     #@+node:jlunz.20150826091415.1: *3* find_h
     def find_h(self, regex, nodes, flags=re.IGNORECASE):
         """ Return list (a PosList) of all nodes where zero or more characters at